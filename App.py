@@ -2,12 +2,15 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), "Stock_Strategy_Analyzer"))
 
-from strategy import apply_strategy
-from utils import load_csv, get_stock_list
-from indicators import compute_indicators
+from utils import load_stock, stock_source, get_stock_list
+import jobs
+import perf
+from downsample import ALTAIR_MAX_ROWS, downsample_frame
+from execution import FILLS, PRESETS
 import pandas as pd
 
-import altair as alt
+import json
+import time
 import sys
 import os
 from datetime import datetime
@@ -15,11 +18,11 @@ from datetime import datetime
 # Add parent directory to path for imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from utils import load_csv, get_stock_list
-from strategy import apply_strategy
+from utils import load_stock, stock_source, get_stock_list
 
 
 USE_STREAMLIT = True  # Change to False to run Flask app
+JOB_POLL_SECONDS = 0.25  # how often a waiting page checks its backtest job
 # Load CSV file from Stock_data/ folder
 def load_data(stock, timeframe):
     file_path = f"Stock_data/NSE_{stock}_{timeframe}.csv"
@@ -80,9 +83,22 @@ if USE_STREAMLIT:
             "rsi": st.sidebar.checkbox("Use RSI for Sell", value=True),
             "rsi_threshold": st.sidebar.slider("Sell RSI Threshold", 50, 100, 60),
             "supertrend": st.sidebar.checkbox("Use Supertrend for Sell", value=True)
-        }
+        },
+        # "both" turns every sell into a short and every buy into a cover (signals.py)
+        "direction": st.sidebar.selectbox("↕️ Positions", ["long", "short", "both"]),
+        "pyramiding": st.sidebar.number_input("Max units (pyramiding)", min_value=1, max_value=20, value=1)
     }
 
+    # --- Fills and costs (execution.py); a stop / target of 0 is off ---
+    with st.sidebar.expander("💸 Execution & Costs"):
+        execution = {
+            "preset": st.selectbox("Charges", list(PRESETS)),
+            "fill": st.selectbox("Fill at", FILLS),
+            "slippage_ticks": st.number_input("Slippage (ticks)", min_value=0, max_value=50, value=0),
+            "stop_pct": st.number_input("Stop-loss %", min_value=0.0, max_value=50.0, value=0.0) or None,
+            "target_pct": st.number_input("Target %", min_value=0.0, max_value=100.0, value=0.0) or None
+        }
+
     if not stock_list:
         st.sidebar.error("No stock CSV files found.")
         st.stop()
@@ -91,44 +107,66 @@ if USE_STREAMLIT:
     timeframe = st.sidebar.selectbox("⏱️ Select Timeframe", ["1", "5", "15", "30", "60", "D"])
     from_date = st.sidebar.date_input("📅 From Date")
     to_date = st.sidebar.date_input("📅 To Date")
+    # Charts get about one min/max pair per pixel of this width (downsample.py)
+    chart_width = st.sidebar.slider("🖥️ Chart width (px)", 400, 3000, 1200, step=100)
+    profile_run = st.sidebar.checkbox("⏱️ Record performance", value=bool(perf.SPANS_FILE))
     run_btn = st.sidebar.button("▶ Run Analysis")
 
     # --- Main Title ---
     st.title("📊 Stock Strategy Analyzer")
 
     # --- Run Analysis ---
+    # The backtest runs on the shared job pool (jobs.py); the job id lives in
+    # the session so reruns (e.g. ticking "Show raw data") reuse the result
     if run_btn:
-        filename = os.path.join(DATA_FOLDER, f"NSE_{stock}_{timeframe}.csv")
-        if not os.path.exists(filename):
-            st.error(f"❌ File not found: `{filename}`")
+        if stock_source(DATA_FOLDER, stock, timeframe) is None:
+            st.error(f"❌ No data for {stock}: need `NSE_{stock}_1.csv` or `NSE_{stock}_{timeframe}.csv`")
+            st.stop()
+        st.session_state["job_id"] = jobs.get_manager().submit_analysis(
+            DATA_FOLDER, stock, timeframe, from_date, to_date, strategy_rules,
+            ema_period=ema_period, rsi_period=rsi_period, supertrend_period=supertrend_period,
+            supertrend_multiplier=supertrend_multiplier, profile=profile_run, execution=execution)
+
+    job_id = st.session_state.get("job_id")
+    if job_id is not None:
+        manager = jobs.get_manager()
+        status = manager.status(job_id)
+        if status is None:
+            st.info("ℹ️ The last analysis is no longer cached. Press ▶ Run Analysis again.")
+            st.stop()
+
+        progress_bar = st.progress(status["progress"], text=f"⏳ {status['stage']}...")
+        while status["state"] not in jobs.FINISHED:
+            time.sleep(JOB_POLL_SECONDS)
+            status = manager.status(job_id)
+            progress_bar.progress(status["progress"], text=f"⏳ {status['stage']}...")
+        progress_bar.empty()
+        if status["state"] == jobs.FAILED:
+            st.error(f"❌ Analysis failed: {status['error']}")
             st.stop()
 
-        df = load_csv(filename, from_date, to_date)
-        if df is None or df.empty:
+        analysis = manager.result(job_id)
+        df = analysis["df"]
+        perf_run = analysis["perf"]
+        if df.empty:
             st.warning("⚠️ No data returned. Check the file or date range.")
             st.stop()
-            df = compute_indicators(df, ema_length=ema_period, rsi_length=rsi_period,
-                        st_length=supertrend_period, st_multiplier=supertrend_multiplier)
         else:
             st.success("✅ Data loaded successfully.")
-        
-        df = compute_indicators(df, ema_length=ema_period, rsi_length=rsi_period,
-                        st_length=supertrend_period, st_multiplier=supertrend_multiplier)
 
         st.write("Columns in data:", df.columns.tolist())
-        df.columns = [col.strip().lower() for col in df.columns]
-        print(df.columns)  # Should include 'ema20' and 'rsi14'
-        print(df[['ema20', 'rsi14']].tail())
-
-
-        with st.spinner("⏳ Running Strategy..."):
-            trades_df, total_profit, win_rate = apply_strategy(df, strategy_rules)
-
-            
-            st.write("🧠 Available indicators:", df.columns.tolist())
-
+        ledger = analysis["trades"]
+        trades_df = ledger.to_frame()  # the display boundary: arrays -> table
+        total_profit = ledger.total_profit()
+        win_rate = ledger.win_rate()
 
         st.success("✅ Analysis Completed")
+        stats = analysis["cache_stats"]
+        st.sidebar.caption(
+            f"🧮 Indicator cache: {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0f}%), {stats['entries']} series, "
+            f"{stats['bytes'] / 1e6:.1f} of {stats['max_bytes'] / 1e6:.0f} MB"
+        )
         # --- Show Raw Data ---
         # --- Optional: Show Raw CSV Data ---
         if st.checkbox("Show raw data"):
@@ -139,11 +177,6 @@ if USE_STREAMLIT:
                 st.warning("Data not loaded or empty.")
 
 
-# Apply strategy (MUST return a DataFrame)
-        trades_df, total_profit, win_rate = apply_strategy(df, strategy_rules)
-
-
-
         # --- Results ---
         st.subheader("📋 Trade Summary")
         if not trades_df.empty:
@@ -151,9 +184,7 @@ if USE_STREAMLIT:
             st.dataframe(trades_df)
             st.metric("💰 Total Profit", f"₹{total_profit:.2f}")
             st.metric("🏆 Win Rate", f"{win_rate:.2f}%")
-            total_profit = trades_df["P/L"].sum()
-            win_rate = (trades_df["P/L"] > 0).mean() * 100
-
+            st.dataframe(pd.DataFrame([analysis["metrics"]]))
             st.write(f"💰 Total Profit: `{total_profit:.2f}`")
             st.write(f"🎯 Win Rate: `{win_rate:.2f}%`")
            
@@ -169,23 +200,27 @@ if USE_STREAMLIT:
 
             st.subheader("📈 Equity Curve")
 
-            equity = trades_df["P/L"].cumsum()
+            # Marked to market on every bar, downsampled in the worker (equity.py)
+            curve = analysis["equity"]
             fig, ax = plt.subplots()
-            ax.plot(equity, label="Equity Curve", color="green")
+            ax.plot(curve["time"], curve["equity"], label="Equity Curve", color="green")
+            ax.fill_between(curve["time"], curve["drawdown"], 0, color="red", alpha=0.2, label="Drawdown")
             ax.set_title("Equity Growth Over Time")
-            ax.set_xlabel("Trade #")
+            ax.set_xlabel("Time")
             ax.set_ylabel("Cumulative Profit")
             ax.legend()
             ax.grid(True)
 
             st.pyplot(fig)
+            st.caption(f"Bar-level max drawdown: ₹{analysis['equity_stats']['max_drawdown']:.2f}")
         else:
             st.info("No trades found for the selected strategy conditions.")
-            
+        
         # --- Chart ---
         st.subheader("📈 Closing Price Chart")
         st.write("Current columns:", df.columns.tolist())
-        st.line_chart(df.set_index("time")[["close", "ema20", "rsi14"]])
+        st.line_chart(downsample_frame(df, ["close", "ema20", "rsi14"], chart_width)
+                      .set_index("time")[["close", "ema20", "rsi14"]])
 
         # 🧠 Optional: Detailed Price + EMA + Supertrend Chart
       
@@ -194,7 +229,13 @@ if USE_STREAMLIT:
         # Choose correct EMA column name
         ema_col = f"ema{ema_period}"
 
-        base = alt.Chart(df.reset_index()).encode(x='time:T')
+        # Optional: add Supertrend line if available
+        supertrend_cols = [col for col in df.columns if col.lower().startswith("supertl")]
+        chart_df = downsample_frame(df, ["close", ema_col] + supertrend_cols[:1], chart_width,
+                                    max_rows=ALTAIR_MAX_ROWS)
+        import altair as alt
+
+        base = alt.Chart(chart_df.reset_index()).encode(x='time:T')
 
         price_line = base.mark_line(color='blue').encode(
             y='close:Q',
@@ -205,8 +246,6 @@ if USE_STREAMLIT:
             y=ema_col + ':Q'
         )
 
-        # Optional: add Supertrend line if available
-        supertrend_cols = [col for col in df.columns if col.lower().startswith("supertl")]
         if supertrend_cols:
             st_col = supertrend_cols[0]
             supertrend_line = base.mark_line(color='green').encode(
@@ -227,19 +266,46 @@ if USE_STREAMLIT:
             if "supertrend" in col.lower() and not col.lower().endswith("d"):  # Exclude direction column
                 columns_to_plot.append(col)
 
-                st.line_chart(df.set_index("time")[columns_to_plot])
+                st.line_chart(downsample_frame(df, columns_to_plot, chart_width)
+                              .set_index("time")[columns_to_plot])
 
                 st.subheader("📊 RSI Indicator")
-                st.line_chart(df.set_index("time")[["rsi14"]])
+                st.line_chart(downsample_frame(df, ["rsi14"], chart_width).set_index("time")[["rsi14"]])
+
+        # --- Performance ---
+        if perf_run is not None:
+            with st.expander("⏱️ Performance", expanded=False):
+                st.caption(f"Run `{perf_run.id}`: {perf_run.total_seconds():.3f}s in instrumented stages")
+                st.dataframe(perf_run.to_frame())
+                for span in perf_run.records():
+                    if span["notes"]:
+                        st.text(f"{span['name']}:\n" + "\n".join(span["notes"]))
+                st.download_button("⬇️ Spans (JSON lines)", file_name=f"spans_{perf_run.id}.jsonl",
+                                   data="\n".join(json.dumps({"run": perf_run.id, **r}, default=str)
+                                                  for r in perf_run.records()))
 
 
 
 else:
-    from flask import Flask, render_template, request
+    from flask import Flask, jsonify, render_template, request
+
+    from signals import DEFAULT_STRATEGY_RULES
+    from ledger import TradeLedger
 
     app = Flask(__name__)
     DATA_FOLDER = "stock_data"
 
+    def submit_form(form):
+        """Queue the analysis described by a submitted form. Returns (job_id, error)."""
+        stock = form.get("stock")
+        timeframe = form.get("timeframe")
+        if stock_source(DATA_FOLDER, stock, timeframe) is None:
+            return None, f"No data for {stock} ({timeframe})!"
+        job_id = jobs.get_manager().submit_analysis(
+            DATA_FOLDER, stock, timeframe, form.get("from_date"), form.get("to_date"),
+            DEFAULT_STRATEGY_RULES)  # the form has no rule fields
+        return job_id, None
+
     @app.route("/", methods=["GET", "POST"])
     def index():
         stock_list = get_stock_list(DATA_FOLDER)
@@ -247,26 +313,48 @@ else:
         error = None
 
         if request.method == "POST":
-            stock = request.form.get("stock")
-            timeframe = request.form.get("timeframe")
-            from_date = request.form.get("from_date")
-            to_date = request.form.get("to_date")
-
-            filename = f"NSE_{stock}_{timeframe}.csv"
-            filepath = os.path.join(DATA_FOLDER, filename)
-
-            if not os.path.exists(filepath):
-                error = f"File {filename} not found!"
+            job_id, error = submit_form(request.form)
+            if error:
                 return render_template("index.html", stock_list=stock_list, error=error)
 
-            df = load_csv(filepath, from_date, to_date)
-            trades, profit, win_rate = apply_strategy(df)
+            # Only this request thread waits; the work runs on the job pool
+            try:
+                analysis = jobs.get_manager().result(job_id)
+            except (KeyError, RuntimeError) as e:
+                return render_template("index.html", stock_list=stock_list, error=str(e))
+            ledger = analysis["trades"] or TradeLedger()
 
-            return render_template("results.html", trades=trades.to_dict(orient="records"),
-                                   profit=profit, win_rate=win_rate)
+            return render_template("results.html", trades=ledger.to_frame().to_dict(orient="records"),
+                                   profit=ledger.total_profit(), win_rate=ledger.win_rate())
 
         return render_template("index.html", stock_list=stock_list, error=error)
 
+    @app.route("/jobs", methods=["GET", "POST"])
+    def job_list():
+        """POST: queue an analysis (same fields as the index form) -> job id. GET: every known job."""
+        if request.method == "GET":
+            return jsonify(jobs.get_manager().jobs())
+        job_id, error = submit_form(request.form)
+        if error:
+            return jsonify({"error": error}), 404
+        return jsonify(jobs.get_manager().status(job_id)), 202
+
+    @app.route("/jobs/<job_id>")
+    def job_status(job_id):
+        """Poll a job: state, stage, progress; the trades once it is done."""
+        manager = jobs.get_manager()
+        status = manager.status(job_id)
+        if status is None:
+            return jsonify({"error": f"unknown job {job_id}"}), 404
+        if status["state"] == jobs.DONE:
+            analysis = manager.result(job_id)
+            ledger = analysis["trades"] or TradeLedger()
+            status["result"] = {
+                "trades": ledger.to_frame().to_dict(orient="records"),
+                **(analysis["metrics"] or ledger.stats())
+            }
+        return app.response_class(json.dumps(status, default=str), mimetype="application/json")
+
     if __name__ == "__main__":
         app.run(debug=True)
 
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import pandas_ta as ta
 import os
 import datetime
 from strategy import apply_strategy, load_data  # assuming you have these defined
@@ -0,0 +1,151 @@
+"""
+Chunked backtest for files larger than RAM.
+
+Runs the apply_strategy rules over a CSV (or its Parquet cache) a chunk at
+a time. The EMA / RSI / Supertrend kernels and the open trade carry their
+state from one chunk to the next, and closed trades are emitted as soon
+as their chunk is done. Memory is bounded by `chunk_rows`, not the file.
+
+The kernels are the state objects apply_strategy itself runs over the
+whole series (kernels.py), so the trades are identical to
+
+    apply_strategy(strategy.load_data(filepath, from_date, to_date), strategy_rules, ...)
+
+One input of the Supertrend is a property of the whole series (pandas_ta
+widens every high-low range by machine epsilon once any bar is flat), so
+the high/low columns are scanned once before the main pass.
+
+    for trade in iter_trades("stock_data/NSE_RELIANCE_1.csv", strategy_rules):
+        print(trade)
+"""
+import numpy as np
+import pandas as pd
+
+import kernels
+from data_cache import iter_ohlc
+from ledger import TradeLedger, index_times
+from signals import build_signal_masks, next_true_index, position_rules
+
+CHUNK_ROWS = 1_000_000
+
+
+def has_flat_bars(filepath, chunk_rows=CHUNK_ROWS, from_date=None, to_date=None):
+    """True if any bar in the window has high == low (first pass, two columns)."""
+    return any(
+        kernels.has_flat_bars(chunk['high'], chunk['low'])
+        for chunk in iter_ohlc(filepath, chunk_rows, from_date, to_date, columns=['high', 'low'])
+    )
+
+
+class ChunkedStrategy:
+    """
+    apply_strategy's indicators, signal masks and flat -> long -> flat state
+    machine, fed one chunk of bars at a time. Closed trades go to
+    `self.ledger` (a TradeLedger, bar positions counted from the first chunk).
+    Long only, one unit: other strategy_rules["direction"] / ["pyramiding"]
+    settings raise ValueError.
+    """
+
+    def __init__(self, strategy_rules, ema_period=20, rsi_period=14,
+                 supertrend_period=10, supertrend_multiplier=3.0, flat_bars=None):
+        if position_rules(strategy_rules) != ("long", 1):
+            raise ValueError("the chunked backtest runs long-only, one-unit books; "
+                             "use apply_strategy for short, stop-and-reverse or pyramided positions")
+        self.strategy_rules = strategy_rules
+        self.ema = kernels.EMA(ema_period)
+        self.rsi = kernels.RSI(rsi_period)
+        self.supertrend = kernels.Supertrend(supertrend_period, supertrend_multiplier, flat_bars)
+        self.bars = 0
+        self.entry = None  # (bar, time, price) of the open trade
+        self.ledger = TradeLedger()
+
+    def update(self, time, high, low, close):
+        """
+        Feed the next chunk (equal-length arrays, `time` a DatetimeIndex or
+        integer index). Returns how many trades closed in it.
+        """
+        close = np.asarray(close, dtype=np.float64)
+        times, time_dtype = index_times(time)
+        if self.ledger.time_dtype is None:
+            self.ledger.time_dtype = time_dtype
+        offset = self.bars
+        n = len(close)
+        ema = self.ema(close)
+        rsi = self.rsi(close)
+        direction = self.supertrend(high, low, close)[1]
+        buy, sell = build_signal_masks(close, ema, rsi, direction, self.strategy_rules)
+
+        next_buy = next_true_index(buy)
+        next_sell = next_true_index(sell)
+        closed = len(self.ledger)
+        # apply_strategy never trades on the first bar of the data
+        i = 1 if self.bars == 0 else 0
+        self.bars += n
+
+        if self.entry is not None:
+            # Exit on the first sell after the entry, which was in an earlier chunk
+            j = next_sell[0] if n else n
+            if j >= n:
+                return 0
+            self._close(offset + j, times[j], close[j])
+            i = j + 1
+
+        while i < n:
+            i = next_buy[i]
+            if i >= n:
+                break
+            self.entry = (offset + i, times[i], close[i])
+            j = next_sell[i + 1] if i + 1 < n else n
+            if j >= n:
+                break  # still open at the end of the chunk
+            self._close(offset + j, times[j], close[j])
+            i = j + 1
+        return len(self.ledger) - closed
+
+    def _close(self, exit_bar, exit_time, exit_price):
+        entry_bar, entry_time, entry_price = self.entry
+        self.entry = None
+        self.ledger.append(entry_bar, exit_bar, entry_time, exit_time, entry_price, exit_price)
+
+
+def iter_chunks(filepath, strategy_rules, ema_period=20, rsi_period=14, supertrend_period=10,
+                supertrend_multiplier=3.0, from_date=None, to_date=None, chunk_rows=CHUNK_ROWS):
+    """
+    Run the strategy over `filepath` a chunk at a time. Yields the
+    ChunkedStrategy and how many trades the chunk closed, after each chunk.
+    """
+    strategy = ChunkedStrategy(strategy_rules, ema_period, rsi_period, supertrend_period,
+                               supertrend_multiplier,
+                               flat_bars=has_flat_bars(filepath, chunk_rows, from_date, to_date))
+    for chunk in iter_ohlc(filepath, chunk_rows, from_date, to_date,
+                           columns=['high', 'low', 'close']):
+        time = pd.DatetimeIndex(chunk['time']).as_unit('ns')  # same unit as the store
+        closed = strategy.update(time, chunk['high'].to_numpy(), chunk['low'].to_numpy(),
+                                 chunk['close'].to_numpy())
+        yield strategy, closed
+
+
+def iter_trades(filepath, strategy_rules, **kwargs):
+    """
+    Yield each closed trade of `filepath` (a dict with apply_strategy's
+    columns) as soon as the chunk that closes it is read.
+    """
+    for strategy, closed in iter_chunks(filepath, strategy_rules, **kwargs):
+        if closed:
+            yield from strategy.ledger.to_frame(len(strategy.ledger) - closed).to_dict(orient="records")
+
+
+def run_chunked(filepath, strategy_rules, from_date=None, to_date=None,
+                chunk_rows=CHUNK_ROWS, **params):
+    """
+    The whole chunked backtest. Same return values as apply_strategy:
+    trades_df, total_profit, win_rate.
+    """
+    strategy = None
+    for strategy, _ in iter_chunks(filepath, strategy_rules, from_date=from_date, to_date=to_date,
+                                   chunk_rows=chunk_rows, **params):
+        pass
+    if strategy is None:
+        return pd.DataFrame(), 0.0, 0.0
+    ledger = strategy.ledger
+    return ledger.to_frame(), ledger.total_profit(), ledger.win_rate()
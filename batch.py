@@ -0,0 +1,344 @@
+"""
+Headless batch backtester.
+
+Fans load_csv -> apply_strategy (indicators included) out over a process
+pool, one task per (stock, timeframe, parameter set), and streams the
+results back into one table. A file that fails only produces "error"
+rows; the rest of the run carries on.
+
+With more than one worker the bars go through the shared-memory data
+plane (data_plane.py): each file is loaded once, together with every
+EMA / RSI / Supertrend series the parameter grid needs, and every task
+on it reads those arrays in place instead of parsing the file and
+computing its indicators again in its own process.
+
+Usage:
+    python batch.py --data stock_data --workers 8 --chunksize 4 \
+        --ema 10,20,50 --rsi 14 --st-period 7,10 --st-mult 3.0 --out results.csv
+    python batch.py --buy-rule "close > ema(50) and rsi(14) < 35" --sell-rule "rsi(14) > 65"
+    python batch.py --costs nse_intraday --fill next_open --slippage-ticks 1 --stop-pct 0.5
+    python batch.py --direction both --pyramiding 3
+"""
+import argparse
+import itertools
+import os
+import time
+from multiprocessing import Pool
+
+import pandas as pd
+
+from signals import DEFAULT_STRATEGY_RULES
+from utils import get_stock_files
+
+DATA_FOLDER = "stock_data"
+
+# Files held in shared memory at a time, per worker
+PLANE_FILES_PER_WORKER = 2
+
+RESULT_COLUMNS = [
+    "stock", "timeframe", "ema_period", "rsi_period", "supertrend_period",
+    "supertrend_multiplier", "bars", "trades", "total_profit", "win_rate",
+    "costs", "seconds", "error"
+]
+
+
+def param_grid(ema_periods=(20,), rsi_periods=(14,), supertrend_periods=(10,),
+               supertrend_multipliers=(3.0,)):
+    """Every combination of the given settings as a list of dicts."""
+    return [
+        {"ema_period": e, "rsi_period": r, "supertrend_period": p, "supertrend_multiplier": m}
+        for e, r, p, m in itertools.product(
+            ema_periods, rsi_periods, supertrend_periods, supertrend_multipliers)
+    ]
+
+
+def indicator_columns(params, strategy_rules):
+    """
+    The shared-plane columns of the indicators a task's toggle rules read:
+    {"ema" / "rsi" / "supertrend": (column, settings)}, without the ones no
+    enabled rule uses. Empty for rule text, which computes its own.
+    """
+    from rules import is_rule_text
+
+    if is_rule_text(strategy_rules):
+        return {}
+    used = {kind for side in ("buy", "sell") for kind in ("ema", "rsi", "supertrend")
+            if strategy_rules.get(side, {}).get(kind, False)}
+    columns = {}
+    for kind, settings in (("ema", (int(params["ema_period"]),)),
+                           ("rsi", (int(params["rsi_period"]),)),
+                           ("supertrend", (int(params["supertrend_period"]),
+                                           float(params["supertrend_multiplier"])))):
+        if kind in used:
+            columns[kind] = ("_".join(map(str, (kind, *settings))), settings)
+    return columns
+
+
+def _result_row(stock, timeframe, params, error=None):
+    return {"stock": stock, "timeframe": timeframe, **params, "bars": 0, "trades": 0,
+            "total_profit": None, "win_rate": None, "costs": None, "seconds": 0.0, "error": error}
+
+
+def run_task(task):
+    """
+    Backtest one (stock, timeframe, params) task. Runs inside a worker process,
+    so it never raises: failures come back as a row with "error" set.
+    The source is a CSV path or a data_plane.SharedHandle (see iter_batch).
+    """
+    stock, timeframe, source, params, strategy_rules, from_date, to_date, execution = task
+    row = _result_row(stock, timeframe, params)
+    t0 = time.perf_counter()
+    try:
+        # Imported here so the parent process only pays for them if it runs tasks
+        # itself, and inside the try so a broken import is an error row, not a dead run
+        from data_plane import SharedHandle, attach
+        from rules import is_rule_text
+        from strategy import signal_ledger, strategy_ledger
+        from utils import load_csv
+
+        shared = isinstance(source, SharedHandle)
+        df = attach(source) if shared else load_csv(source, from_date, to_date)
+        if df is None:
+            raise ValueError(f"could not load {source}")
+        row["bars"] = len(df)
+        if not len(df):
+            raise ValueError("no data in date range")
+
+        if shared and not is_rule_text(strategy_rules):
+            # The indicators are columns of the segment already
+            columns = indicator_columns(params, strategy_rules)
+            ema, rsi, st = (df[columns[kind][0]] if kind in columns else None
+                            for kind in ("ema", "rsi", "supertrend"))
+            ledger = signal_ledger(df, strategy_rules, ema, rsi, st, execution)
+        else:
+            # strategy_ledger computes the indicators it trades on itself
+            ledger = strategy_ledger(df, strategy_rules, **params, execution=execution)
+
+        row["trades"] = len(ledger)
+        row["total_profit"] = float(ledger.total_profit())
+        row["win_rate"] = float(ledger.win_rate())
+        row["costs"] = float(ledger["costs"].sum())
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - t0, 4)
+    return row
+
+
+def window_task(task):
+    """
+    (rows, price columns, tz) of one file's date window, bringing its
+    ohlc_store up to date first, or an error string. Runs in a worker.
+    """
+    filepath, from_date, to_date = task
+    try:
+        from ohlc_store import load_view
+
+        view = load_view(filepath, from_date, to_date)
+        return len(view), list(view.columns), view.tz
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def fill_task(task):
+    """
+    Copy one file's window into its shared segment and compute the
+    indicator columns of `plan` ({column: (kind, settings)}) into it.
+    Returns None, or an error string. Runs in a worker.
+    """
+    handle, filepath, from_date, to_date, plan = task
+    try:
+        import kernels
+        from data_plane import fill
+        from ohlc_store import load_view
+
+        view = load_view(filepath, from_date, to_date)
+        if len(view) != handle.rows:
+            raise ValueError(f"{filepath} changed while loading")
+        with fill(handle) as arrays:
+            arrays["time"][:] = view.time
+            for column, values in view.columns.items():
+                arrays[column][:] = values
+            for column, (kind, settings) in plan.items():
+                if kind == "supertrend":
+                    arrays[column][:] = kernels.supertrend(view.high, view.low, view.close, *settings)[1]
+                else:
+                    arrays[column][:] = getattr(kernels, kind)(view.close, *settings)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def _shared_batch(pool, plane, files, params_list, strategy_rules, from_date, to_date, chunksize,
+                  execution):
+    """
+    iter_batch over one group of files through a data_plane.SharedPlane:
+    the workers bring the stores up to date and fill one segment per file
+    (bars plus every indicator column the grid reads), then run the tasks
+    on it. The segments are unlinked when the group is done.
+    """
+    import numpy as np
+
+    plan = {column: (kind, settings) for params in params_list
+            for kind, (column, settings) in indicator_columns(params, strategy_rules).items()}
+    errors = {}
+    handles = {}
+    try:
+        windows = pool.map(window_task, [(path, from_date, to_date) for _, _, path in files])
+        for (_, _, path), window in zip(files, windows):
+            if isinstance(window, str):
+                errors[path] = window
+                continue
+            rows, columns, tz = window
+            handles[path] = plane.create(rows, [("time", np.int64)] + [
+                (column, np.float64) for column in columns + list(plan)], tz)
+
+        filled = pool.map(fill_task, [(handle, path, from_date, to_date, plan)
+                                      for path, handle in handles.items()])
+        for path, error in zip(list(handles), filled):
+            if error is not None:
+                errors[path] = error
+                plane.release(handles.pop(path))
+
+        for stock, tf, path in files:
+            if path in errors:
+                for params in params_list:
+                    yield _result_row(stock, tf, params, errors[path])
+        tasks = [
+            (stock, tf, handles[path], params, strategy_rules, from_date, to_date, execution)
+            for stock, tf, path in files if path in handles
+            for params in params_list
+        ]
+        yield from pool.imap_unordered(run_task, tasks, chunksize=chunksize)
+    finally:
+        for handle in handles.values():
+            plane.release(handle)
+
+
+def iter_batch(data_folder=DATA_FOLDER, params_list=None, strategy_rules=None,
+               from_date=None, to_date=None, stocks=None, timeframes=None,
+               workers=None, chunksize=1, execution=None):
+    """
+    Yields one result dict per task as soon as a worker finishes it
+    (completion order, not submission order). `execution` fills and costs
+    the trades (an execution.ExecutionModel, preset name or settings dict).
+
+    workers=None uses every core, workers=1 runs in-process (handy for debugging)
+    and reads each task's file itself. With more workers the files go
+    through the shared-memory data plane, PLANE_FILES_PER_WORKER per worker
+    at a time. chunksize is how many tasks a worker takes per round trip;
+    raise it when there are many small files.
+    """
+    params_list = params_list or param_grid()
+    strategy_rules = strategy_rules or DEFAULT_STRATEGY_RULES
+
+    files = [
+        (stock, tf, path) for stock, tf, path in get_stock_files(data_folder)
+        if (not stocks or stock in stocks) and (not timeframes or tf in timeframes)
+    ]
+    tasks = [
+        (stock, tf, path, params, strategy_rules, from_date, to_date, execution)
+        for stock, tf, path in files
+        for params in params_list
+    ]
+    if not tasks:
+        return
+
+    if workers == 1:
+        for task in tasks:
+            yield run_task(task)
+        return
+
+    from data_plane import SharedPlane
+
+    group = PLANE_FILES_PER_WORKER * (workers or os.cpu_count() or 1)
+    # The plane first: workers forked after it share its resource tracker
+    with SharedPlane() as plane, Pool(processes=workers) as pool:
+        for lo in range(0, len(files), group):
+            yield from _shared_batch(pool, plane, files[lo:lo + group], params_list, strategy_rules,
+                                     from_date, to_date, chunksize, execution)
+
+
+def run_batch(*args, **kwargs):
+    """
+    Same arguments as iter_batch. Returns all results as one DataFrame,
+    sorted by stock, timeframe and total_profit (best first).
+    """
+    results_df = pd.DataFrame(list(iter_batch(*args, **kwargs)), columns=RESULT_COLUMNS)
+    return results_df.sort_values(
+        ["stock", "timeframe", "total_profit"], ascending=[True, True, False]
+    ).reset_index(drop=True)
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def _float_list(text):
+    return [float(x) for x in text.split(",") if x]
+
+
+def main():
+    from execution import PRESETS
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DATA_FOLDER, help="folder with NSE_<STOCK>_<TF>.csv files")
+    parser.add_argument("--from", dest="from_date", default=None, help="start date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", default=None, help="end date (YYYY-MM-DD)")
+    parser.add_argument("--stocks", default="", help="comma separated, default all")
+    parser.add_argument("--timeframes", default="", help="comma separated, default all")
+    parser.add_argument("--ema", default="20", help="EMA periods, e.g. 10,20,50")
+    parser.add_argument("--rsi", default="14", help="RSI periods")
+    parser.add_argument("--st-period", default="10", help="Supertrend periods")
+    parser.add_argument("--st-mult", default="3.0", help="Supertrend multipliers")
+    parser.add_argument("--rsi-buy", type=float, default=30, help="buy when RSI < this")
+    parser.add_argument("--rsi-sell", type=float, default=60, help="sell when RSI > this")
+    parser.add_argument("--buy-rule", default=None,
+                        help='rule text instead of the toggles, e.g. "close > ema(20) and rsi(14) < 30"')
+    parser.add_argument("--sell-rule", default=None, help='e.g. "rsi(14) > 60 or close < ema(20)"')
+    parser.add_argument("--direction", choices=["long", "short", "both"], default="long",
+                        help="both = stop and reverse between long and short")
+    parser.add_argument("--pyramiding", type=int, default=1, help="most units held at once")
+    parser.add_argument("--fill", choices=["close", "next_open"], default="close",
+                        help="fill on the signal bar's close or the next bar's open")
+    parser.add_argument("--costs", choices=list(PRESETS), default="frictionless", help="charges preset")
+    parser.add_argument("--slippage-ticks", type=float, default=0, help="ticks paid per market fill")
+    parser.add_argument("--tick-size", type=float, default=0.05)
+    parser.add_argument("--stop-pct", type=float, default=None, help="stop-loss, percent of the entry")
+    parser.add_argument("--target-pct", type=float, default=None, help="target, percent of the entry")
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--chunksize", type=int, default=1)
+    parser.add_argument("--out", default="batch_results.csv")
+    args = parser.parse_args()
+
+    strategy_rules = {
+        "buy": {**DEFAULT_STRATEGY_RULES["buy"], "rsi_threshold": args.rsi_buy},
+        "sell": {**DEFAULT_STRATEGY_RULES["sell"], "rsi_threshold": args.rsi_sell}
+    }
+    if args.buy_rule or args.sell_rule:
+        # Rule text carries its own indicator settings (see rules.py)
+        strategy_rules = {"buy": args.buy_rule or "False", "sell": args.sell_rule or "False"}
+    strategy_rules.update(direction=args.direction, pyramiding=args.pyramiding)
+    params_list = param_grid(_int_list(args.ema), _int_list(args.rsi),
+                             _int_list(args.st_period), _float_list(args.st_mult))
+    execution = {"preset": args.costs, "fill": args.fill, "slippage_ticks": args.slippage_ticks,
+                 "tick_size": args.tick_size, "stop_pct": args.stop_pct, "target_pct": args.target_pct}
+
+    rows = []
+    t0 = time.perf_counter()
+    for row in iter_batch(args.data, params_list, strategy_rules, args.from_date, args.to_date,
+                          stocks=[s for s in args.stocks.split(",") if s],
+                          timeframes=[t for t in args.timeframes.split(",") if t],
+                          workers=args.workers, chunksize=args.chunksize, execution=execution):
+        rows.append(row)
+        status = f"❌ {row['error']}" if row["error"] else f"P/L {row['total_profit']:.2f}"
+        print(f"[{len(rows)}] {row['stock']} {row['timeframe']} {status}")
+
+    results_df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    results_df.to_csv(args.out, index=False)
+    failed = results_df["error"].notna().sum()
+    print(f"\n✅ {len(results_df)} backtests in {time.perf_counter() - t0:.1f}s "
+          f"({failed} failed) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: handing a symbol's bars to pool workers, pickled vs shared.
+
+For each size a synthetic OHLC frame (plus --extra indicator columns) is
+sent to --workers processes --tasks times, the way a parameter grid fans
+one symbol out:
+
+    pickled   the DataFrame goes into every task tuple (the old batch path)
+    shared    published once with data_plane.SharedPlane; every task
+              carries the SharedHandle and attaches by name
+
+Each worker sums the close column, so the timing is the transport. The
+bytes column is what one task pickles; the sums of both paths are checked
+to agree.
+
+Usage:
+    python benchmarks/bench_data_plane.py --sizes 100000,1000000 --workers 4 --tasks 32
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from data_plane import SharedPlane, attach
+from ohlc_store import OHLCView
+
+
+def synthetic_frame(n_rows, extra, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1500 + np.cumsum(rng.normal(0, 0.5, n_rows))
+    columns = {"open": close + rng.normal(0, 0.2, n_rows), "close": close}
+    columns["high"] = np.maximum(columns["open"], close) + rng.uniform(0, 1, n_rows)
+    columns["low"] = np.minimum(columns["open"], close) - rng.uniform(0, 1, n_rows)
+    for k in range(extra):
+        columns[f"extra_{k}"] = rng.normal(size=n_rows)
+    time_ = pd.date_range("2015-01-01 09:15", periods=n_rows, freq="min", tz="Asia/Kolkata")
+    return pd.DataFrame(columns, index=time_)
+
+
+def pickled_task(df):
+    return float(df["close"].sum())
+
+
+def shared_task(handle):
+    return float(attach(handle).close.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000,5000000", help="comma separated bar counts")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tasks", type=int, default=32, help="tasks per symbol (grid points)")
+    parser.add_argument("--extra", type=int, default=3, help="indicator columns besides OHLC")
+    args = parser.parse_args()
+
+    print(f"{'bars':>12} {'path':>8} {'seconds':>9} {'bytes/task':>12}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        df = synthetic_frame(n, args.extra)
+        time_ = df.index.asi8
+        ohlc = {c: df[c].to_numpy() for c in ("open", "high", "low", "close")}
+        extra = {c: df[c].to_numpy() for c in df.columns if c not in ohlc}
+
+        # The plane before the pool, so the workers share its resource tracker
+        with SharedPlane() as plane, Pool(processes=args.workers) as pool:
+            t0 = time.perf_counter()
+            pickled = pool.map(pickled_task, [df] * args.tasks)
+            pickled_seconds = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            handle = plane.publish(OHLCView(time_, ohlc, str(df.index.tz)), extra)
+            shared = pool.map(shared_task, [handle] * args.tasks)
+            shared_seconds = time.perf_counter() - t0
+
+        assert np.allclose(pickled, shared), "shared bars differ from the pickled frame"
+        print(f"{n:>12,} {'pickled':>8} {pickled_seconds:>9.3f} {len(pickle.dumps(df)):>12,}")
+        print(f"{n:>12,} {'shared':>8} {shared_seconds:>9.3f} {len(pickle.dumps(handle)):>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Benchmark: import time of the library modules, against a budget.
+
+Every pool worker and every CLI run pays the import of the modules it
+touches before doing any work, so the library layer has to stay cheap to
+import and free of side effects. Each module is imported in a fresh
+interpreter under `python -X importtime` (best of --repeat) and the report
+shows:
+
+    ms          cumulative import time of the module and everything it pulls in
+    own ms      the part spent outside numpy / pandas / pyarrow (our code and
+                anything else it drags in)
+    heavy       optional heavy dependencies the import loaded; the library
+                layer should load none of them (streamlit, matplotlib,
+                altair, flask, pandas_ta, pyarrow.parquet)
+
+A module over its budget, or one that loads a heavy dependency, fails the
+run, and so does a slowdown of more than --threshold % against a saved
+baseline.
+
+Usage:
+    python benchmarks/bench_imports.py
+    python benchmarks/bench_imports.py --budget 800 --top 10 --save imports.json
+    python benchmarks/bench_imports.py --baseline imports.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# The library layer, as workers and CLIs import it
+MODULES = ["utils", "indicators", "strategy", "metrics", "jobs", "batch",
+           "backtest_chunked", "walkforward", "portfolio"]
+
+# Never imported by the library layer; only the UI code paths load these
+HEAVY = ["streamlit", "matplotlib", "altair", "flask", "pandas_ta", "pyarrow.parquet"]
+
+# Third-party base every module pays once; reported, not counted in "own ms"
+BASE = ("numpy", "pandas", "pyarrow", "dateutil", "pytz", "tzdata")
+
+# import time: self [us] | cumulative | imported package
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from `-X importtime` output, in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return rows
+
+
+def split_base(rows):
+    """
+    Cumulative us of the outermost BASE imports, plus the rows outside
+    any BASE subtree. importtime lists children before their parent, so
+    the rows are walked in reverse to see each parent first.
+    """
+    base, own_rows, in_base = 0, [], []
+    for row in reversed(rows):
+        name, _, cumulative, depth = row
+        inside = any(in_base[:depth])
+        is_base = name.split(".")[0] in BASE
+        del in_base[depth:]
+        in_base.append(inside or is_base)
+        if is_base and not inside:
+            base += cumulative
+        elif not inside and not is_base:
+            own_rows.append(row)
+    return base, own_rows
+
+
+def import_once(module):
+    """Import `module` in a fresh interpreter; (rows, stdout) of the run."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True,
+                         env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    if out.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{out.stderr.strip().splitlines()[-1]}")
+    return parse_importtime(out.stderr), out.stdout
+
+
+def measure(module, repeat=3, top=5):
+    """Best of `repeat` imports of `module`: totals, heavy modules and the slowest own imports."""
+    best = None
+    for _ in range(repeat):
+        rows, stdout = import_once(module)
+        total = next(cumulative for name, _, cumulative, depth in reversed(rows)
+                     if name == module and depth == 0)
+        if best is None or total < best[1]:
+            best = (rows, total, stdout)
+    rows, total, stdout = best
+
+    names = {name for name, *_ in rows}
+    base, own_rows = split_base(rows)
+    slowest = sorted(own_rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "ms": round(total / 1000, 2),
+        "own_ms": round(max(total - base, 0) / 1000, 2),
+        "heavy": [name for name in HEAVY if name in names],
+        "prints": bool(stdout.strip()),
+        "slowest": [[name, round(own / 1000, 2)] for name, own, _, _ in slowest]
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change vs baseline per module. Returns the modules slower than threshold %."""
+    regressions = []
+    print(f"\n{'module':>17} {'base ms':>9} {'now ms':>9} {'change':>8}")
+    for module, now in results.items():
+        base = baseline.get("results", {}).get(module)
+        if not base or not base["ms"]:
+            continue
+        change = 100.0 * (now["ms"] / base["ms"] - 1)
+        flag = " ⚠️" if change > threshold else ""
+        if flag:
+            regressions.append((module, change))
+        print(f"{module:>17} {base['ms']:>9.1f} {now['ms']:>9.1f} {change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", default=",".join(MODULES), help="comma separated module names")
+    parser.add_argument("--budget", type=float, default=1000.0,
+                        help="cumulative import time allowed per module, in ms")
+    parser.add_argument("--top", type=int, default=3, help="slowest own imports listed per module")
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module, the best one counts")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from an earlier --save to compare against")
+    parser.add_argument("--threshold", type=float, default=25.0,
+                        help="percent slowdown vs baseline that counts as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    print(f"{'module':>17} {'ms':>9} {'own ms':>9}  slowest own imports (self ms)")
+    for module in args.modules.split(","):
+        r = results[module] = measure(module, args.repeat, args.top)
+        slowest = ", ".join(f"{name} {ms:.1f}" for name, ms in r["slowest"])
+        flag = " ⚠️" if r["ms"] > args.budget or r["heavy"] or r["prints"] else ""
+        print(f"{module:>17} {r['ms']:>9.1f} {r['own_ms']:>9.1f}  {slowest}{flag}")
+        if r["ms"] > args.budget:
+            failures.append(f"{module} takes {r['ms']:.0f} ms (budget {args.budget:.0f} ms)")
+        if r["heavy"]:
+            failures.append(f"{module} loads {', '.join(r['heavy'])}")
+        if r["prints"]:
+            failures.append(f"{module} prints on import")
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "budget_ms": args.budget
+        },
+        "results": results
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures += [f"{module} is {change:.0f}% slower than baseline"
+                     for module, change in compare(results, baseline, args.threshold)]
+
+    if failures:
+        sys.exit("❌ " + "\n❌ ".join(failures))
+    print("\n✅ Every module within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: pandas_ta vs the NumPy kernels in kernels.py.
+
+Times ema / rsi / atr / supertrend on synthetic OHLC of each size and checks
+the kernels match pandas_ta to within --tol (NaN warm-up included).
+ta.supertrend walks the series with .iloc and takes minutes on millions of
+bars, so it is only timed on the first --ta-rows bars and extrapolated.
+
+Usage:
+    python benchmarks/bench_kernels.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import kernels
+
+
+def synthetic_ohlc(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 1500 + np.cumsum(rng.normal(0, 0.5, n_rows))
+    high = close + rng.uniform(0, 1, n_rows)
+    low = close - rng.uniform(0, 1, n_rows)
+    high[::97] = low[::97]  # some flat bars, like real 1-minute data
+    return pd.DataFrame({"high": high, "low": low, "close": close})
+
+
+def max_diff(ours, theirs):
+    ours = np.asarray(ours, dtype=float)
+    theirs = np.asarray(theirs, dtype=float)
+    if not (np.isnan(ours) == np.isnan(theirs)).all():
+        return np.inf
+    diff = np.abs(ours - theirs)
+    return np.nanmax(diff) if (~np.isnan(diff)).any() else 0.0
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    import pandas_ta as ta
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--ta-rows", type=int, default=20000,
+                        help="max rows for ta.supertrend (timing is extrapolated beyond)")
+    parser.add_argument("--length", type=int, default=14)
+    parser.add_argument("--multiplier", type=float, default=3.0)
+    parser.add_argument("--tol", type=float, default=1e-9)
+    args = parser.parse_args()
+    length, multiplier = args.length, args.multiplier
+
+    print(f"{'rows':>10} {'indicator':>11} {'pandas_ta s':>12} {'kernel s':>10} {'speedup':>8} {'max diff':>10}")
+    failed = False
+    for n_rows in [int(s) for s in args.sizes.split(",")]:
+        df = synthetic_ohlc(n_rows)
+        high, low, close = df["high"], df["low"], df["close"]
+
+        cases = [
+            ("ema", lambda: ta.ema(close, length), lambda: kernels.ema(close, length), n_rows),
+            ("rsi", lambda: ta.rsi(close, length), lambda: kernels.rsi(close, length), n_rows),
+            ("atr", lambda: ta.atr(high, low, close, length),
+             lambda: kernels.atr(high, low, close, length), n_rows),
+        ]
+        ta_n = min(n_rows, args.ta_rows)
+        head = df.iloc[:ta_n]
+        cases.append((
+            "supertrend",
+            lambda: ta.supertrend(head["high"], head["low"], head["close"], length, multiplier),
+            lambda: kernels.supertrend(high, low, close, length, multiplier),
+            ta_n
+        ))
+
+        for name, ta_fn, kernel_fn, ta_rows in cases:
+            theirs, ta_s = timed(ta_fn)
+            ours, kernel_s = timed(kernel_fn)
+            ta_s *= n_rows / ta_rows
+            if name == "supertrend":
+                diff = max(max_diff(ours[k][:ta_n], theirs.iloc[:, k]) for k in range(4))
+            else:
+                diff = max_diff(ours, theirs)
+            failed |= diff > args.tol
+            mark = "*" if ta_rows < n_rows else " "
+            print(f"{n_rows:>10,} {name:>11} {ta_s:>11.3f}{mark} {kernel_s:>10.3f} "
+                  f"{ta_s / kernel_s:>7.1f}x {diff:>10.2e}")
+
+    print("* pandas_ta time extrapolated from the first --ta-rows bars")
+    if failed:
+        sys.exit(f"❌ kernels differ from pandas_ta by more than {args.tol}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Benchmark: the load -> indicators -> strategy pipeline, stage by stage.
+
+For each size a synthetic 1-minute NSE_BENCH_1.csv is written to a temp
+folder (not timed), then each stage is timed (best of --repeat) in a fresh
+process per size:
+
+    load_csv_cold       utils.load_csv, first call (builds the caches/store)
+    load_csv_warm       utils.load_csv again (memory-mapped store hit)
+    compute_indicators  indicators.compute_indicators, indicator cache cleared
+    supertrend_join     df.join(supertrend columns), as in compute_indicators
+    trade_loop          strategy.signal_ledger + the trades table, the trade
+                        logic apply_strategy runs
+
+The memory of a stage is the peak of what it allocates itself, measured by
+tracemalloc on one extra, untimed run (NumPy and pandas buffers included,
+memory-mapped files not), so earlier stages do not count towards it.
+
+Results (seconds, bars/sec, peak MB) can be saved as a JSON baseline and
+compared against on the next run, so a regression shows up as a diff.
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 10000,100000,1000000 --save baseline.json
+    python benchmarks/bench_pipeline.py --sizes 10000,100000,1000000 --baseline baseline.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+STAGES = ["load_csv_cold", "load_csv_warm", "compute_indicators", "supertrend_join", "trade_loop"]
+
+# Default sidebar checkboxes in App.py
+STRATEGY_RULES = {
+    "buy": {"ema": True, "rsi": True, "rsi_threshold": 30, "supertrend": True},
+    "sell": {"ema": True, "rsi": True, "rsi_threshold": 60, "supertrend": True},
+}
+
+
+def write_synthetic_csv(path, n_rows, seed=0):
+    """n_rows of 1-minute bars in NSE session hours, in the NSE_*.csv layout."""
+    rng = np.random.default_rng(seed)
+    # 375 bars per session (09:15-15:30 IST), one session per business day
+    day = np.arange(n_rows) // 375
+    minute = np.arange(n_rows) % 375
+    days = pd.bdate_range("2015-01-01", periods=int(day[-1]) + 1 if n_rows else 0)
+    time_ = (days[day] + pd.to_timedelta(9 * 60 + 15 + minute, unit="min")).tz_localize("+05:30")
+
+    close = 1500 + np.cumsum(rng.normal(0, 0.5, n_rows))
+    open_ = close + rng.normal(0, 0.2, n_rows)
+    high = np.maximum(open_, close) + rng.uniform(0, 1, n_rows)
+    low = np.minimum(open_, close) - rng.uniform(0, 1, n_rows)
+    pd.DataFrame({
+        "time": time_.strftime("%Y-%m-%dT%H:%M:%S+05:30"),
+        "open": open_.round(2), "high": high.round(2), "low": low.round(2), "close": close.round(2)
+    }).to_csv(path, index=False)
+
+
+def run_stages(csv_path, n_rows, repeat=3):
+    """Time every stage on one file, best of `repeat`. Runs in the child process."""
+    import indicators
+    from data_cache import CACHE_DIR
+    from indicator_cache import CACHE
+    from ohlc_store import STORE_DIR
+    from strategy import signal_ledger
+    from utils import load_csv
+
+    folder = os.path.dirname(csv_path)
+    results = {}
+
+    def timed(stage, fn, setup=None):
+        best = None
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            t0 = time.perf_counter()
+            value = fn()
+            seconds = time.perf_counter() - t0
+            best = seconds if best is None else min(best, seconds)
+
+        # Memory on a separate run: tracing slows the stage down
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[stage] = {
+            "seconds": round(best, 6),
+            "bars_per_sec": round(n_rows / best) if best > 0 else None,
+            "peak_mb": round(peak / 2**20, 1)
+        }
+        return value
+
+    def drop_file_caches():
+        for name in (CACHE_DIR, STORE_DIR):
+            shutil.rmtree(os.path.join(folder, name), ignore_errors=True)
+
+    def trade_loop(frame):
+        ledger = signal_ledger(frame, STRATEGY_RULES, frame["ema"], frame["rsi"], frame["SUPERTd_10_3.0"])
+        return ledger.to_frame()
+
+    # The pipeline prints progress; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        timed("load_csv_cold", lambda: load_csv(csv_path, None, None), setup=drop_file_caches)
+        df = timed("load_csv_warm", lambda: load_csv(csv_path, None, None))
+        timed("compute_indicators", lambda: indicators.compute_indicators(df.copy()), setup=CACHE.clear)
+
+        frame = df.set_index("time")
+        frame["ema"] = indicators.ema(frame["close"], 20)
+        frame["rsi"] = indicators.rsi(frame["close"], 14)
+        st_df = indicators.supertrend(frame["high"], frame["low"], frame["close"], 10, 3.0)
+        frame = timed("supertrend_join", lambda: frame.join(st_df))
+        timed("trade_loop", lambda: trade_loop(frame))
+
+    return results
+
+
+def run_size(n_rows, workdir, repeat):
+    """Write the CSV for one size and time it in a child process."""
+    csv_path = os.path.join(workdir, f"{n_rows}", "NSE_BENCH_1.csv")
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    write_synthetic_csv(csv_path, n_rows)
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", csv_path, str(n_rows),
+                          "--repeat", str(repeat)],
+                         check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """Print the change vs baseline per stage. Returns the stages slower than threshold %."""
+    regressions = []
+    print(f"\n{'rows':>12} {'stage':>19} {'base s':>10} {'now s':>10} {'change':>8}")
+    for size, stages in results.items():
+        for stage, now in stages.items():
+            base = baseline.get("results", {}).get(size, {}).get(stage)
+            if not base or not base["seconds"]:
+                continue
+            change = 100.0 * (now["seconds"] / base["seconds"] - 1)
+            flag = " ⚠️" if change > threshold else ""
+            if flag:
+                regressions.append((size, stage, change))
+            print(f"{int(size):>12,} {stage:>19} {base['seconds']:>10.4f} {now['seconds']:>10.4f} "
+                  f"{change:>+7.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000,10000000",
+                        help="comma separated bar counts")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from an earlier --save to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="percent slowdown vs baseline that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best one counts")
+    parser.add_argument("--child", nargs=2, metavar=("CSV", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        csv_path, n_rows = args.child
+        print(json.dumps(run_stages(csv_path, int(n_rows), args.repeat)))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    results = {}
+    try:
+        print(f"{'rows':>12} {'stage':>19} {'seconds':>10} {'bars/sec':>14} {'peak MB':>10}")
+        for n_rows in sizes:
+            results[str(n_rows)] = run_size(n_rows, workdir, args.repeat)
+            for stage in STAGES:
+                r = results[str(n_rows)][stage]
+                rate = f"{r['bars_per_sec']:,}" if r["bars_per_sec"] else "-"
+                print(f"{n_rows:>12,} {stage:>19} {r['seconds']:>10.4f} {rate:>14} {r['peak_mb']:>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.platform()
+        },
+        "results": results
+    }
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Saved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            sys.exit(f"❌ {len(regressions)} stage(s) more than {args.threshold}% slower than baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: the long / short / flat position book (signals.resolve_positions).
+
+Draws random buy / sell masks with the given signal density, runs every
+direction with and without pyramiding, and times the whole-array state
+machine. Each book is checked against a plain per-bar state machine on
+the first --check-rows bars.
+
+Usage:
+    python benchmarks/bench_positions.py --sizes 1000000,10000000 --density 0.01
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from signals import LONG, SHORT, resolve_positions
+
+BOOKS = [("long", 1), ("long", 3), ("short", 1), ("both", 1), ("both", 3)]
+
+
+def reference_positions(buy, sell, direction, pyramiding, start=1):
+    """The same book as one loop over the bars, ordered like resolve_positions."""
+    trades = []
+    units = []
+    side = 0
+    for i in range(start, len(buy)):
+        if units:
+            entry, leave = (buy[i], sell[i]) if side == LONG else (sell[i], buy[i])
+            if leave:
+                trades += [(u, i, side) for u in units]
+                units = [i] if direction == "both" else []
+                side = -side
+            elif entry and len(units) < pyramiding:
+                units.append(i)
+        elif direction != "short" and buy[i]:
+            side, units = LONG, [i]
+        elif direction != "long" and sell[i]:
+            side, units = SHORT, [i]
+    return trades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100000,1000000,10000000", help="comma separated bar counts")
+    parser.add_argument("--density", type=float, default=0.01, help="share of bars with a buy (and a sell)")
+    parser.add_argument("--check-rows", type=int, default=200000,
+                        help="bars checked against the per-bar loop")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'bars':>12} {'book':>10} {'seconds':>9} {'trades':>10}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        buy = rng.random(n) < args.density
+        sell = rng.random(n) < args.density
+        for direction, pyramiding in BOOKS:
+            t0 = time.perf_counter()
+            entry_idx, exit_idx, side = resolve_positions(buy, sell, direction, pyramiding)
+            seconds = time.perf_counter() - t0
+            n_trades = len(entry_idx)
+
+            m = min(n, args.check_rows)
+            entry_idx, exit_idx, side = resolve_positions(buy[:m], sell[:m], direction, pyramiding)
+            got = list(zip(entry_idx.tolist(), exit_idx.tolist(), side.tolist()))
+            assert got == reference_positions(buy[:m], sell[:m], direction, pyramiding), \
+                f"{direction} x{pyramiding}: book differs from the per-bar loop"
+
+            book = f"{direction} x{pyramiding}"
+            print(f"{n:>12,} {book:>10} {seconds:>9.3f} {n_trades:>10,}")
+
+
+if __name__ == "__main__":
+    main()
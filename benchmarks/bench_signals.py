@@ -0,0 +1,147 @@
+"""
+Benchmark: per-row `df.iloc[i]` trade loop vs the vectorized signal engine.
+
+Tiles NSE_RELIANCE_5.csv up to the requested sizes and times
+strategy.apply_strategy itself (indicators included, indicator cache
+cleared) against the legacy loop, which is given the same EMA/RSI/Supertrend
+columns precomputed. The legacy loop is only timed on the first
+--legacy-rows bars (it takes minutes on millions of rows) and its per-bar
+cost is extrapolated; on those bars both must find the same trades.
+
+Usage:
+    python benchmarks/bench_signals.py --csv stock_data/NSE_RELIANCE_5.csv
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import indicators
+from indicator_cache import CACHE
+from strategy import apply_strategy
+
+# The app's EMA + RSI rules with thresholds that trade on the tiled bars
+# (at 30 / 60 they never fire there, and empty tables would prove nothing)
+STRATEGY_RULES = {
+    "buy": {"ema": True, "rsi": True, "rsi_threshold": 45, "supertrend": False},
+    "sell": {"ema": True, "rsi": True, "rsi_threshold": 55, "supertrend": False},
+}
+
+
+def legacy_trades(df, strategy_rules):
+    """The trade loop exactly as it was in strategy.apply_strategy."""
+    trades = []
+    in_trade = False
+    entry_price = None
+    entry_time = None
+
+    for i in range(1, len(df)):
+        row = df.iloc[i]
+
+        if not in_trade:
+            buy_conditions = []
+            if strategy_rules["buy"].get("ema", False):
+                buy_conditions.append(row['close'] > row['ema'])
+            if strategy_rules["buy"].get("rsi", False):
+                buy_conditions.append(row['rsi'] < strategy_rules["buy"].get("rsi_threshold", 30))
+            if strategy_rules["buy"].get("supertrend", False):
+                buy_conditions.append(row['supertrend_signal'] == 1)
+            if buy_conditions and all(buy_conditions):
+                entry_price = row['close']
+                entry_time = row.name
+                in_trade = True
+        else:
+            sell_conditions = []
+            if strategy_rules["sell"].get("ema", False):
+                sell_conditions.append(row['close'] < row['ema'])
+            if strategy_rules["sell"].get("rsi", False):
+                sell_conditions.append(row['rsi'] > strategy_rules["sell"].get("rsi_threshold", 60))
+            if strategy_rules["sell"].get("supertrend", False):
+                sell_conditions.append(row['supertrend_signal'] == -1)
+            if sell_conditions and any(sell_conditions):
+                exit_price = row['close']
+                trades.append({
+                    "Entry Time": entry_time,
+                    "Exit Time": row.name,
+                    "Entry Price": entry_price,
+                    "Exit Price": exit_price,
+                    "P/L": round(exit_price - entry_price, 2)
+                })
+                in_trade = False
+
+    return pd.DataFrame(trades)
+
+
+def vectorized_trades(ohlc, strategy_rules):
+    """strategy.apply_strategy's trades table, indicators computed from scratch."""
+    CACHE.clear()
+    trades_df, _, _ = apply_strategy(ohlc, strategy_rules)
+    return trades_df
+
+
+def tiled_frame(base, n_rows):
+    """Repeat the base OHLC bars until there are n_rows of them."""
+    reps = -(-n_rows // len(base))
+    return pd.DataFrame({
+        col: np.tile(base[col].to_numpy(dtype=float), reps)[:n_rows]
+        for col in ["open", "high", "low", "close"]
+    })
+
+
+def with_indicators(df):
+    """The EMA/RSI/Supertrend columns apply_strategy computes, for the legacy loop."""
+    df = df.copy()
+    df['ema'] = indicators.ema(df['close'], length=20)
+    df['rsi'] = indicators.rsi(df['close'], length=14)
+    st_df = indicators.supertrend(df['high'], df['low'], df['close'], length=10, multiplier=3.0)
+    df['supertrend_signal'] = st_df['SUPERTd_10_3.0']
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=os.path.join("stock_data", "NSE_RELIANCE_5.csv"))
+    parser.add_argument("--sizes", default="10000,100000,1000000,10000000",
+                        help="comma separated row counts")
+    parser.add_argument("--legacy-rows", type=int, default=20000,
+                        help="max rows to run through the legacy loop")
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.csv)
+    base.columns = [col.strip().lower() for col in base.columns]
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print(f"{'rows':>12} {'legacy s':>12} {'vector s':>10} {'speedup':>9} {'trades':>8}")
+    for n_rows in sizes:
+        df = tiled_frame(base, n_rows)
+
+        t0 = time.perf_counter()
+        fast = vectorized_trades(df, STRATEGY_RULES)
+        vector_s = time.perf_counter() - t0
+
+        legacy_n = min(n_rows, args.legacy_rows)
+        head = df.iloc[:legacy_n]
+        prepared = with_indicators(head)
+        t0 = time.perf_counter()
+        slow = legacy_trades(prepared, STRATEGY_RULES)
+        legacy_s = (time.perf_counter() - t0) * n_rows / legacy_n
+
+        # Same trades on the prefix both engines saw
+        check = vectorized_trades(head, STRATEGY_RULES)
+        assert len(slow) > 0, "no trades on the checked bars, the comparison would prove nothing"
+        pd.testing.assert_frame_equal(slow, check, check_exact=True)
+
+        mark = "*" if legacy_n < n_rows else " "
+        print(f"{n_rows:>12,} {legacy_s:>11.2f}{mark} {vector_s:>10.3f} "
+              f"{legacy_s / vector_s:>8.0f}x {len(fast):>8,}")
+
+    print("* legacy time extrapolated from the first --legacy-rows bars")
+
+
+if __name__ == "__main__":
+    main()
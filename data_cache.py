@@ -0,0 +1,202 @@
+"""
+Shared data-access layer for the NSE_*.csv files.
+
+Each CSV is parsed once into a Parquet file under `<csv folder>/.cache/`:
+tz-aware int64 timestamps in a `time` column, float64 OHLC, written in row
+groups so a date-window load only reads the row groups that overlap it.
+The cache records the source file's mtime and size and is rebuilt as soon
+as either changes.
+
+pyarrow is optional: without it every load falls back to parsing the CSV.
+It is imported on the first cache access, not with this module; warm
+loads from the memory-mapped store (ohlc_store.py) never need it.
+"""
+import os
+
+import pandas as pd
+
+_PARQUET = None
+
+CACHE_DIR = ".cache"
+CACHE_VERSION = b"1"
+ROW_GROUP_SIZE = 65_536
+
+DATETIME_COLUMNS = ['time', 'datetime', 'date', 'timestamp']
+
+
+def _parquet():
+    """(pyarrow, pyarrow.parquet) on first use, (None, None) without pyarrow."""
+    global _PARQUET
+    if _PARQUET is None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            _PARQUET = (pa, pq)
+        except ImportError:  # pragma: no cover - optional dependency
+            _PARQUET = (None, None)
+    return _PARQUET
+
+
+def cache_path(filepath):
+    """Where the columnar copy of `filepath` lives."""
+    folder, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(folder, CACHE_DIR, os.path.splitext(name)[0] + ".parquet")
+
+
+def _source_stamp(filepath):
+    stat = os.stat(filepath)  # FileNotFoundError for a missing CSV, like pd.read_csv
+    return {
+        b"source_mtime_ns": str(stat.st_mtime_ns).encode(),
+        b"source_size": str(stat.st_size).encode(),
+        b"cache_version": CACHE_VERSION
+    }
+
+
+def read_source_csv(filepath):
+    """
+    Parse the CSV into the typed layout the cache stores: lower-case column
+    names, a tz-aware 'time' column and float64 prices.
+    """
+    return normalize_frame(pd.read_csv(filepath))
+
+
+def normalize_frame(df):
+    """read_source_csv's typing applied to an already parsed frame (or chunk)."""
+    df.columns = [col.strip().lower() for col in df.columns]
+
+    datetime_col = next((col for col in DATETIME_COLUMNS if col in df.columns), None)
+    if datetime_col is None:
+        raise ValueError("No valid datetime column found in CSV.")
+
+    df['time'] = pd.to_datetime(df[datetime_col], format="ISO8601")
+    if datetime_col != 'time':
+        df = df.drop(columns=[datetime_col])
+
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        if col in df.columns:
+            df[col] = df[col].astype('float64')
+
+    return df[['time'] + [col for col in df.columns if col != 'time']]
+
+
+def is_fresh(filepath):
+    """True when the cache exists and was built from the current CSV."""
+    path = cache_path(filepath)
+    if not os.path.exists(path):
+        return False
+    _, pq = _parquet()
+    if pq is None:
+        return False
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except Exception:
+        return False
+    stamp = _source_stamp(filepath)
+    return all(metadata.get(key) == value for key, value in stamp.items())
+
+
+def build_cache(filepath):
+    """(Re)build the Parquet cache of `filepath`. Returns the parsed DataFrame."""
+    stamp = _source_stamp(filepath)
+    df = read_source_csv(filepath)
+    pa, pq = _parquet()
+    if pq is None:
+        return df
+
+    path = cache_path(filepath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **stamp})
+
+    # Write then rename, so parallel workers never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp_path, path)
+    return df
+
+
+def date_bounds(from_date, to_date, tz):
+    """
+    from_date..to_date as tz-aware timestamps covering both whole days,
+    the same window utils.load_csv has always used. None leaves a side open.
+    """
+    start = pd.Timestamp(from_date) if from_date is not None else None
+    end = (pd.Timestamp(to_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+           if to_date is not None else None)
+    if tz is not None:
+        start = start.tz_localize(tz) if start is not None and start.tz is None else start
+        end = end.tz_localize(tz) if end is not None and end.tz is None else end
+    return start, end
+
+
+def load_ohlc(filepath, from_date=None, to_date=None, columns=None):
+    """
+    Load `filepath` through the cache, keeping only rows between from_date
+    and to_date (whole days, inclusive). `columns` limits which columns are
+    read; 'time' is always included.
+
+    Returns a DataFrame with a tz-aware 'time' column and a fresh RangeIndex.
+    """
+    if columns is not None:
+        columns = ['time'] + [col for col in columns if col != 'time']
+
+    _, pq = _parquet()
+    if pq is None:
+        df = read_source_csv(filepath)
+    elif not is_fresh(filepath):
+        df = build_cache(filepath)
+    else:
+        df = None
+
+    if df is not None:
+        start, end = date_bounds(from_date, to_date, df['time'].dt.tz)
+        if start is not None:
+            df = df[df['time'] >= start]
+        if end is not None:
+            df = df[df['time'] <= end]
+        return (df[columns] if columns else df).reset_index(drop=True)
+
+    path = cache_path(filepath)
+    tz = pq.read_schema(path).field('time').type.tz
+    start, end = date_bounds(from_date, to_date, tz)
+
+    # Row-group statistics on 'time' let pyarrow skip everything outside the window
+    filters = []
+    if start is not None:
+        filters.append(('time', '>=', start))
+    if end is not None:
+        filters.append(('time', '<=', end))
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    return table.to_pandas()
+
+
+def iter_ohlc(filepath, chunk_rows=1_000_000, from_date=None, to_date=None, columns=None):
+    """
+    load_ohlc in pieces: yields DataFrames of at most `chunk_rows` rows, in
+    time order, so memory is bounded by the chunk size rather than the file.
+    Reads the Parquet cache batch by batch when it is fresh, otherwise the
+    CSV chunk by chunk (the cache is not built here: that needs the whole file).
+    """
+    if columns is not None:
+        columns = ['time'] + [col for col in columns if col != 'time']
+
+    if is_fresh(filepath):
+        _, pq = _parquet()
+        batches = pq.ParquetFile(cache_path(filepath)).iter_batches(batch_size=chunk_rows, columns=columns)
+        chunks = (batch.to_pandas() for batch in batches)
+    else:
+        chunks = (normalize_frame(chunk) for chunk in pd.read_csv(filepath, chunksize=chunk_rows))
+
+    bounds = None
+    for df in chunks:
+        if bounds is None:
+            bounds = date_bounds(from_date, to_date, df['time'].dt.tz)
+        start, end = bounds
+        if start is not None:
+            df = df[df['time'] >= start]
+        if end is not None:
+            if len(df) and df['time'].iloc[0] > end:
+                return
+            df = df[df['time'] <= end]
+        if len(df):
+            yield (df[columns] if columns else df).reset_index(drop=True)
@@ -0,0 +1,191 @@
+"""
+Shared-memory data plane for multi-process backtests.
+
+Each symbol's bars live in one multiprocessing.shared_memory segment:
+the int64 `time` column, the float64 price columns and any precomputed
+indicator columns, packed back to back. Processes pass each other a
+SharedHandle (the segment name and its column layout, a few hundred
+bytes) and attach zero-copy NumPy views by name, so no DataFrame is
+pickled across a process boundary and the bars exist once in memory no
+matter how many workers read them.
+
+    with SharedPlane() as plane:                       # the owning process
+        handle = plane.publish(load_view(path), {"ema_20": ema})
+        pool.map(work, [handle, ...])
+
+    def work(handle):                                  # any worker
+        view = attach(handle)                          # an OHLCView, read-only
+        view.close, view["ema_20"]
+
+The process that creates the segments owns them: release() or close()
+(or leaving the with-block) unlinks them. Create the plane before the
+worker pool, so that forked workers report their attachments to the
+owner's resource tracker instead of starting their own, which would
+"clean up" the segments when the worker exits. A worker keeps its last few
+attachments mapped (MAX_ATTACHED), so consecutive tasks on the same
+symbol attach once; attach() is cheap either way, it maps, never copies.
+Columns can also be filled by another process: create() reserves the
+segment and fill() maps it writable.
+"""
+import os
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from ohlc_store import OHLCView
+
+# Segments a process keeps mapped after attach(), most recent first
+MAX_ATTACHED = 2
+
+
+class SharedHandle(namedtuple("SharedHandle", ["name", "rows", "columns", "tz"])):
+    """
+    Where a symbol's bars live: segment `name`, `rows` rows, `columns` as
+    (column, dtype) pairs in storage order (time first) and the timezone.
+    """
+    __slots__ = ()
+
+
+_ATTACHED = OrderedDict()  # segment name -> (SharedMemory, OHLCView)
+
+
+def _layout(handle):
+    """(column, dtype, byte offset) of every column of the segment."""
+    offset = 0
+    for column, dtype in handle.columns:
+        dtype = np.dtype(dtype)
+        yield column, dtype, offset
+        offset += handle.rows * dtype.itemsize
+
+
+def _segment_size(rows, columns):
+    return max(sum(rows * np.dtype(dtype).itemsize for _, dtype in columns), 1)
+
+
+def _open(name):
+    """Attach an existing segment without handing it to this process's resource tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _arrays(handle, shm, writable=False):
+    arrays = {}
+    for column, dtype, offset in _layout(handle):
+        array = np.ndarray((handle.rows,), dtype=dtype, buffer=shm.buf, offset=offset)
+        array.flags.writeable = writable
+        arrays[column] = array
+    return arrays
+
+
+def _close(shm):
+    try:
+        shm.close()
+    except BufferError:
+        pass  # a caller still holds a view; the mapping goes with the last one
+
+
+class SharedPlane:
+    """The segments one process publishes (see the module docstring)."""
+
+    def __init__(self):
+        self.segments = {}  # name -> SharedMemory
+        if os.name == "posix":
+            resource_tracker.ensure_running()  # shared with pools forked from here on
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def nbytes(self):
+        return sum(shm.size for shm in self.segments.values())
+
+    def create(self, rows, columns, tz=None):
+        """
+        A zeroed segment for `rows` rows of `columns` ((name, dtype) pairs,
+        "time" first); fill it with fill(). Returns its SharedHandle.
+        """
+        columns = tuple((column, np.dtype(dtype).str) for column, dtype in columns)
+        shm = shared_memory.SharedMemory(create=True, size=_segment_size(rows, columns))
+        self.segments[shm.name] = shm
+        return SharedHandle(shm.name, int(rows), columns, tz)
+
+    def publish(self, view, extra=None):
+        """
+        Copy an OHLCView (e.g. from ohlc_store.load_view) and `extra`
+        columns ({name: array} of the same length) into a new segment.
+        Returns its SharedHandle.
+        """
+        extra = extra or {}
+        columns = [("time", np.int64)] + [(column, np.float64) for column in view.columns]
+        columns += [(column, np.asarray(values).dtype) for column, values in extra.items()]
+        handle = self.create(len(view), columns, view.tz)
+        arrays = _arrays(handle, self.segments[handle.name], writable=True)
+        arrays["time"][:] = view.time
+        for column, values in {**view.columns, **extra}.items():
+            arrays[column][:] = values
+        return handle
+
+    def release(self, handle):
+        """Unlink one segment; workers that still map it keep their views until they let go."""
+        shm = self.segments.pop(handle.name, None)
+        if shm is not None:
+            _close(shm)
+            shm.unlink()
+
+    def close(self):
+        """Unlink every segment of this plane."""
+        for name in list(self.segments):
+            shm = self.segments.pop(name)
+            _close(shm)
+            shm.unlink()
+
+
+def _drop(name):
+    shm, view = _ATTACHED.pop(name)
+    del view  # release the views first, or the mapping cannot close
+    _close(shm)
+
+
+def attach(handle):
+    """Read-only, zero-copy OHLCView of a published segment (extra columns included)."""
+    if handle.name in _ATTACHED:
+        _ATTACHED.move_to_end(handle.name, last=False)
+        return _ATTACHED[handle.name][1]
+    shm = _open(handle.name)
+    arrays = _arrays(handle, shm)
+    view = OHLCView(arrays.pop("time"), arrays, handle.tz)
+    _ATTACHED[handle.name] = (shm, view)
+    _ATTACHED.move_to_end(handle.name, last=False)
+    while len(_ATTACHED) > MAX_ATTACHED:
+        _drop(next(reversed(_ATTACHED)))
+    return view
+
+
+def detach(handle=None):
+    """Drop this process's mapping of `handle` (default: of every segment)."""
+    names = list(_ATTACHED) if handle is None else [handle.name]
+    for name in names:
+        if name in _ATTACHED:
+            _drop(name)
+
+
+@contextmanager
+def fill(handle):
+    """Writable {column: array} views of a segment, e.g. for a worker to compute columns into."""
+    shm = _open(handle.name)
+    arrays = _arrays(handle, shm, writable=True)
+    try:
+        yield arrays
+    finally:
+        arrays.clear()
+        _close(shm)
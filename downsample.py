@@ -0,0 +1,123 @@
+"""
+Downsampling of long series before they are charted.
+
+A chart cannot show more points than it has pixels across, so millions of
+bars are cut down to a few thousand first, keeping what the eye would
+see:
+
+- minmax_indices: split the series into equal buckets (one per pixel
+  column) and keep the first, lowest and highest point of each. Every
+  spike survives, and it is a handful of vectorized passes.
+- lttb_indices: Largest-Triangle-Three-Buckets. One point per bucket, the
+  one that best keeps the shape of the line. It looks smoother than
+  min/max at the same point count, but it can drop isolated spikes and
+  needs finite values.
+
+Both return sorted row positions, so several columns can be cut at the
+same rows and stay aligned. downsample_frame() does that for the columns
+of a DataFrame, sized to the pixel width of the chart.
+
+    keep = minmax_indices(equity, n_buckets=800)
+    ax.plot(time[keep], equity[keep])
+
+    st.line_chart(downsample_frame(df, ["close", "ema20"], width=1200).set_index("time"))
+"""
+import numpy as np
+import pandas as pd
+
+# Vega-Lite / Altair refuse to embed more rows than this by default
+ALTAIR_MAX_ROWS = 5000
+
+
+def _bucket_edges(n, n_buckets):
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Positions of the first, min and max point of each of `n_buckets` equal
+    buckets (at most 3 per bucket, plus the last point). NaNs are skipped;
+    a bucket that is all NaN keeps its first point.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 3 * n_buckets or n_buckets < 1:
+        return np.arange(n)
+
+    edges = _bucket_edges(n, n_buckets)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+    bucket = np.repeat(np.arange(n_buckets), sizes)
+    with np.errstate(invalid="ignore"):
+        lows = np.fmin.reduceat(y, starts)
+        highs = np.fmax.reduceat(y, starts)
+
+    def first_match(target):
+        hits = np.flatnonzero(y == np.repeat(target, sizes))
+        _, first = np.unique(bucket[hits], return_index=True)
+        return hits[first]
+
+    keep = np.concatenate((starts, first_match(lows), first_match(highs), [n - 1]))
+    return np.unique(keep)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions of `n_out` points picked by Largest-Triangle-Three-Buckets
+    (always including the first and last point). x and y must be finite.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Mean of every bucket (the "next bucket" of the triangle), last point appended
+    sizes = np.diff(edges)
+    mean_x = np.r_[np.add.reduceat(x[:n - 1], edges[:-1]) / sizes, x[-1]]
+    mean_y = np.r_[np.add.reduceat(y[:n - 1], edges[:-1]) / sizes, y[-1]]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the area of the triangle (point a, candidate, mean of the next bucket)
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (mean_y[i + 1] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def downsample_frame(df, columns, width, method="minmax", x="time", max_rows=None):
+    """
+    The rows of `df` needed to draw `columns` on a chart `width` pixels
+    wide: one min/max bucket (or LTTB point) per pixel column for each
+    series, the union of their rows. `max_rows` caps the result (e.g.
+    ALTAIR_MAX_ROWS) by using fewer buckets. Small frames come back whole.
+    """
+    columns = list(columns)
+    n = len(df)
+    per_bucket = 1 + 2 * len(columns) if method == "minmax" else len(columns)
+    buckets = max(int(width), 1)
+    if max_rows:
+        buckets = min(buckets, max(max_rows // max(per_bucket, 1), 1))
+    if n <= buckets * per_bucket:
+        return df
+
+    if method == "minmax":
+        keeps = [minmax_indices(df[col].to_numpy(dtype=float), buckets) for col in columns]
+    elif method == "lttb":
+        x_values = df[x] if x in df.columns else df.index
+        x_values = (pd.DatetimeIndex(x_values).asi8 if pd.api.types.is_datetime64_any_dtype(x_values)
+                    else np.asarray(x_values, dtype=float))
+        # LTTB needs finite values: indicator warm-up NaNs take the nearest value
+        keeps = [lttb_indices(x_values, df[col].ffill().bfill().fillna(0.0).to_numpy(dtype=float), buckets)
+                 for col in columns]
+    else:
+        raise ValueError(f"unknown downsampling method {method!r}")
+    return df.iloc[np.unique(np.concatenate(keeps))]
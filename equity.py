@@ -0,0 +1,81 @@
+"""
+Bar-level position and mark-to-market equity of a backtest.
+
+The trades of a ledger become a position per bar: the number of units
+held from each entry bar up to its exit bar, negative for shorts. That is a cumulative sum of
++qty at the entry and -qty at the exit, a vectorized forward fill with no
+loop over trades. Equity is the running sum of position x bar-to-bar
+change in close, so it moves on every bar a trade is open. The
+trade-exit curve (cumsum of P/L) hides the drawdowns inside trades.
+
+    position = position_vector(ledger["entry_idx"], ledger["exit_idx"], len(close))
+    equity = mark_to_market(close, position)
+    curve = equity_frame(time, position, equity, points=1600)   # ready to chart
+
+ledger_equity() books the part of each trade's P/L that the closes do
+not explain (fills away from the close, slippage, costs, the 2-place
+rounding) on its exit bar, so that at each exit the equity equals the
+cumulative P/L of the ledger up to that trade.
+"""
+import numpy as np
+import pandas as pd
+
+from downsample import minmax_indices
+
+
+def position_vector(entry_idx, exit_idx, n, quantity=1):
+    """
+    Units held at the close of each of `n` bars: `quantity` (scalar or one
+    per trade, negative when short) from each entry bar until the bar
+    before its exit.
+    """
+    entry_idx = np.asarray(entry_idx, dtype=np.int64)
+    quantity = np.broadcast_to(np.asarray(quantity, dtype=np.float64), entry_idx.shape)
+    delta = np.bincount(np.concatenate((entry_idx, np.asarray(exit_idx, dtype=np.int64))),
+                        weights=np.concatenate((quantity, -quantity)), minlength=n + 1)
+    return np.cumsum(delta[:n])
+
+
+def mark_to_market(close, position, initial=0.0):
+    """Equity at every bar: initial + running sum of position[i-1] * (close[i] - close[i-1])."""
+    close = np.asarray(close, dtype=np.float64)
+    equity = np.empty(len(close), dtype=np.float64)
+    if not len(close):
+        return equity
+    equity[0] = 0.0
+    np.multiply(position[:-1], np.diff(close), out=equity[1:])
+    np.cumsum(equity, out=equity)
+    equity += initial
+    return equity
+
+
+def ledger_equity(ledger, close, quantity=1, initial=0.0):
+    """(position, equity) of a TradeLedger on the close series it ran on."""
+    close = np.asarray(close, dtype=np.float64)
+    entry_idx, exit_idx = ledger["entry_idx"], ledger["exit_idx"]
+    units = quantity * ledger["side"]
+    position = position_vector(entry_idx, exit_idx, len(close), units)
+    equity = mark_to_market(close, position, initial)
+    if len(exit_idx):
+        residual = ledger["pl"] - units * (close[exit_idx] - close[entry_idx])
+        equity += np.cumsum(np.bincount(exit_idx, weights=residual, minlength=len(close)))
+    return position, equity
+
+
+def equity_frame(time, position, equity, points=None):
+    """
+    time / position / equity / drawdown as a DataFrame, cut to about
+    `points` rows (min/max per bucket of equity and drawdown) when given.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    drawdown = equity - np.maximum.accumulate(equity) if len(equity) else equity
+    keep = slice(None)
+    if points:
+        buckets = max(points // 3, 1)
+        keep = np.union1d(minmax_indices(equity, buckets), minmax_indices(drawdown, buckets))
+    return pd.DataFrame({
+        "time": time[keep],
+        "position": np.asarray(position)[keep],
+        "equity": equity[keep],
+        "drawdown": drawdown[keep]
+    })
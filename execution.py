@@ -0,0 +1,221 @@
+"""
+Execution model: how signals become fills, and what the fills cost.
+
+resolve_positions() gives the bars where the rules opened and closed;
+fill_trades() turns them into realistic trades, all as array operations
+over the entry / exit index arrays (no loop per trade):
+
+- fill="close" fills on the signal bar's close (the old behaviour),
+  fill="next_open" on the open of the bar after the signal;
+- slippage_ticks x tick_size is paid on every market fill (entries,
+  signal exits, stop exits), against the trade;
+- stop_pct / target_pct close the trade on the first bar whose low /
+  high reaches the level (percent of the entry fill). A bar that opens
+  past a level fills at its open. When one bar reaches both, the stop is
+  assumed first. Targets are limit orders and pay no slippage;
+- brokerage (fixed per order, plus a percentage, optionally capped),
+  STT, exchange / SEBI charges, stamp duty and GST on brokerage and
+  charges are taken from each trade's P/L.
+
+    model = ExecutionModel.preset("nse_intraday", fill="next_open", slippage_ticks=1, stop_pct=0.5)
+    ledger = execute(entry_idx, exit_idx, df, model)        # P/L net of costs, ledger["costs"]
+
+A trade closed by its stop or target is not replaced before the exit
+signal that would have closed it; the rules re-arm after that bar, like a
+desk that sits out the rest of a failed setup.
+
+The presets use typical discount-broker rates for NSE equity at the time
+of writing; check them against your contract notes.
+"""
+import numpy as np
+
+from ledger import TradeLedger, index_times
+
+FILLS = ("close", "next_open")
+
+# Why a trade was closed (fill_trades' "reason")
+SIGNAL, STOP, TARGET = 0, 1, 2
+
+PRESETS = {
+    "frictionless": {},
+    # 0.03% or Rs 20 per order, whichever is lower; STT 0.025% on the sell side
+    "nse_intraday": {"brokerage_pct": 0.03, "brokerage_cap": 20.0, "stt_sell_pct": 0.025,
+                     "exchange_pct": 0.00297, "sebi_pct": 0.0001, "stamp_buy_pct": 0.003,
+                     "gst_pct": 18.0},
+    # No brokerage; STT 0.1% on both sides
+    "nse_delivery": {"stt_buy_pct": 0.1, "stt_sell_pct": 0.1, "exchange_pct": 0.00297,
+                     "sebi_pct": 0.0001, "stamp_buy_pct": 0.015, "gst_pct": 18.0},
+}
+
+
+class ExecutionModel:
+    """Fill rule, slippage, costs (percentages in percent) and stop / target. See the module docstring."""
+
+    def __init__(self, fill="close", quantity=1, slippage_ticks=0, tick_size=0.05,
+                 brokerage=0.0, brokerage_pct=0.0, brokerage_cap=None,
+                 stt_buy_pct=0.0, stt_sell_pct=0.0, exchange_pct=0.0, sebi_pct=0.0,
+                 stamp_buy_pct=0.0, gst_pct=0.0, stop_pct=None, target_pct=None):
+        if fill not in FILLS:
+            raise ValueError(f"fill must be one of {FILLS}, got {fill!r}")
+        self.fill = fill
+        self.quantity = quantity
+        self.slippage_ticks = slippage_ticks
+        self.tick_size = tick_size
+        self.brokerage = brokerage
+        self.brokerage_pct = brokerage_pct
+        self.brokerage_cap = brokerage_cap
+        self.stt_buy_pct = stt_buy_pct
+        self.stt_sell_pct = stt_sell_pct
+        self.exchange_pct = exchange_pct
+        self.sebi_pct = sebi_pct
+        self.stamp_buy_pct = stamp_buy_pct
+        self.gst_pct = gst_pct
+        self.stop_pct = stop_pct
+        self.target_pct = target_pct
+
+    @classmethod
+    def preset(cls, name, **overrides):
+        """A model with the charges of PRESETS[name], plus any other settings."""
+        if name not in PRESETS:
+            raise ValueError(f"unknown execution preset {name!r}, expected one of {list(PRESETS)}")
+        return cls(**{**PRESETS[name], **overrides})
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        defaults = vars(ExecutionModel())
+        settings = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if v != defaults[k])
+        return f"ExecutionModel({settings})"
+
+    def order_brokerage(self, value):
+        brokerage = self.brokerage + value * (self.brokerage_pct / 100)
+        if self.brokerage_cap is not None:
+            brokerage = np.minimum(brokerage, self.brokerage_cap)
+        return brokerage
+
+    def charges(self, buy_value, sell_value):
+        """Total cost of round trips with these buy-leg and sell-leg turnovers (arrays)."""
+        brokerage = self.order_brokerage(buy_value) + self.order_brokerage(sell_value)
+        turnover = buy_value + sell_value
+        exchange = turnover * (self.exchange_pct / 100)
+        sebi = turnover * (self.sebi_pct / 100)
+        stt = buy_value * (self.stt_buy_pct / 100) + sell_value * (self.stt_sell_pct / 100)
+        stamp = buy_value * (self.stamp_buy_pct / 100)
+        gst = (brokerage + exchange + sebi) * (self.gst_pct / 100)
+        return brokerage + exchange + sebi + stt + stamp + gst
+
+
+def execution_model(spec):
+    """
+    An ExecutionModel from None (no model), a preset name, a dict of
+    settings (a "preset" key picks the base preset) or a model.
+    """
+    if spec is None or isinstance(spec, ExecutionModel):
+        return spec
+    if isinstance(spec, str):
+        return ExecutionModel.preset(spec)
+    spec = dict(spec)
+    return ExecutionModel.preset(spec.pop("preset", "frictionless"), **spec)
+
+
+def _held_bars(lo, hi):
+    """Trade number and bar of every bar in the inclusive ranges [lo[k], hi[k]]."""
+    lengths = np.maximum(hi - lo + 1, 0)
+    trade = np.repeat(np.arange(len(lo)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    return trade, np.arange(len(trade)) - starts[trade] + lo[trade]
+
+
+def fill_trades(entry_sig, exit_sig, open_, high, low, close, model, side=1, end=None):
+    """
+    Fills of the trades entry_sig[k] -> exit_sig[k] (signal bars, as from
+    signals.resolve_positions) under `model`. `side` is 1 (long) or -1 (short), for
+    all trades or one per trade. Trades whose fill would fall on or after
+    bar `end` (default: the last bar + 1) are dropped, like open trades.
+
+    Returns a dict of arrays, one value per trade: entry_idx, exit_idx
+    (fill bars), entry_price, exit_price, side, costs, pl (net of costs,
+    rounded to 2 places like the ledger) and reason (SIGNAL / STOP / TARGET).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    end = len(close) if end is None else end
+    entry_idx = np.asarray(entry_sig, dtype=np.int64)
+    exit_idx = np.asarray(exit_sig, dtype=np.int64)
+    side = np.broadcast_to(np.asarray(side, dtype=np.int64), entry_idx.shape)
+
+    shift = 1 if model.fill == "next_open" else 0
+    prices = np.asarray(open_, dtype=np.float64) if shift else close
+    entry_idx, exit_idx = entry_idx + shift, exit_idx + shift
+    keep = exit_idx < end
+    entry_idx, exit_idx, side = entry_idx[keep], exit_idx[keep], side[keep]
+
+    slippage = model.slippage_ticks * model.tick_size
+    entry_price = prices[entry_idx] + side * slippage
+    exit_price = prices[exit_idx] - side * slippage
+    reason = np.zeros(len(entry_idx), dtype=np.int8)
+
+    if model.stop_pct is not None or model.target_pct is not None:
+        open_, high, low = (np.asarray(x, dtype=np.float64) for x in (open_, high, low))
+        stop = entry_price * (1 - side * (model.stop_pct / 100)) if model.stop_pct is not None \
+            else np.full(len(entry_price), np.nan)
+        target = entry_price * (1 + side * (model.target_pct / 100)) if model.target_pct is not None \
+            else np.full(len(entry_price), np.nan)
+
+        # Bars whose whole range happens while the trade is open: after a
+        # close fill, from the next bar to the exit bar; after an open fill,
+        # from the entry bar to the bar before the exit
+        trade, bar = _held_bars(entry_idx + 1 - shift, exit_idx - shift)
+        s = side[trade]
+        adverse = np.where(s > 0, low[bar], high[bar])
+        favorable = np.where(s > 0, high[bar], low[bar])
+        with np.errstate(invalid="ignore"):
+            hit_stop = s * (adverse - stop[trade]) <= 0
+            hit = hit_stop | (s * (favorable - target[trade]) >= 0)
+        rows = np.flatnonzero(hit)
+        hit_trades, first = np.unique(trade[rows], return_index=True)
+        rows = rows[first]
+
+        b, s = bar[rows], side[hit_trades]
+        o = open_[b]
+        t_stop, t_target = stop[hit_trades], target[hit_trades]
+        with np.errstate(invalid="ignore"):
+            gap_stop = s * (o - t_stop) <= 0
+            gap_target = s * (o - t_target) >= 0
+        stopped = gap_stop | (~gap_target & hit_stop[rows])
+        exit_idx[hit_trades] = b
+        exit_price[hit_trades] = np.where(
+            stopped, np.where(gap_stop, o, t_stop) - s * slippage,
+            np.where(gap_target, o, t_target))
+        reason[hit_trades] = np.where(stopped, STOP, TARGET)
+
+    qty = model.quantity
+    buy_value = np.where(side > 0, entry_price, exit_price) * qty
+    sell_value = np.where(side > 0, exit_price, entry_price) * qty
+    costs = model.charges(buy_value, sell_value)
+    return {
+        "entry_idx": entry_idx,
+        "exit_idx": exit_idx,
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "side": side.copy(),
+        "costs": costs,
+        "pl": np.round(side * (exit_price - entry_price) * qty - costs, 2),
+        "reason": reason
+    }
+
+
+def execute(entry_sig, exit_sig, df, model, side=1, end=None):
+    """
+    fill_trades on the open / high / low / close columns of `df` (a
+    DataFrame or an OHLCView), as a TradeLedger with the fill bars and
+    prices, sides, net P/L and the costs of every trade.
+    """
+    fills = fill_trades(entry_sig, exit_sig, df["open"], df["high"], df["low"], df["close"],
+                        model, side, end)
+    times, time_dtype = index_times(df.index)
+    ledger = TradeLedger(len(fills["entry_idx"]), time_dtype)
+    ledger.extend(fills["entry_idx"], fills["exit_idx"], times[fills["entry_idx"]], times[fills["exit_idx"]],
+                  fills["entry_price"], fills["exit_price"], pl=fills["pl"], costs=fills["costs"],
+                  side=fills["side"])
+    return ledger
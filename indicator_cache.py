@@ -0,0 +1,137 @@
+"""
+Process-wide memoization of indicator series.
+
+Results are keyed on (data fingerprint, indicator name, params), so the
+same EMA/RSI/Supertrend over the same bars is computed once no matter how
+many times compute_indicators / apply_strategy / optimize ask for it, and
+Streamlit reruns with unchanged inputs cost no indicator work at all.
+
+The cache holds at most `max_bytes` of results and evicts the least
+recently used ones first. The budget defaults to INDICATOR_CACHE_MB
+(256 MB) from the environment and can be changed with configure().
+
+Cached objects are shared between callers: treat them as read-only.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _hash_index(h, index):
+    if isinstance(index, pd.RangeIndex):
+        h.update(repr((index.start, index.stop, index.step)).encode())
+    elif isinstance(index, pd.DatetimeIndex):
+        h.update(str(index.dtype).encode())
+        h.update(np.ascontiguousarray(index.asi8).tobytes())
+    else:
+        h.update(pd.util.hash_pandas_object(index, index=False).to_numpy().tobytes())
+
+
+def fingerprint(*inputs):
+    """
+    Content hash of the input Series/arrays, index included (cached Series
+    carry their index, so equal values on different bars must not collide).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for data in inputs:
+        if isinstance(data, pd.Series):
+            _hash_index(h, data.index)
+            data = data.to_numpy()
+        data = np.ascontiguousarray(data)
+        h.update(str((data.dtype, data.shape)).encode())
+        h.update(data.tobytes())
+    return h.hexdigest()
+
+
+def _nbytes(obj):
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=False).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=False))
+    return int(getattr(obj, "nbytes", 0))
+
+
+class IndicatorCache:
+    """Thread-safe LRU cache with a byte budget and hit/miss counters."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+
+        # Computed outside the lock so one slow indicator does not block other threads
+        value = compute()
+        size = _nbytes(value)
+        with self.lock:
+            if key not in self.entries and size <= self.max_bytes:
+                self.entries[key] = (value, size)
+                self.bytes += size
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self.entries:
+            _, (_, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def resize(self, max_bytes):
+        with self.lock:
+            self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": 100.0 * self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+CACHE = IndicatorCache(float(os.environ.get("INDICATOR_CACHE_MB", 256)) * 1024 * 1024)
+
+
+def configure(max_mb):
+    """Change the process-wide memory budget (in MB), evicting if needed."""
+    CACHE.resize(max_mb * 1024 * 1024)
+
+
+def cache_stats():
+    return CACHE.stats()
+
+
+def cached(name, compute, *inputs, **params):
+    """
+    compute(*inputs, **params), memoized on the content of `inputs`.
+    `name` must identify the computation, e.g. "rsi" for ta.rsi.
+    """
+    key = (fingerprint(*inputs), name, tuple(sorted(params.items())))
+    return CACHE.get_or_compute(key, lambda: compute(*inputs, **params))
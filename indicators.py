@@ -1,22 +1,55 @@
 import pandas as pd
-import pandas_ta as ta
+
+import kernels
+import perf
+from indicator_cache import cached
+from ohlc_store import OHLCView, load_view
 
 def load_data(stock: str, timeframe: str, start: str, end: str) -> pd.DataFrame:
     path = f"stock_data/NSE_{stock}_{timeframe}.csv"
-    df = pd.read_csv(path, parse_dates=["Time"])
-    df = df.set_index("Time")
-    df = df.loc[start:end]
+    df = load_view(path, start, end).to_frame()
+    df = df.set_index("time")
     return df
 
+def ewm_ema(close: pd.Series, span: int) -> pd.Series:
+    return close.ewm(span=span, adjust=False).mean()
+
+# Drop-in replacements for ta.ema / ta.rsi / ta.supertrend built on kernels.py:
+# same values, names and columns, without importing pandas_ta
+
+def ema(close: pd.Series, length=10) -> pd.Series:
+    return pd.Series(kernels.ema(close, int(length)), index=close.index, name=f"EMA_{int(length)}")
+
+def rsi(close: pd.Series, length=14) -> pd.Series:
+    return pd.Series(kernels.rsi(close, int(length)), index=close.index, name=f"RSI_{int(length)}")
+
+def supertrend(high: pd.Series, low: pd.Series, close: pd.Series,
+               length=7, multiplier=3.0) -> pd.DataFrame:
+    length, multiplier = int(length), float(multiplier)
+    trend, direction, long, short = kernels.supertrend(high, low, close, length, multiplier)
+    props = f"_{length}_{multiplier}"
+    return pd.DataFrame({
+        f"SUPERT{props}": trend,
+        f"SUPERTd{props}": direction,
+        f"SUPERTl{props}": long,
+        f"SUPERTs{props}": short
+    }, index=close.index)
+
+@perf.timed("compute_indicators")
 def compute_indicators(df: pd.DataFrame, ema_length=20, rsi_length=14,
                        st_length=7, st_multiplier=3.0) -> pd.DataFrame:
+    if isinstance(df, OHLCView):
+        df = df.to_frame()
     df.columns = [col.strip().lower() for col in df.columns]
-    df["ema" + str(ema_length)] = df["close"].ewm(span=ema_length, adjust=False).mean()
-    df["rsi" + str(rsi_length)] = ta.rsi(df["close"], length=rsi_length)
-    st = ta.supertrend(df["high"], df["low"], df["close"],
-                       length=st_length, multiplier=st_multiplier)
-    df = df.join(st)
-    print("✅ Indicator columns added:", df.columns.tolist())
-    print(df.tail(2))  # Just show a few rows to confirm
+    # Memoized: unchanged data + params cost no indicator work (see indicator_cache.py)
+    df["ema" + str(ema_length)] = cached("ewm_ema", ewm_ema, df["close"], span=ema_length)
+    df["rsi" + str(rsi_length)] = cached("rsi", rsi, df["close"], length=rsi_length)
+    st = cached("supertrend", supertrend, df["high"], df["low"], df["close"],
+                length=st_length, multiplier=st_multiplier)
+    with perf.span("supertrend_join", rows=len(df)):
+        df = df.join(st)
+    perf.debug("✅ Indicator columns added:", df.columns.tolist())
+    if perf.enabled():
+        perf.debug(df.tail(2))  # Just show a few rows to confirm
 
     return df
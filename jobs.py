@@ -0,0 +1,360 @@
+"""
+Background jobs for the app: backtests run on a local process pool
+instead of the request / script thread.
+
+    manager = jobs.get_manager()
+    job_id = manager.submit_analysis("stock_data", "RELIANCE", "5", from_date, to_date,
+                                     strategy_rules, ema_period=20)
+    manager.status(job_id)      # {"state": "running", "stage": "indicators", "progress": 0.4, ...}
+    analysis = manager.result(job_id, timeout=60)
+
+A job id is a hash of what the job computes (function, arguments and the
+size / mtime of the source file), so:
+
+- submitting a request identical to one still queued or running returns
+  that job's id, and both callers wait on the same work;
+- a finished result is kept (the last `max_results`) and handed to anyone
+  who submits the same request again, until the source file changes.
+
+Failed jobs are only kept so that status() / result() can report the
+error (the last `max_results` of them); resubmitting retries them.
+Workers report their stage through a queue that a listener thread in the
+app process drains into the job table, so status() never waits on a
+worker.
+
+One manager serves the whole process (get_manager()): every Streamlit
+session and every Flask request thread share its pool and results.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+FINISHED = (DONE, FAILED)
+
+MAX_RESULTS = 32
+EQUITY_POINTS = 2000  # rows of the equity curve sent back for charting
+
+_PROGRESS = None  # worker side: queue back to the app process
+_JOB_ID = None    # worker side: id of the job being run
+
+
+def _init_worker(progress_queue):
+    global _PROGRESS
+    _PROGRESS = progress_queue
+
+
+def progress(stage, fraction=None):
+    """Report the current stage of the job (from inside a job function; no-op elsewhere)."""
+    if _PROGRESS is not None and _JOB_ID is not None:
+        _PROGRESS.put((_JOB_ID, stage, fraction))
+
+
+def _run_job(job_id, fn, kwargs):
+    global _JOB_ID
+    _JOB_ID = job_id
+    try:
+        progress("started", 0.0)
+        return fn(**kwargs)
+    finally:
+        _JOB_ID = None
+
+
+def job_key(fn, kwargs, stamp=None):
+    """Content hash of a request: same function, arguments and source stamp -> same id."""
+    payload = json.dumps([fn.__module__, fn.__qualname__, kwargs, stamp], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def file_stamp(path):
+    """(size, mtime_ns) of a file, None if it is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class Job:
+    """Bookkeeping for one submitted request."""
+    __slots__ = ("id", "label", "state", "stage", "progress", "submitted", "started", "finished",
+                 "error", "future", "waiters")
+
+    def __init__(self, job_id, label=None):
+        self.id = job_id
+        self.label = label
+        self.state = QUEUED
+        self.stage = QUEUED
+        self.progress = 0.0
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.future = None
+        self.waiters = 1  # submissions coalesced onto this job
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "label": self.label,
+            "state": self.state,
+            "stage": self.stage,
+            "progress": self.progress,
+            "submitted": self.submitted,
+            "queued_seconds": round((self.started or end) - self.submitted, 3),
+            "run_seconds": round(end - self.started, 3) if self.started else None,
+            "waiters": self.waiters,
+            "error": self.error
+        }
+
+
+class JobManager:
+    """
+    Process pool + job table. `workers` defaults to every core; at most
+    `max_results` finished results, and as many failed jobs, are kept,
+    oldest first out.
+    """
+
+    def __init__(self, workers=None, max_results=MAX_RESULTS):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._jobs = {}                 # job id -> Job, queued / running
+        self._results = OrderedDict()   # job id -> (Job, result), LRU
+        self._failed = OrderedDict()    # job id -> Job, oldest first
+        self._queue = multiprocessing.Queue()
+        self._executor = None
+        self._listener = threading.Thread(target=self._listen, name="jobs-progress", daemon=True)
+        self._listener.start()
+
+    # --- submitting ---
+
+    def submit(self, fn, label=None, stamp=None, **kwargs):
+        """
+        Run fn(**kwargs) on the pool (fn must be a module-level function).
+        Returns the job id right away; an identical request already queued,
+        running or finished returns its id instead of starting new work.
+        """
+        job_id = job_key(fn, kwargs, stamp)
+        with self._lock:
+            if job_id in self._results:
+                self._results.move_to_end(job_id)
+                self._results[job_id][0].waiters += 1
+                return job_id
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.waiters += 1
+                return job_id
+
+            self._failed.pop(job_id, None)  # retried
+            job = Job(job_id, label)
+            self._jobs[job_id] = job
+            try:
+                job.future = self._pool().submit(_run_job, job_id, fn, kwargs)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start a fresh pool
+                self._executor = None
+                job.future = self._pool().submit(_run_job, job_id, fn, kwargs)
+        job.future.add_done_callback(lambda future: self._finish(job_id, future))
+        return job_id
+
+    def submit_analysis(self, data_folder, stock, timeframe, from_date, to_date, strategy_rules,
+                        ema_period=20, rsi_period=14, supertrend_period=10,
+                        supertrend_multiplier=3.0, profile=False, execution=None):
+        """
+        Queue run_analysis for one stock / timeframe / date range. Returns
+        the job id. `execution` is a preset name or settings dict (see
+        execution.execution_model), so that it hashes into the job key.
+        """
+        from utils import stock_source
+        source = stock_source(data_folder, stock, timeframe)
+        return self.submit(run_analysis, label=f"{stock} {timeframe}",
+                           stamp=file_stamp(source) if source else None,
+                           data_folder=data_folder, stock=stock, timeframe=timeframe,
+                           from_date=from_date, to_date=to_date, strategy_rules=strategy_rules,
+                           ema_period=int(ema_period), rsi_period=int(rsi_period),
+                           supertrend_period=int(supertrend_period),
+                           supertrend_multiplier=float(supertrend_multiplier), profile=bool(profile),
+                           execution=execution)
+
+    # --- polling ---
+
+    def status(self, job_id):
+        """The job's state as a dict (see Job.to_dict), None for an unknown or evicted id."""
+        with self._lock:
+            job = self._jobs.get(job_id) or self._failed.get(job_id)
+            if job is None and job_id in self._results:
+                job = self._results[job_id][0]
+            return job.to_dict() if job is not None else None
+
+    def jobs(self):
+        """Status of every job the manager still knows about, newest first."""
+        with self._lock:
+            jobs = list(self._jobs.values()) + list(self._failed.values())
+            jobs += [job for job, _ in self._results.values()]
+            return [job.to_dict() for job in sorted(jobs, key=lambda j: j.submitted, reverse=True)]
+
+    def wait(self, job_id, timeout=None, poll=0.1):
+        """Block until the job finishes or `timeout` seconds pass. Returns the last status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if status is None or status["state"] in FINISHED:
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                return status
+            time.sleep(poll)
+
+    def result(self, job_id, timeout=None):
+        """
+        The job's return value, waiting up to `timeout` seconds for it.
+        Raises KeyError for an unknown id, RuntimeError if the job failed
+        and TimeoutError if it is still running.
+        """
+        status = self.wait(job_id, timeout)
+        if status is None:
+            raise KeyError(f"unknown job {job_id}")
+        if status["state"] == FAILED:
+            raise RuntimeError(status["error"])
+        if status["state"] != DONE:
+            raise TimeoutError(f"job {job_id} is still {status['state']}")
+        with self._lock:
+            entry = self._results.get(job_id)
+        if entry is None:
+            raise KeyError(f"job {job_id} result was evicted")
+        return entry[1]
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        self._queue.put(None)
+
+    # --- internals ---
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self._queue,))
+        return self._executor
+
+    def _listen(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            job_id, stage, fraction = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.state in FINISHED:
+                    continue
+                if job.state == QUEUED:
+                    job.state = RUNNING
+                    job.started = time.time()
+                job.stage = stage
+                if fraction is not None:
+                    job.progress = float(fraction)
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.finished = time.time()
+            job.future = None
+            if job.started is None:
+                job.started = job.finished
+            del self._jobs[job_id]
+            error = future.exception()
+            if error is not None:
+                job.state = job.stage = FAILED
+                job.error = f"{type(error).__name__}: {error}"
+                self._failed[job_id] = job
+                while len(self._failed) > self.max_results:
+                    self._failed.popitem(last=False)
+                return
+            job.state = job.stage = DONE
+            job.progress = 1.0
+            self._results[job_id] = (job, future.result())
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+
+_MANAGER = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_manager(workers=None):
+    """The process-wide JobManager, created on first use (JOB_WORKERS sets the pool size)."""
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            workers = workers or int(os.environ.get("JOB_WORKERS", 0)) or None
+            _MANAGER = JobManager(workers)
+        return _MANAGER
+
+
+def run_analysis(data_folder, stock, timeframe, from_date, to_date, strategy_rules,
+                 ema_period=20, rsi_period=14, supertrend_period=10, supertrend_multiplier=3.0,
+                 profile=False, execution=None):
+    """
+    The app's analysis as a job: load_stock -> compute_indicators ->
+    apply_strategy. Runs in a worker process. `execution` fills and costs
+    the trades (see execution.execution_model).
+
+    Returns a dict with the indicator frame ("df", lower-case columns),
+    "trades" (a ledger.TradeLedger, None without data; to_frame() it for
+    display), its "metrics" (metrics.compute_stats), the bar-level
+    "equity" curve (equity.equity_frame, cut to EQUITY_POINTS rows) and its
+    "equity_stats" (metrics.equity_metrics), the worker's "cache_stats"
+    and, with profile=True, the perf.Run of the job ("perf", else None).
+    """
+    import contextlib
+
+    import pandas as pd
+
+    import perf
+    from indicator_cache import cache_stats
+    from equity import equity_frame, ledger_equity
+    from indicators import compute_indicators
+    from metrics import compute_stats, equity_metrics
+    from strategy import strategy_ledger
+    from utils import load_stock
+
+    collector = perf.collect(label=f"{stock}_{timeframe}") if profile else contextlib.nullcontext()
+    with collector as perf_run:
+        progress("loading", 0.1)
+        df = load_stock(data_folder, stock, timeframe, from_date, to_date)
+        if df is None:
+            raise ValueError(f"could not load {stock} ({timeframe}) from {data_folder}")
+        ledger = stats = curve = equity_stats = None
+        if not df.empty:
+            progress("indicators", 0.4)
+            df = compute_indicators(df, ema_length=ema_period, rsi_length=rsi_period,
+                                    st_length=supertrend_period, st_multiplier=supertrend_multiplier)
+            df.columns = [col.strip().lower() for col in df.columns]
+            progress("strategy", 0.7)
+            ledger = strategy_ledger(df, strategy_rules, ema_period, rsi_period, supertrend_period,
+                                     supertrend_multiplier, execution=execution)
+            stats = compute_stats(ledger, df["time"])
+            progress("equity", 0.9)
+            with perf.span("equity", rows=len(df)):
+                position, equity = ledger_equity(ledger, df["close"])
+                curve = equity_frame(pd.DatetimeIndex(df["time"]), position, equity, points=EQUITY_POINTS)
+                equity_stats = equity_metrics(equity, df["time"])[0]
+    return {
+        "df": df,
+        "trades": ledger,
+        "metrics": stats,
+        "equity": curve,
+        "equity_stats": equity_stats,
+        "cache_stats": cache_stats(),
+        "perf": perf_run
+    }
@@ -0,0 +1,411 @@
+"""
+Array kernels for the indicators: EMA, RMA (Wilder), true range, ATR, RSI
+and Supertrend on contiguous float64 NumPy arrays, no pandas_ta needed.
+
+They follow pandas_ta's definitions (ta.ema, ta.rsi, ta.atr, ta.supertrend)
+and agree with them to ~1e-12 (see benchmarks/bench_kernels.py).
+The exponential averages are linear recurrences, solved block-wise with
+cumulative sums so they run at NumPy speed; only the Supertrend band
+ratchet is a plain loop over preallocated buffers.
+"""
+import sys
+
+import numpy as np
+
+# Within a block of a linear recurrence the terms are scaled by decay**-k;
+# keep that factor below this bound so cumsum stays accurate.
+_MAX_BLOCK_SCALE = 1e12
+
+
+def _as_float_array(x):
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+class LinearFilter:
+    """
+    y[t] = decay * y[t-1] + x[t], with y[-1] = 0, for NaN-free `x` that may
+    arrive in pieces: calling it on consecutive chunks gives bit-for-bit the
+    output of one call on the whole series.
+
+    The series is cut into blocks of B bars (B independent of the input
+    length, short enough that decay**-B stays well inside float64 range).
+    Inside a block y is a scaled cumulative sum; the value carried into a
+    block is y at the end of the previous one. A chunk that ends mid-block
+    keeps the running sum and picks it up on the next call.
+    """
+
+    def __init__(self, decay):
+        self.decay = decay
+        block = int(np.log(_MAX_BLOCK_SCALE) / -np.log(decay)) if 0 < decay < 1 else 1
+        self.block = max(1, min(block, 4096))
+        k = np.arange(self.block)
+        self.scale_down = decay ** -k if self.block > 1 else None   # 1, 1/d, 1/d^2 ...
+        self.scale_up = decay ** k if self.block > 1 else None
+        self.carry_scale = decay ** (k + 1) if self.block > 1 else None
+        self.pos = 0        # position inside the current block
+        self.partial = 0.0  # running cumulative sum of the current block
+        self.carry = 0.0    # y at the end of the previous block
+
+    def _finish(self, x, lo, out):
+        """Rows lo.. of the current block, which already holds self.pos rows."""
+        k = slice(lo, lo + len(x))
+        v = x * self.scale_down[k]
+        if lo:
+            v = np.cumsum(np.r_[self.partial, v])[1:]
+        else:
+            np.cumsum(v, out=v)
+        self.partial = v[-1]
+        v *= self.scale_up[k]
+        v += self.carry * self.carry_scale[k]
+        out[:] = v
+        self.pos = lo + len(x)
+        if self.pos == self.block:
+            self.carry = out[-1]
+            self.pos, self.partial = 0, 0.0
+
+    def __call__(self, x):
+        x = _as_float_array(x)
+        n = len(x)
+        out = np.empty(n)
+        if n == 0:
+            return out
+        if self.decay == 0:
+            out[:] = x
+            return out
+        if self.block == 1:
+            acc = self.carry
+            decay = self.decay
+            for i in range(n):
+                acc = decay * acc + x[i]
+                out[i] = acc
+            self.carry = acc
+            return out
+
+        i = 0
+        block = self.block
+        if self.pos:
+            m = min(n, block - self.pos)
+            self._finish(x[:m], self.pos, out[:m])
+            i = m
+
+        n_blocks = (n - i) // block
+        if n_blocks:
+            end = i + n_blocks * block
+            y = out[i:end].reshape(n_blocks, block)
+            np.multiply(x[i:end].reshape(n_blocks, block), self.scale_down, out=y)
+            np.cumsum(y, axis=1, out=y)
+            y *= self.scale_up          # each block with zero carry-in
+            # Carry into each block = y at the end of the previous block
+            carries = np.empty(n_blocks)
+            carry = self.carry
+            last_scale = self.carry_scale[-1]
+            ends = y[:, -1].tolist()
+            for b in range(n_blocks):
+                carries[b] = carry
+                carry = ends[b] + carry * last_scale
+            y += carries[:, None] * self.carry_scale
+            self.carry = y[-1, -1]
+            i = end
+
+        if i < n:
+            self._finish(x[i:], 0, out[i:])
+        return out
+
+
+def linear_filter(x, decay):
+    """y[t] = decay * y[t-1] + x[t], with y[-1] = 0, for NaN-free `x` (see LinearFilter)."""
+    return LinearFilter(decay)(x)
+
+
+def _ewm_mean_loop(x, alpha, adjust, min_periods):
+    """pandas' ewm().mean() recurrence verbatim, for inputs with interior NaNs."""
+    n = len(x)
+    out = np.empty(n)
+    if n == 0:
+        return out
+    old_wt_factor = 1. - alpha
+    new_wt = 1. if adjust else alpha
+    weighted = x[0]
+    nobs = int(weighted == weighted)
+    out[0] = weighted if nobs >= min_periods else np.nan
+    old_wt = 1.
+    for i in range(1, n):
+        cur = x[i]
+        is_observation = cur == cur
+        nobs += is_observation
+        if weighted == weighted:
+            old_wt *= old_wt_factor
+            if is_observation:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + new_wt * cur) / (old_wt + new_wt)
+                old_wt = old_wt + new_wt if adjust else 1.
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted if nobs >= min_periods else np.nan
+    return out
+
+
+class EWMMean:
+    """
+    pandas' ewm(com=com, adjust=adjust, min_periods=min_periods).mean() fed
+    chunk by chunk. Leading NaNs (indicator warm-up) are fine; a NaN after
+    the first value raises, since the chunked path cannot fall back to the loop.
+    """
+
+    def __init__(self, com, adjust=True, min_periods=0):
+        self.alpha = 1. / (1. + com)
+        self.decay = 1. - self.alpha
+        self.adjust = adjust
+        self.min_periods = max(int(min_periods), 1)
+        # The weights sum to (1 - d^(t+1)) / (1 - d), which stops changing once d^t underflows
+        self.weight_terms = int(40 / -np.log(self.decay)) + 1 if 0 < self.decay < 1 else 1
+        self.filter = LinearFilter(self.decay)
+        self.t = 0          # values seen since the first valid one
+        self.started = False
+
+    def __call__(self, x):
+        x = _as_float_array(x)
+        first = 0
+        if not self.started:
+            valid = ~np.isnan(x)
+            if not valid.any():
+                return np.full(len(x), np.nan)
+            first = int(np.argmax(valid))
+            self.started = True
+
+        values = x[first:]
+        if np.isnan(values).any():
+            raise ValueError("NaN after the first value: not supported by the chunked EWM")
+
+        t0 = self.t
+        if self.adjust:
+            y = self.filter(values)
+            head = max(0, min(len(values), self.weight_terms - t0))
+            y[:head] /= (1. - self.decay ** np.arange(t0 + 1, t0 + head + 1)) / self.alpha
+            y[head:] /= 1. / self.alpha
+        else:
+            scaled = self.alpha * values
+            if t0 == 0:
+                scaled[0] = values[0]
+            y = self.filter(scaled)
+
+        y[:max(0, self.min_periods - 1 - t0)] = np.nan
+        self.t += len(values)
+        if first:
+            y = np.concatenate((np.full(first, np.nan), y))
+        return y
+
+
+def ewm_mean(x, com, adjust=True, min_periods=0):
+    """
+    Same as pd.Series(x).ewm(com=com, adjust=adjust, min_periods=min_periods).mean().
+    Leading NaNs (indicator warm-up) are fine; interior NaNs fall back to a loop.
+    """
+    x = _as_float_array(x)
+    valid = ~np.isnan(x)
+    if valid.any() and not valid[int(np.argmax(valid)):].all():
+        return _ewm_mean_loop(x, 1. / (1. + com), adjust, max(int(min_periods), 1))
+    return EWMMean(com, adjust, min_periods)(x)
+
+
+# Each indicator below is a small state object that can be fed consecutive
+# chunks of a series (see backtest_chunked.py); the plain functions run one
+# over the whole array, so both paths do exactly the same arithmetic.
+
+class EMA:
+    """
+    ta.ema(close, length): NaN for the first length-1 bars, seeded with the
+    SMA of the first `length` closes. sma_seed=False gives
+    ewm(span=length, adjust=False), the EMA compute_indicators plots.
+    """
+
+    def __init__(self, length=10, sma_seed=True):
+        self.length = int(length)
+        self.ewm = EWMMean(com=(self.length - 1) / 2, adjust=False)
+        self.warmup = [] if sma_seed else None
+        self.seen = 0
+
+    def __call__(self, close):
+        close = _as_float_array(close).copy()
+        if self.warmup is not None:
+            need = self.length - self.seen
+            self.warmup.append(close[:need].copy())
+            self.seen += min(need, len(close))
+            if self.seen < self.length:
+                close[:] = np.nan
+            else:
+                head = np.concatenate(self.warmup)
+                seed = np.nanmean(head) if not np.isnan(head).all() else np.nan
+                close[:need - 1] = np.nan
+                close[need - 1] = seed
+                self.warmup = None
+        return self.ewm(close)
+
+
+def ema(close, length=10, sma_seed=True):
+    """See EMA."""
+    return EMA(length, sma_seed)(close)
+
+
+class RMA:
+    """Wilder's moving average (ta.rma): ewm(alpha=1/length, min_periods=length)."""
+
+    def __init__(self, length=10):
+        alpha = 1.0 / length
+        self.ewm = EWMMean(com=(1 - alpha) / alpha, adjust=True, min_periods=length)
+
+    def __call__(self, x):
+        return self.ewm(x)
+
+
+def rma(x, length=10):
+    return RMA(length)(x)
+
+
+class RSI:
+    """ta.rsi: 100 * RMA(gains) / (RMA(gains) + |RMA(losses)|)."""
+
+    def __init__(self, length=14):
+        self.positive = RMA(length)
+        self.negative = RMA(length)
+        self.prev_close = np.nan
+
+    def __call__(self, close):
+        close = _as_float_array(close)
+        change = np.empty(len(close))
+        if len(close):
+            change[0] = close[0] - self.prev_close
+            change[1:] = close[1:] - close[:-1]
+            self.prev_close = close[-1]
+        positive_avg = self.positive(np.maximum(change, 0.0))
+        negative_avg = self.negative(np.minimum(change, 0.0, out=change))
+        np.abs(negative_avg, out=negative_avg)
+        negative_avg += positive_avg
+        positive_avg *= 100.0
+        with np.errstate(invalid="ignore", divide="ignore"):  # flat series: 0 / 0 -> NaN, as in pandas
+            positive_avg /= negative_avg
+        return positive_avg
+
+
+def rsi(close, length=14):
+    return RSI(length)(close)
+
+
+def has_flat_bars(high, low):
+    """True if any bar has high == low (pandas_ta then nudges every range by epsilon)."""
+    return bool((_as_float_array(high) == _as_float_array(low)).any())
+
+
+class TrueRange:
+    """
+    ta.true_range: max(|H-L|, |H-prevC|, |prevC-L|), NaN on the first bar.
+    pandas_ta adds machine epsilon to every H-L once any bar of the series
+    is flat; fed in chunks that must be known up front (`flat_bars`).
+    """
+
+    def __init__(self, flat_bars=None):
+        self.flat_bars = flat_bars
+        self.prev_close = None
+
+    def __call__(self, high, low, close):
+        high, low, close = _as_float_array(high), _as_float_array(low), _as_float_array(close)
+        high_low = high - low
+        flat = self.flat_bars if self.flat_bars is not None else (high_low == 0).any()
+        if flat:
+            high_low = high_low + sys.float_info.epsilon  # pandas_ta's non_zero_range
+        prev_close = np.empty(len(close))
+        if len(close):
+            prev_close[0] = np.nan if self.prev_close is None else self.prev_close
+            prev_close[1:] = close[:-1]
+        tr = np.fmax(np.fmax(np.abs(high_low), np.abs(high - prev_close)), np.abs(prev_close - low))
+        if self.prev_close is None:
+            tr[:1] = np.nan
+        if len(close):
+            self.prev_close = close[-1]
+        return tr
+
+
+def true_range(high, low, close):
+    return TrueRange()(high, low, close)
+
+
+class ATR:
+    """ta.atr with the default RMA smoothing."""
+
+    def __init__(self, length=14, flat_bars=None):
+        self.true_range = TrueRange(flat_bars)
+        self.rma = RMA(length)
+
+    def __call__(self, high, low, close):
+        return self.rma(self.true_range(high, low, close))
+
+
+def atr(high, low, close, length=14):
+    return ATR(length)(high, low, close)
+
+
+class Supertrend:
+    """
+    ta.supertrend as four arrays: trend, direction, long, short
+    (SUPERT_*, SUPERTd_*, SUPERTl_*, SUPERTs_*).
+    """
+
+    def __init__(self, length=7, multiplier=3.0, flat_bars=None):
+        self.multiplier = float(multiplier)
+        self.atr = ATR(length, flat_bars)
+        self.direction = 1
+        self.prev_upper = None
+        self.prev_lower = None
+
+    def __call__(self, high, low, close):
+        high, low, close = _as_float_array(high), _as_float_array(low), _as_float_array(close)
+        n = len(close)
+        hl2 = 0.5 * (high + low)
+        matr = self.multiplier * self.atr(high, low, close)
+
+        # Preallocated buffers; plain lists index much faster than ndarrays in a Python loop
+        upper = (hl2 + matr).tolist()
+        lower = (hl2 - matr).tolist()
+        closes = close.tolist()
+        direction = [1] * n
+
+        first_chunk = self.prev_upper is None
+        start = 0
+        if first_chunk and n:
+            self.prev_upper, self.prev_lower = upper[0], lower[0]
+            start = 1
+
+        d = self.direction
+        prev_upper, prev_lower = self.prev_upper, self.prev_lower
+        for i in range(start, n):
+            c = closes[i]
+            if c > prev_upper:
+                d = 1
+            elif c < prev_lower:
+                d = -1
+            else:
+                if d > 0 and lower[i] < prev_lower:
+                    lower[i] = prev_lower
+                if d < 0 and upper[i] > prev_upper:
+                    upper[i] = prev_upper
+            direction[i] = d
+            prev_upper = upper[i]
+            prev_lower = lower[i]
+        self.direction, self.prev_upper, self.prev_lower = d, prev_upper, prev_lower
+
+        direction = np.array(direction, dtype=np.int64)
+        upper = np.array(upper)
+        lower = np.array(lower)
+        is_long = direction > 0
+        long = np.where(is_long, lower, np.nan)
+        short = np.where(is_long, np.nan, upper)
+        trend = np.where(is_long, lower, upper)
+        if first_chunk and n:
+            trend[0] = 0.0
+            long[0] = short[0] = np.nan
+        return trend, direction, long, short
+
+
+def supertrend(high, low, close, length=7, multiplier=3.0):
+    """See Supertrend."""
+    return Supertrend(length, multiplier)(high, low, close)
@@ -0,0 +1,191 @@
+"""
+Array-backed trade ledger.
+
+A backtest's trades are kept in one structured NumPy array (65 bytes per
+trade) that grows by doubling, instead of a dict or a DataFrame row per
+trade:
+
+    entry_idx, exit_idx     bar positions in the series the strategy ran on
+    entry_time, exit_time   int64 (ns since the epoch for a DatetimeIndex,
+                            the index value itself for an integer index)
+    entry_price, exit_price float64
+    pl                      float64, side x (exit - entry) rounded to 2
+                            places, or the net P/L of an execution model
+                            (execution.py)
+    costs                   float64, brokerage and charges taken from pl
+    side                    int8, 1 long or -1 short (signals.LONG / SHORT)
+
+Summary stats come straight from the arrays. to_frame() builds
+apply_strategy's trades table (Entry Time, Exit Time, Entry Price,
+Exit Price, P/L, plus Side when there are shorts and Costs when there
+are any) and is meant for the display boundary only.
+
+    ledger = TradeLedger.from_indices(entry_idx, exit_idx, df.index, close)
+    ledger.total_profit(), ledger.win_rate(), ledger.max_drawdown()
+    trades_df = ledger.to_frame()
+"""
+import numpy as np
+import pandas as pd
+
+TRADE_DTYPE = np.dtype([
+    ("entry_idx", np.int64), ("exit_idx", np.int64),
+    ("entry_time", np.int64), ("exit_time", np.int64),
+    ("entry_price", np.float64), ("exit_price", np.float64),
+    ("pl", np.float64), ("costs", np.float64), ("side", np.int8)
+])
+
+FRAME_COLUMNS = {
+    "Entry Time": "entry_time", "Exit Time": "exit_time",
+    "Entry Price": "entry_price", "Exit Price": "exit_price", "P/L": "pl"
+}
+
+
+def index_times(index):
+    """
+    int64 times of an index, plus the dtype to turn them back into the
+    original values (a datetime64 dtype, int64, or None for positions).
+    """
+    if isinstance(index, pd.DatetimeIndex):
+        return index.as_unit("ns").asi8, index.dtype
+    values = np.asarray(index)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int64, copy=False), np.dtype(np.int64)
+    return np.arange(len(values), dtype=np.int64), None
+
+
+class TradeLedger:
+    """Growable structured array of trades (see the module docstring)."""
+    __slots__ = ("_buf", "_n", "time_dtype")
+
+    def __init__(self, capacity=1024, time_dtype=None):
+        self._buf = np.empty(max(int(capacity), 1), dtype=TRADE_DTYPE)
+        self._n = 0
+        self.time_dtype = time_dtype
+
+    @classmethod
+    def from_indices(cls, entry_idx, exit_idx, index, close, side=1):
+        """
+        Ledger of the trades entry_idx[k] -> exit_idx[k] on a series with
+        this index and close; `side` is 1 / -1 for all trades or one per trade.
+        """
+        times, time_dtype = index_times(index)
+        close = np.asarray(close, dtype=np.float64)
+        ledger = cls(len(entry_idx), time_dtype)
+        ledger.extend(entry_idx, exit_idx, times[entry_idx], times[exit_idx],
+                      close[entry_idx], close[exit_idx], side=side)
+        return ledger
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, column):
+        """One column of the trades so far, as a view."""
+        return self._buf[column][:self._n]
+
+    @property
+    def records(self):
+        """The trades so far as a structured array view."""
+        return self._buf[:self._n]
+
+    def _reserve(self, extra):
+        needed = self._n + extra
+        if needed > len(self._buf):
+            buf = np.empty(max(needed, 2 * len(self._buf)), dtype=TRADE_DTYPE)
+            buf[:self._n] = self._buf[:self._n]
+            self._buf = buf
+
+    def append(self, entry_idx, exit_idx, entry_time, exit_time, entry_price, exit_price, side=1):
+        self._reserve(1)
+        self._buf[self._n] = (entry_idx, exit_idx, entry_time, exit_time, entry_price, exit_price,
+                              np.round(side * (exit_price - entry_price), 2), 0.0, side)
+        self._n += 1
+
+    def extend(self, entry_idx, exit_idx, entry_time, exit_time, entry_price, exit_price,
+               pl=None, costs=0.0, side=1):
+        """
+        Append many trades at once from equal-length arrays. `pl` defaults
+        to side x (exit - entry); pass it (and `costs`) for net results.
+        """
+        k = len(entry_idx)
+        self._reserve(k)
+        rows = self._buf[self._n:self._n + k]
+        rows["entry_idx"] = entry_idx
+        rows["exit_idx"] = exit_idx
+        rows["entry_time"] = entry_time
+        rows["exit_time"] = exit_time
+        rows["entry_price"] = entry_price
+        rows["exit_price"] = exit_price
+        rows["side"] = side
+        if pl is None:
+            pl = rows["side"] * (rows["exit_price"] - rows["entry_price"])
+        rows["pl"] = np.round(pl, 2)
+        rows["costs"] = costs
+        self._n += k
+
+    # Pickle only the trades, not the spare capacity
+    def __getstate__(self):
+        return self.records.copy(), self.time_dtype
+
+    def __setstate__(self, state):
+        self._buf, self.time_dtype = state
+        self._n = len(self._buf)
+        if not len(self._buf):
+            self._buf = np.empty(1, dtype=TRADE_DTYPE)
+
+    # --- stats, straight from the arrays ---
+
+    def total_profit(self):
+        pl = self["pl"]
+        return pl.sum() if len(pl) else 0.0
+
+    def win_rate(self):
+        pl = self["pl"]
+        return (pl > 0).mean() * 100 if len(pl) else 0.0
+
+    def max_drawdown(self):
+        """Largest fall of the cumulative P/L from its running peak (starting from 0)."""
+        if not self._n:
+            return 0.0
+        equity = np.cumsum(self["pl"])
+        peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+        return float((peak - equity).max())
+
+    def stats(self):
+        return {
+            "trades": self._n,
+            "total_profit": float(self.total_profit()),
+            "win_rate": float(self.win_rate()),
+            "max_drawdown": self.max_drawdown()
+        }
+
+    # --- display boundary ---
+
+    def times(self, column, lo=0):
+        """entry_time / exit_time (from trade `lo` on) as the original index values."""
+        values = self[column][lo:]
+        if self.time_dtype is None or self.time_dtype == np.int64:
+            return values.copy()
+        times = pd.DatetimeIndex(values.view("M8[ns]"))
+        tz = getattr(self.time_dtype, "tz", None)
+        if tz is None:
+            return times.as_unit(np.datetime_data(self.time_dtype)[0])
+        return times.tz_localize("UTC").tz_convert(tz).as_unit(self.time_dtype.unit)
+
+    def to_frame(self, lo=0):
+        """
+        apply_strategy's trades table (from trade `lo` on); an empty
+        DataFrame when there are no trades.
+        """
+        if lo >= self._n:
+            return pd.DataFrame()
+        frame = pd.DataFrame({
+            name: self.times(column, lo) if column.endswith("_time") else self[column][lo:].copy()
+            for name, column in FRAME_COLUMNS.items()
+        })
+        side = self["side"][lo:]
+        if (side < 0).any():
+            frame.insert(0, "Side", np.where(side < 0, "Short", "Long"))
+        costs = self["costs"][lo:]
+        if costs.any():
+            frame["Costs"] = np.round(costs, 2)
+        return frame
@@ -3,7 +3,10 @@ from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 from datetime import datetime
 from indicators import load_data, compute_indicators
-from strategy import generate_trades, compute_stats
+from strategy import strategy_ledger
+from metrics import compute_stats
+from equity import equity_frame, ledger_equity
+from signals import DEFAULT_STRATEGY_RULES
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
@@ -25,30 +28,37 @@ def run_analysis():
         return
 
     df = compute_indicators(df)
-    trades = generate_trades(df)
-    total_pl, win_rate = compute_stats(trades)
+    trades = strategy_ledger(df, DEFAULT_STRATEGY_RULES)
+    stats = compute_stats(trades, df.index)
 
     # Display stats
-    result_var.set(f"Total P/L: ₹{total_pl:.2f}     Win Rate: {win_rate:.2f}%")
+    result_var.set(
+        f"Total P/L: ₹{stats['total_profit']:.2f}     Win Rate: {stats['win_rate']:.2f}%     "
+        f"Max DD: ₹{stats['max_drawdown']:.2f}     Profit Factor: {stats['profit_factor']:.2f}     "
+        f"Sharpe: {stats['sharpe']:.2f}"
+    )
 
     # Display trade table
     for i in tree.get_children():
         tree.delete(i)
-    for _, row in trades.iterrows():
+    # By name: to_frame() adds a Side column in front when the book has shorts
+    for row in trades.to_frame().to_dict(orient="records"):
         tree.insert("", "end", values=(
-            row["entry_time"].strftime("%Y-%m-%d %H:%M"),
-            row["exit_time"].strftime("%Y-%m-%d %H:%M"),
-            f"{row['entry_price']:.2f}",
-            f"{row['exit_price']:.2f}",
+            row["Entry Time"].strftime("%Y-%m-%d %H:%M"),
+            row["Exit Time"].strftime("%Y-%m-%d %H:%M"),
+            f"{row['Entry Price']:.2f}",
+            f"{row['Exit Price']:.2f}",
             f"{row['P/L']:.2f}"
         ))
 
-    # Plot equity curve (cumulative P/L)
+    # Plot equity curve, marked to market on every bar, about one point per pixel
+    position, equity = ledger_equity(trades, df["close"])
+    width = max(canvas.get_tk_widget().winfo_width(), 600)
+    curve = equity_frame(df.index, position, equity, points=width)
     fig.clear()
     ax = fig.add_subplot(111)
-    df_tr = trades.copy()
-    df_tr["cum_pl"] = df_tr["exit_price"] - df_tr["entry_price"]
-    df_tr["cum_pl"].cumsum().plot(ax=ax, marker='o', title="Equity Curve")
+    ax.plot(curve["time"], curve["equity"])
+    ax.set_title("Equity Curve")
     canvas.draw()
 
 # Main window
@@ -0,0 +1,291 @@
+"""
+Performance metrics of backtest trades, vectorized across many backtests.
+
+The core, grouped_metrics(), takes the trades of any number of backtests
+as flat arrays plus a group id per trade, and returns one row of metrics
+per group in a single pass of NumPy / pandas group operations. A
+parameter sweep with thousands of combinations is one call, not one
+DataFrame per combination:
+
+    trades        number of closed trades
+    total_profit  sum of P/L
+    win_rate      % of trades with P/L > 0
+    profit_factor gross profit / gross loss (inf with no losing trade)
+    expectancy    mean P/L per trade
+    avg_win, avg_loss
+    max_drawdown  largest fall of the cumulative P/L from its running peak
+    max_drawdown_duration  longest time from a peak to the recovery of it
+                  (or to the last trade, if never recovered)
+    avg_holding   mean time from entry to exit
+    avg_bars_held mean bars from entry to exit
+    exposure      % of bars spent in a position
+    sharpe, sortino  annualized, over per-day P/L (days without an exit
+                  count as 0); PERIODS_PER_YEAR trading days
+
+P/L is per unit (one share), as in apply_strategy, so Sharpe / Sortino
+are those of a one-share position. Days are local calendar days of the
+trade times.
+
+For one backtest, compute_stats(ledger) gives the same metrics as a
+dict; equity_metrics() gives drawdown and per-day P/L of a bar-level
+equity curve; daily_pnl() the P/L per day of a ledger.
+"""
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = 252
+DAY_NS = 86_400 * 10**9
+
+METRIC_COLUMNS = [
+    "trades", "total_profit", "win_rate", "profit_factor", "expectancy", "avg_win", "avg_loss",
+    "max_drawdown", "max_drawdown_duration", "avg_holding", "avg_bars_held", "exposure",
+    "sharpe", "sortino"
+]
+
+
+def local_days(times_ns, tz=None):
+    """Local calendar day number of int64 UTC-ns times (wall-clock days for tz=None)."""
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    if tz is not None:
+        wall = pd.DatetimeIndex(times_ns.view("M8[ns]")).tz_localize("UTC").tz_convert(tz).tz_localize(None)
+        times_ns = wall.asi8
+    return times_ns // DAY_NS
+
+
+def count_days(index):
+    """Number of distinct local days in a (sorted) DatetimeIndex."""
+    if len(index) == 0:
+        return 0
+    index = pd.DatetimeIndex(index)
+    days = local_days(index.as_unit("ns").asi8, index.tz)
+    return int(np.count_nonzero(np.diff(days))) + 1
+
+
+def _safe_divide(a, b, zero_over_zero=np.nan):
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = a / b
+    out[(a == 0) & (b == 0)] = zero_over_zero
+    return out
+
+
+def grouped_metrics(group, n_groups, pl, entry_time=None, exit_time=None, bars_held=None,
+                    n_bars=None, n_days=None, tz=None):
+    """
+    Metrics (METRIC_COLUMNS) of n_groups backtests at once.
+
+    group:       int group id of every trade, trades of a group in exit order
+    pl:          P/L of every trade
+    entry_time, exit_time: int64 ns per trade (UTC), or None to skip the
+                 time-based metrics (holding time, drawdown duration, Sharpe, Sortino)
+    bars_held:   exit bar - entry bar per trade, or None
+    n_bars:      bars in each group's backtest (scalar or per group), for exposure
+    n_days:      trading days in each group's backtest (scalar or per group), for
+                 Sharpe / Sortino; defaults to the days with an exit
+    tz:          timezone the calendar days are taken in
+
+    Returns a DataFrame with one row per group (index 0..n_groups-1).
+    """
+    group = np.asarray(group, dtype=np.int64)
+    pl = np.asarray(pl, dtype=float)
+    order = np.argsort(group, kind="stable")
+    if not np.array_equal(order, np.arange(len(group))):
+        group, pl = group[order], pl[order]
+        entry_time = None if entry_time is None else np.asarray(entry_time)[order]
+        exit_time = None if exit_time is None else np.asarray(exit_time)[order]
+        bars_held = None if bars_held is None else np.asarray(bars_held)[order]
+
+    def total(weights):
+        return np.bincount(group, weights=weights, minlength=n_groups)[:n_groups]
+
+    trades = np.bincount(group, minlength=n_groups)[:n_groups]
+    wins = pl > 0
+    losses = pl < 0
+    gross_profit = total(np.where(wins, pl, 0.0))
+    gross_loss = total(np.where(losses, -pl, 0.0))
+    n_wins = total(wins)
+    n_losses = total(losses)
+
+    out = pd.DataFrame({
+        "trades": trades,
+        "total_profit": total(pl),
+        "win_rate": _safe_divide(100.0 * n_wins, trades, 0.0),
+        "profit_factor": _safe_divide(gross_profit, gross_loss),
+        "expectancy": _safe_divide(total(pl), trades),
+        "avg_win": _safe_divide(gross_profit, n_wins),
+        "avg_loss": -_safe_divide(gross_loss, n_losses)
+    })
+
+    # Drawdown of the cumulative P/L, per group; the curve starts at 0
+    equity = pd.Series(pl).groupby(group).cumsum().to_numpy()
+    peak = np.maximum(pd.Series(equity).groupby(group).cummax().to_numpy(), 0.0)
+    drawdown = peak - equity
+    max_dd = np.zeros(n_groups)
+    np.maximum.at(max_dd, group, drawdown)
+    out["max_drawdown"] = max_dd
+
+    has_times = exit_time is not None and entry_time is not None
+    duration = np.zeros(n_groups) if has_times else np.full(n_groups, np.nan)
+    holding = np.full(n_groups, np.nan)
+    if has_times and len(group):
+        entry_time = np.asarray(entry_time, dtype=np.int64)
+        exit_time = np.asarray(exit_time, dtype=np.int64)
+        holding = _safe_divide(total((exit_time - entry_time).astype(float)), trades) / 1e9
+
+        # Time of the last peak strictly before each trade; the start (first entry) is a peak
+        first = np.r_[True, group[1:] != group[:-1]]
+        start_time = pd.Series(np.where(first, entry_time, np.nan)).ffill().to_numpy()
+        peak_time = pd.Series(np.where(drawdown == 0, exit_time, np.nan)).groupby(group).shift(1)
+        peak_time = peak_time.groupby(group).ffill().to_numpy()
+        peak_time = np.where(np.isnan(peak_time), start_time, peak_time)
+        # Underwater trades, and the trade that recovers (previous one underwater)
+        under = drawdown > 0
+        prev_under = np.r_[False, under[:-1]] & ~first
+        spell = np.where(under | prev_under, exit_time - peak_time, 0.0)
+        np.maximum.at(duration, group, spell)
+        duration /= 1e9
+    out["max_drawdown_duration"] = duration
+    out["avg_holding"] = holding
+
+    if bars_held is not None:
+        held = total(np.asarray(bars_held, dtype=float))
+        out["avg_bars_held"] = _safe_divide(held, trades)
+        out["exposure"] = (_safe_divide(100.0 * held, n_bars) if n_bars is not None
+                           else np.full(n_groups, np.nan))
+    else:
+        out["avg_bars_held"] = np.nan
+        out["exposure"] = np.nan
+
+    # Sharpe / Sortino over per-day P/L: only days with an exit are non-zero
+    sharpe = sortino = np.full(n_groups, np.nan)
+    if exit_time is not None and len(group):
+        day = local_days(exit_time, tz)
+        daily = pd.Series(pl).groupby([group, day]).sum()
+        daily_group = daily.index.get_level_values(0).to_numpy()
+        daily = daily.to_numpy()
+        days = (np.bincount(daily_group, minlength=n_groups)[:n_groups] if n_days is None
+                else np.broadcast_to(np.asarray(n_days, dtype=float), (n_groups,)))
+        sum_sq = np.bincount(daily_group, weights=daily ** 2, minlength=n_groups)[:n_groups]
+        down_sq = np.bincount(daily_group, weights=np.minimum(daily, 0.0) ** 2, minlength=n_groups)[:n_groups]
+        mean = _safe_divide(out["total_profit"].to_numpy(), days)
+        var = _safe_divide(sum_sq - days * mean ** 2, days - 1)
+        root = np.sqrt(PERIODS_PER_YEAR)
+        sharpe = _safe_divide(mean, np.sqrt(np.maximum(var, 0.0))) * root
+        sortino = _safe_divide(mean, np.sqrt(_safe_divide(down_sq, days))) * root
+    out["sharpe"] = sharpe
+    out["sortino"] = sortino
+    return out[METRIC_COLUMNS]
+
+
+def _datetime_index(index):
+    """`index` (or a 'time' column) as a DatetimeIndex, None if it holds no datetimes."""
+    if index is None or isinstance(index, pd.DatetimeIndex):
+        return index
+    if pd.api.types.is_datetime64_any_dtype(index):
+        return pd.DatetimeIndex(index)
+    return None
+
+
+def _ledger_times(ledger, index=None):
+    """(entry ns, exit ns, tz) of a ledger's trades; the bar index wins when given."""
+    if index is not None:
+        ns = index.as_unit("ns").asi8
+        return ns[ledger["entry_idx"]], ns[ledger["exit_idx"]], index.tz
+    time_dtype = ledger.time_dtype
+    if time_dtype is not None and time_dtype.kind == "M":
+        return ledger["entry_time"], ledger["exit_time"], getattr(time_dtype, "tz", None)
+    return None, None, None
+
+
+def batch_metrics(ledgers, index=None, n_bars=None, n_days=None):
+    """
+    Metrics of many ledgers (e.g. every combination of a sweep) in one
+    vectorized pass. `index` is the bar index all of them ran on, if they
+    share one; n_bars / n_days default to its bars and trading days.
+    Returns one row per ledger, in order.
+    """
+    ledgers = list(ledgers)
+    n_bars = len(index) if n_bars is None and index is not None else n_bars
+    index = _datetime_index(index)
+    sizes = np.array([len(ledger) for ledger in ledgers], dtype=np.int64)
+    group = np.repeat(np.arange(len(ledgers)), sizes)
+    records = [ledger.records for ledger in ledgers]
+    trades = np.concatenate(records) if records else np.empty(0, dtype="i8")
+    if not len(trades):
+        none = np.empty(0, dtype=np.int64)
+        return grouped_metrics(group, len(ledgers), np.empty(0), none, none, none, n_bars)
+
+    times = [_ledger_times(ledger, index) for ledger in ledgers]
+    has_times = all(t[0] is not None for t, size in zip(times, sizes) if size)
+    entry_time = np.concatenate([t[0] for t in times if t[0] is not None]) if has_times else None
+    exit_time = np.concatenate([t[1] for t in times if t[1] is not None]) if has_times else None
+    tz = next((t[2] for t in times if t[2] is not None), None)
+    if n_days is None and index is not None:
+        n_days = count_days(index)
+    return grouped_metrics(group, len(ledgers), trades["pl"], entry_time, exit_time,
+                           trades["exit_idx"] - trades["entry_idx"], n_bars, n_days, tz)
+
+
+def compute_stats(ledger, index=None):
+    """
+    Every metric of one ledger as a dict. Pass the bar `index` the strategy
+    ran on for exposure, trading-day counts and (when the ledger has no
+    datetime index of its own) the trade times.
+    """
+    return batch_metrics([ledger], index).to_dict(orient="records")[0]
+
+
+def daily_pnl(ledger, index=None):
+    """P/L per local calendar day of the exits (days without an exit left out)."""
+    _, exit_time, tz = _ledger_times(ledger, _datetime_index(index))
+    if exit_time is None:
+        raise ValueError("daily_pnl needs trade times: pass the bar index")
+    day = local_days(exit_time, tz)
+    daily = pd.Series(ledger["pl"]).groupby(day).sum()
+    daily.index = pd.to_datetime(daily.index.to_numpy() * DAY_NS).rename("day")
+    return daily.rename("P/L")
+
+
+def equity_metrics(equity, index):
+    """
+    Drawdown and per-day P/L of a bar-level equity curve.
+
+    Returns:
+        stats (dict): max_drawdown, max_drawdown_duration (seconds),
+            sharpe and sortino over per-day equity changes
+        daily (pd.Series): equity change per local day
+    """
+    equity = np.asarray(equity, dtype=float)
+    index = pd.DatetimeIndex(index)
+    if not len(equity):
+        return {"max_drawdown": 0.0, "max_drawdown_duration": np.nan, "sharpe": np.nan,
+                "sortino": np.nan}, pd.Series(dtype=float, name="P/L")
+    ns = index.as_unit("ns").asi8
+    peak = np.maximum.accumulate(equity)
+    drawdown = peak - equity
+
+    # Bars at a peak start a new spell; a spell lasts until the next peak bar
+    at_peak = drawdown <= 0
+    peak_pos = np.maximum.accumulate(np.where(at_peak, np.arange(len(equity)), 0))
+    spell = ns - ns[peak_pos]
+    recovered = np.r_[False, at_peak[1:] & ~at_peak[:-1]]
+    prev_peak = np.r_[0, peak_pos[:-1]]
+    spell = np.where(recovered, ns - ns[prev_peak], spell)
+
+    day = local_days(ns, index.tz)
+    last_of_day = np.r_[day[1:] != day[:-1], True]
+    closes = equity[last_of_day]
+    daily = np.diff(np.r_[equity[0], closes])
+    mean = daily.mean()
+    std = daily.std(ddof=1) if len(daily) > 1 else np.nan
+    downside = np.sqrt((np.minimum(daily, 0.0) ** 2).mean())
+    root = np.sqrt(PERIODS_PER_YEAR)
+    stats = {
+        "max_drawdown": float(drawdown.max()),
+        "max_drawdown_duration": float(spell.max()) / 1e9,
+        "sharpe": float(mean / std * root) if std else np.nan,
+        "sortino": float(mean / downside * root) if downside else np.nan
+    }
+    days = pd.to_datetime(day[last_of_day] * DAY_NS).rename("day")
+    return stats, pd.Series(daily, index=days, name="P/L")
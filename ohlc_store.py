@@ -0,0 +1,263 @@
+"""
+Append-only, memory-mapped OHLC store, one per NSE_<STOCK>_<TF>.csv.
+
+Layout under `<csv folder>/.store/<name>/`:
+    time.i8           int64 UTC nanoseconds, sorted ascending
+    <column>.f8       float64, one file per price column (open, high, low, close, ...)
+    meta.json         row count, columns, timezone, the source CSV stamp and a
+                      build id that changes whenever the store is rewritten
+                      rather than appended to
+
+A date-range query is two `searchsorted` calls on the time index and returns
+zero-copy slices of the memory-mapped columns, so it costs the same whether
+the file holds two weeks or ten years. New bars are appended; `meta.json`
+is rewritten last, so readers never see a half-written append, and the
+next append first cuts each column back to the row count in `meta.json`.
+"""
+import datetime
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from data_cache import date_bounds, load_ohlc
+
+try:
+    import fcntl
+except ImportError:  # Windows: no inter-process lock, single writer assumed
+    fcntl = None
+
+STORE_DIR = ".store"
+
+
+def store_path(filepath):
+    """Directory holding the memory-mapped copy of `filepath`."""
+    folder, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(folder, STORE_DIR, os.path.splitext(name)[0])
+
+
+def _tz_to_name(tz):
+    if tz is None:
+        return None
+    if isinstance(tz, datetime.timezone):
+        # Fixed offsets such as the '+05:30' in the NSE files
+        minutes = int(tz.utcoffset(None).total_seconds() // 60)
+        sign = "+" if minutes >= 0 else "-"
+        return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+    return str(tz)
+
+
+def _tz_from_name(name):
+    if name is None:
+        return None
+    if name[0] in "+-":
+        hours, minutes = name[1:].split(":")
+        offset = datetime.timedelta(hours=int(hours), minutes=int(minutes))
+        return datetime.timezone(-offset if name[0] == "-" else offset)
+    return name
+
+
+@contextmanager
+def _locked(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class OHLCView:
+    """
+    A date window of an OHLCStore: `time` (int64 UTC ns) plus one NumPy
+    array per price column, all views into the memory-mapped files.
+    """
+
+    def __init__(self, time, columns, tz):
+        self.time = time
+        self.columns = columns
+        self.tz = tz
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, name):
+        if name == "time":
+            return self.time
+        return self.columns[name]
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["columns"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def index(self):
+        """The time index as tz-aware pandas timestamps."""
+        index = pd.DatetimeIndex(np.asarray(self.time).view("datetime64[ns]")).tz_localize("UTC")
+        return index.tz_convert(self.tz) if self.tz is not None else index.tz_localize(None)
+
+    def to_frame(self):
+        """DataFrame with a 'time' column, the layout utils.load_csv returns."""
+        df = pd.DataFrame(self.columns, copy=False)
+        df.insert(0, "time", self.index)
+        return df
+
+
+class OHLCStore:
+    """Memory-mapped columns of one symbol/timeframe. See module docstring."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.tz = _tz_from_name(self.meta["tz"])
+        rows = self.meta["rows"]
+        self.time = self._map("time.i8", np.int64, rows)
+        self.columns = {col: self._map(f"{col}.f8", np.float64, rows) for col in self.meta["columns"]}
+
+    def _map(self, name, dtype, rows):
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=(rows,))
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def slice(self, from_date=None, to_date=None):
+        """Rows from from_date to the end of to_date (None = open end) as an OHLCView."""
+        start, end = date_bounds(from_date, to_date, self.tz)
+        lo = np.searchsorted(self.time, start.value, side="left") if start is not None else 0
+        hi = np.searchsorted(self.time, end.value, side="right") if end is not None else len(self)
+        return OHLCView(self.time[lo:hi], {col: arr[lo:hi] for col, arr in self.columns.items()}, self.tz)
+
+    @staticmethod
+    def write(path, df, source_stamp=None, append=False):
+        """
+        Write `df` (a 'time' column plus float columns) to the store at `path`,
+        either as a fresh store or appended after the existing rows.
+        Appended rows must be newer than the last stored bar.
+        """
+        os.makedirs(path, exist_ok=True)
+        meta_file = os.path.join(path, "meta.json")
+        time = pd.DatetimeIndex(df["time"])
+        columns = [col for col in df.columns
+                   if col != "time" and pd.api.types.is_numeric_dtype(df[col])]
+
+        if append:
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if meta["columns"] != columns:
+                raise ValueError(f"column mismatch: store has {meta['columns']}, got {columns}")
+        else:
+            meta = {"rows": 0, "columns": columns, "tz": _tz_to_name(time.tz), "build": os.urandom(8).hex()}
+
+        time_ns = time.as_unit("ns").asi8
+        if len(time_ns) > 1 and (np.diff(time_ns) < 0).any():
+            raise ValueError("bars must be sorted by time")
+
+        def write_column(name, values):
+            with open(os.path.join(path, name), "r+b" if append else "wb") as f:
+                if append:
+                    # Drop bytes an append that crashed before meta.json left behind
+                    f.truncate(meta["rows"] * values.itemsize)
+                    f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+
+        write_column("time.i8", np.ascontiguousarray(time_ns, dtype=np.int64))
+        for col in columns:
+            write_column(f"{col}.f8", np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)))
+
+        meta["rows"] += len(df)
+        if source_stamp is not None:
+            meta["source"] = source_stamp
+        tmp_file = f"{meta_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_file, meta_file)
+
+    def append(self, df, source_stamp=None):
+        """Append bars newer than the last stored one; older/duplicate bars are skipped."""
+        if len(self):
+            last = pd.Timestamp(int(self.time[-1]), tz="UTC")
+            df = df[pd.DatetimeIndex(df["time"]) > last]
+        if len(df) or source_stamp is not None:
+            OHLCStore.write(self.path, df, source_stamp, append=True)
+        return OHLCStore(self.path)
+
+
+def rebuild_store(path, df, source_stamp=None):
+    """
+    Replace the store at `path` with `df`. The new store is built beside the
+    live one and swapped in: readers that still map the old files keep them
+    (POSIX), nobody sees a truncated column.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    OHLCStore.write(tmp_path, df, source_stamp=source_stamp)
+    if os.path.exists(path):
+        old_path = f"{path}.{os.getpid()}.old"
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(tmp_path, path)
+    return OHLCStore(path)
+
+
+def _csv_stamp(filepath):
+    stat = os.stat(filepath)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def open_store(filepath):
+    """
+    The OHLCStore for `filepath`, built on first use and brought up to date
+    when the CSV changed: if the stored bars are still its first rows, value
+    for value, the new ones are appended; anything else (edited or removed
+    rows) rebuilds the store.
+    """
+    path = store_path(filepath)
+    stamp = _csv_stamp(filepath)
+    meta_file = os.path.join(path, "meta.json")
+
+    if os.path.exists(meta_file):
+        store = OHLCStore(path)
+        if store.meta.get("source") == stamp:
+            return store
+
+    with _locked(path):
+        store = OHLCStore(path) if os.path.exists(meta_file) else None
+        if store is not None and store.meta.get("source") == stamp:
+            return store  # another process synced it while we waited
+
+        df = load_ohlc(filepath)
+        if store is not None and len(store) and len(df) >= len(store) and _same_prefix(store, df):
+            return store.append(df.iloc[len(store):], source_stamp=stamp)
+
+        return rebuild_store(path, df, source_stamp=stamp)
+
+
+def _same_prefix(store, df):
+    """True if the first len(store) rows of `df` are exactly the stored bars."""
+    n = len(store)
+    columns = [col for col in df.columns if col != "time" and pd.api.types.is_numeric_dtype(df[col])]
+    if columns != store.meta["columns"]:
+        return False
+    new_time = pd.DatetimeIndex(df["time"][:n]).as_unit("ns").asi8
+    if not np.array_equal(new_time, store.time):
+        return False
+    return all(np.array_equal(df[col].to_numpy(dtype=np.float64)[:n], store.columns[col], equal_nan=True)
+               for col in columns)
+
+
+def load_view(filepath, from_date=None, to_date=None):
+    """Zero-copy OHLCView of `filepath` between from_date and the end of to_date."""
+    return open_store(filepath).slice(from_date, to_date)
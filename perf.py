@@ -0,0 +1,227 @@
+"""
+Lightweight timing spans for the load -> indicators -> strategy hot path.
+
+Spans are only recorded inside a `collect()` block; everywhere else
+`span()` hands back a shared no-op object and `@timed` functions go
+straight to the wrapped call, so the instrumentation costs a context-var
+lookup when nobody is looking.
+
+    with perf.collect() as run:
+        df = load_csv(path, from_date, to_date)          # @timed("load_csv")
+        with perf.span("my step", rows=len(df)) as s:
+            perf.debug("columns", df.columns.tolist())   # kept on the span
+    run.to_frame()      # one row per span: wall time, rows, memory delta
+    run.export_jsonl("spans.jsonl")
+
+Each span records wall time, rows processed and the change in resident
+memory. `debug()` replaces the old debug prints: inside a run the message
+is attached to the innermost span (and printed when PERF_VERBOSE=1),
+outside a run it is dropped without formatting its arguments.
+
+Setting PERF_SPANS_FILE appends every collected run to that JSON-lines file.
+"""
+import contextvars
+import functools
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+VERBOSE = os.environ.get("PERF_VERBOSE", "") == "1"
+SPANS_FILE = os.environ.get("PERF_SPANS_FILE")
+
+_RUN = contextvars.ContextVar("perf_run", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """Current resident set size, or None where it cannot be read cheaply."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        pass
+    if resource is not None:
+        # Peak, not current, outside Linux: good enough to spot big allocations
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    return None
+
+
+class Span:
+    """One timed section. Set `rows` inside the block if it is only known there."""
+    __slots__ = ("name", "rows", "depth", "start", "seconds", "rss_before", "rss_delta", "notes", "_run")
+
+    def __init__(self, run, name, rows=None):
+        self._run = run
+        self.name = name
+        self.rows = rows
+        self.depth = 0
+        self.start = None
+        self.seconds = None
+        self.rss_before = None
+        self.rss_delta = None
+        self.notes = []
+
+    def __enter__(self):
+        run = self._run
+        self.depth = len(run.stack)
+        run.stack.append(self)
+        self.rss_before = rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        run = self._run
+        self.seconds = time.perf_counter() - self.start
+        rss = rss_bytes()
+        if rss is not None and self.rss_before is not None:
+            self.rss_delta = rss - self.rss_before
+        run.stack.pop()
+        run.spans.append(self)
+        return False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "start": round(self.start - self._run.started, 6),
+            "seconds": round(self.seconds, 6),
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / self.seconds) if self.rows and self.seconds else None,
+            "mem_delta_mb": round(self.rss_delta / 1e6, 2) if self.rss_delta is not None else None,
+            "notes": self.notes
+        }
+
+
+class _NullSpan:
+    """What span() returns outside a run: every operation is a no-op."""
+    __slots__ = ()
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Run:
+    """The spans collected by one collect() block, in the order they finished."""
+
+    def __init__(self, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.created = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.stack = []
+        self.notes = []
+
+    def records(self):
+        # Start order reads like a call tree
+        return [s.to_dict() for s in sorted(self.spans, key=lambda s: s.start)]
+
+    def to_frame(self):
+        columns = ["name", "depth", "start", "seconds", "rows", "rows_per_sec", "mem_delta_mb", "notes"]
+        df = pd.DataFrame(self.records(), columns=columns)
+        df["name"] = ["  " * d + n for d, n in zip(df["depth"], df["name"])]
+        df["notes"] = df["notes"].map(len)
+        return df.drop(columns="depth")
+
+    def total_seconds(self):
+        return sum(s.seconds for s in self.spans if s.depth == 0)
+
+    def export_jsonl(self, path):
+        """Append one JSON object per span to `path`."""
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.records():
+                record = {"run": self.id, "label": self.label, "time": self.created, **record}
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+class collect:
+    """Context manager that records spans for everything run inside it."""
+
+    def __init__(self, label=None, export_path=None):
+        self.run = Run(label)
+        self.export_path = export_path or SPANS_FILE
+        self._token = None
+
+    def __enter__(self):
+        self._token = _RUN.set(self.run)
+        return self.run
+
+    def __exit__(self, *exc):
+        _RUN.reset(self._token)
+        if self.export_path:
+            self.run.export_jsonl(self.export_path)
+        return False
+
+
+def enabled():
+    return _RUN.get() is not None
+
+
+def span(name, rows=None):
+    """Time a block: `with span("stage", rows=n) as s: ...`."""
+    run = _RUN.get()
+    if run is None:
+        return _NULL_SPAN
+    return Span(run, name, rows)
+
+
+def _rows_of(obj):
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def timed(name=None, rows="arg"):
+    """
+    Decorator: run the function in a span. `rows` is counted from the first
+    argument ("arg") or from the return value ("result", first item of a tuple).
+    """
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            run = _RUN.get()
+            if run is None:
+                return fn(*args, **kwargs)
+            with Span(run, span_name, _rows_of(args[0]) if rows == "arg" and args else None) as s:
+                result = fn(*args, **kwargs)
+                if rows == "result":
+                    s.rows = _rows_of(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def debug(*args):
+    """The hot path's debug print: kept on the current span inside a run, free outside one."""
+    run = _RUN.get()
+    if run is None:
+        return
+    message = " ".join(str(a) for a in args)
+    (run.stack[-1].notes if run.stack else run.notes).append(message)
+    if VERBOSE:
+        print(message)
@@ -0,0 +1,219 @@
+"""
+Portfolio backtest: the apply_strategy rules run on a basket of symbols
+that share one capital pool.
+
+Each symbol is run through apply_strategy on its own, one at a time, and
+only its trade ledger is kept (entry/exit time and price). The entries and exits
+of all symbols are then merged into one time-ordered event list and
+replayed against the pool:
+
+- at most `max_positions` positions are open at once,
+- each entry is sized to `position_size` x current equity (whole shares,
+  never more than the free cash),
+- an entry that finds no free slot or cash is skipped; the symbol's own
+  signal sequence is left as it is,
+- exits at the same timestamp are filled before entries, so freed capital
+  can be reused on that bar,
+- short trades (strategy_rules["direction"] "short" or "both") are fully
+  collateralised: the entry value is set aside from cash like a long
+  purchase, and the exit returns it plus the short's P/L.
+
+Memory grows with the number of trades, not symbols x bars. The bars are
+only read again to mark open positions to market at each event time, with
+a searchsorted into that symbol's own (memory-mapped) close column.
+
+    trades_df, equity_df, stats = run_portfolio(
+        {"RELIANCE": "stock_data/NSE_RELIANCE_1.csv", "TATAMOTORS": tata_df},
+        strategy_rules, initial_capital=1_000_000, max_positions=5)
+"""
+import numpy as np
+import pandas as pd
+
+from ohlc_store import OHLCView, load_view
+from strategy import strategy_ledger
+
+
+def _symbol_bars(source, from_date=None, to_date=None):
+    """
+    Bars of one symbol as (frame for apply_strategy, time ns, close).
+    `source` is a CSV path (read through the memory-mapped store), an
+    OHLCView, or a DataFrame indexed by time or with a 'time' column.
+    """
+    if isinstance(source, str):
+        source = load_view(source, from_date, to_date)
+    if isinstance(source, OHLCView):
+        return source, np.asarray(source.time), np.asarray(source.close)
+
+    df = source.copy()
+    df.columns = [col.lower() for col in df.columns]
+    if "time" in df.columns:
+        df = df.set_index("time")
+    time = pd.DatetimeIndex(df.index)
+    if time.tz is None:
+        time = time.tz_localize("UTC")
+    df.index = time  # parsed, so the strategy's trade times are datetimes too
+    return df, time.as_unit("ns").asi8, df["close"].to_numpy(dtype=float)
+
+
+def _close_at(time, close, t):
+    """Last close at or before t (int64 ns)."""
+    i = np.searchsorted(time, t, side="right") - 1
+    return close[i] if i >= 0 else np.nan
+
+
+def _to_times(values, tz):
+    times = pd.to_datetime(np.asarray(values, dtype=np.int64), utc=True)
+    return times.tz_convert(tz) if tz is not None else times
+
+
+def collect_signals(sources, strategy_rules, from_date=None, to_date=None, **params):
+    """
+    Run apply_strategy on every symbol, one at a time.
+
+    Returns:
+        signals (pd.DataFrame): Symbol, Entry/Exit Time (int64 ns), Entry/Exit Price,
+            Side (1 long, -1 short), one row per trade the strategy takes on
+            that symbol alone
+        bars (dict): symbol -> (time ns, close) for marking to market
+    """
+    frames = []
+    bars = {}
+    tz = None
+    for symbol, source in sources.items():
+        df, time, close = _symbol_bars(source, from_date, to_date)
+        bars[symbol] = (time, close)
+        if tz is None:
+            tz = df.tz if isinstance(df, OHLCView) else df.index.tz
+        if len(time) == 0:
+            continue
+        ledger = strategy_ledger(df, strategy_rules, **params)
+        if not len(ledger):
+            continue
+        frames.append(pd.DataFrame({
+            "Symbol": symbol,
+            "Entry Time": ledger["entry_time"],
+            "Exit Time": ledger["exit_time"],
+            "Entry Price": ledger["entry_price"],
+            "Exit Price": ledger["exit_price"],
+            "Side": ledger["side"]
+        }))
+
+    columns = ["Symbol", "Entry Time", "Exit Time", "Entry Price", "Exit Price", "Side"]
+    signals = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    signals.attrs["tz"] = tz
+    return signals, bars
+
+
+def simulate(signals, bars, initial_capital=1_000_000.0, max_positions=10, position_size=None):
+    """
+    Replay the merged entry/exit events of `signals` (see collect_signals)
+    against one capital pool. position_size is the fraction of equity put
+    into each new position, 1 / max_positions by default.
+
+    Returns:
+        trades_df (pd.DataFrame): the trades actually taken, with Quantity and P/L
+        equity_df (pd.DataFrame): cash, equity and open positions after each event time
+        skipped (int): entry signals skipped for lack of a slot or cash
+    """
+    if position_size is None:
+        position_size = 1.0 / max_positions
+    tz = signals.attrs.get("tz")
+
+    n = len(signals)
+    symbols = signals["Symbol"].to_numpy()
+    entry_time = signals["Entry Time"].to_numpy(dtype=np.int64)
+    exit_time = signals["Exit Time"].to_numpy(dtype=np.int64)
+    entry_price = signals["Entry Price"].to_numpy(dtype=float)
+    exit_price = signals["Exit Price"].to_numpy(dtype=float)
+    side = signals["Side"].to_numpy(dtype=np.int64) if "Side" in signals else np.ones(n, dtype=np.int64)
+
+    # One entry and one exit event per trade; at equal times exits (kind 0) go first
+    event_time = np.concatenate((entry_time, exit_time))
+    event_kind = np.concatenate((np.ones(n, dtype=np.int8), np.zeros(n, dtype=np.int8)))
+    event_trade = np.concatenate((np.arange(n), np.arange(n)))
+    order = np.lexsort((event_trade, event_kind, event_time))
+
+    cash = float(initial_capital)
+    quantity = np.zeros(n, dtype=np.int64)
+    open_trades = set()
+    skipped = 0
+    curve = []
+
+    def value(j, price):
+        """What open trade j gives back at `price`: its entry value plus its P/L."""
+        return quantity[j] * (entry_price[j] + side[j] * (price - entry_price[j]))
+
+    for k, e in enumerate(order):
+        trade = event_trade[e]
+        if event_kind[e] == 0:
+            if trade in open_trades:
+                open_trades.discard(trade)
+                cash += value(trade, exit_price[trade])
+        else:
+            # Equity at this instant, open positions at their latest close
+            t = event_time[e]
+            equity = cash + sum(value(j, _close_at(*bars[symbols[j]], t)) for j in open_trades)
+            qty = int(min(equity * position_size, cash) // entry_price[trade])
+            if len(open_trades) >= max_positions or qty < 1:
+                skipped += 1
+            else:
+                quantity[trade] = qty
+                cash -= qty * entry_price[trade]
+                open_trades.add(trade)
+
+        # One curve point per timestamp, after all of its events
+        if k + 1 == len(order) or event_time[order[k + 1]] != event_time[e]:
+            t = event_time[e]
+            held = sum(value(j, _close_at(*bars[symbols[j]], t)) for j in open_trades)
+            curve.append((t, cash, cash + held, len(open_trades)))
+
+    taken = quantity > 0
+    trades_df = signals[taken].copy()
+    trades_df["Quantity"] = quantity[taken]
+    trades_df["P/L"] = np.round(side[taken] * quantity[taken] * (exit_price[taken] - entry_price[taken]), 2)
+    # Like TradeLedger.to_frame: a Side column only when there are shorts
+    shorts = side[taken] < 0
+    if shorts.any():
+        trades_df["Side"] = np.where(shorts, "Short", "Long")
+    else:
+        trades_df = trades_df.drop(columns="Side", errors="ignore")
+    for col in ("Entry Time", "Exit Time"):
+        trades_df[col] = _to_times(trades_df[col], tz)
+    trades_df = trades_df.sort_values("Entry Time", kind="stable").reset_index(drop=True)
+
+    equity_df = pd.DataFrame(curve, columns=["time", "cash", "equity", "positions"])
+    equity_df["time"] = _to_times(equity_df["time"], tz)
+    return trades_df, equity_df, skipped
+
+
+def run_portfolio(sources, strategy_rules, initial_capital=1_000_000.0, max_positions=10,
+                  position_size=None, from_date=None, to_date=None, **params):
+    """
+    Backtest the strategy on a basket of symbols sharing one capital pool.
+
+    `sources` maps symbol -> CSV path, OHLCView or DataFrame. `params` are
+    apply_strategy's indicator settings (ema_period, rsi_period, ...).
+
+    Returns:
+        trades_df (pd.DataFrame): Symbol, Entry/Exit Time, Entry/Exit Price, Quantity, P/L
+            (and Side, when there are short trades)
+        equity_df (pd.DataFrame): time, cash, equity, positions
+        stats (dict): final equity, return, win rate, max drawdown, trade counts
+    """
+    signals, bars = collect_signals(sources, strategy_rules, from_date, to_date, **params)
+    trades_df, equity_df, skipped = simulate(signals, bars, initial_capital, max_positions, position_size)
+
+    equity = equity_df["equity"].to_numpy(dtype=float)
+    peak = np.maximum.accumulate(np.r_[initial_capital, equity])
+    drawdown = (peak - np.r_[initial_capital, equity]) / peak
+    final_equity = equity[-1] if len(equity) else float(initial_capital)
+    stats = {
+        "final_equity": round(float(final_equity), 2),
+        "total_profit": round(float(trades_df["P/L"].sum()), 2) if not trades_df.empty else 0.0,
+        "return_pct": round(float(100.0 * (final_equity / initial_capital - 1)), 2),
+        "win_rate": round(float((trades_df["P/L"] > 0).mean() * 100), 2) if not trades_df.empty else 0.0,
+        "max_drawdown_pct": round(float(drawdown.max() * 100), 2),
+        "trades": len(trades_df),
+        "skipped_signals": skipped
+    }
+    return trades_df, equity_df, stats
@@ -0,0 +1,167 @@
+"""
+Higher timeframes derived from the 1-minute files.
+
+Bars are aligned to the NSE session (09:15-15:30, +05:30): a 5-minute bar
+covers 09:15-09:20, an hourly bar 09:15-10:15 ... 15:15-15:30, a daily bar
+the whole session. No bar spans two sessions, and minutes outside the
+session are left out.
+
+Completed bars are cached in an append-only ohlc_store next to the
+1-minute store (`.store/NSE_<STOCK>_1@<TF>/`), so each timeframe is built
+once and then only extended with the minutes appended since. The last,
+possibly still forming, bar is never stored; it is rebuilt from the minute
+tail on every load.
+"""
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import date_bounds
+from ohlc_store import OHLCStore, OHLCView, _locked, open_store, rebuild_store, store_path
+
+SESSION_TZ = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+SESSION_OPEN = 9 * 60 + 15     # minutes after local midnight
+SESSION_CLOSE = 15 * 60 + 30
+
+TIMEFRAMES = ["1", "5", "15", "30", "60", "D"]
+
+_NS_PER_MINUTE = 60 * 10**9
+_MINUTES_PER_DAY = 24 * 60
+
+
+def bucket_keys(time_ns, timeframe):
+    """
+    Start of the session-aligned bar each timestamp (int64 UTC ns) falls in,
+    as int64 UTC ns; -1 for timestamps outside the session.
+    """
+    offset_minutes = int(SESSION_TZ.utcoffset(None).total_seconds() // 60)
+    local_minutes = np.asarray(time_ns, dtype=np.int64) // _NS_PER_MINUTE + offset_minutes
+    day, minute_of_day = np.divmod(local_minutes, _MINUTES_PER_DAY)
+    in_session = (minute_of_day >= SESSION_OPEN) & (minute_of_day < SESSION_CLOSE)
+
+    if timeframe == "D":
+        start_minute = np.zeros_like(minute_of_day)
+    else:
+        step = int(timeframe)
+        start_minute = SESSION_OPEN + (minute_of_day - SESSION_OPEN) // step * step
+
+    keys = (day * _MINUTES_PER_DAY + start_minute - offset_minutes) * _NS_PER_MINUTE
+    return np.where(in_session, keys, -1)
+
+
+def resample_arrays(time_ns, columns, timeframe):
+    """
+    Aggregate sorted bars into `timeframe` bars: first open, max high,
+    min low, last close, summed volume.
+
+    Returns (bar_time_ns, bar_columns, first_row) where first_row[i] is the
+    index of the first input row of output bar i.
+    """
+    keys = bucket_keys(time_ns, timeframe)
+    rows = np.flatnonzero(keys >= 0)
+    keys = keys[rows]
+    if len(rows) == 0:
+        return np.empty(0, dtype=np.int64), {col: np.empty(0) for col in columns}, rows
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(rows)] - 1
+    out = {}
+    for col, values in columns.items():
+        values = np.asarray(values, dtype=np.float64)[rows]
+        if col == "open":
+            out[col] = values[starts]
+        elif col == "high":
+            out[col] = np.maximum.reduceat(values, starts)
+        elif col == "low":
+            out[col] = np.minimum.reduceat(values, starts)
+        elif col == "volume":
+            out[col] = np.add.reduceat(values, starts)
+        else:  # close and anything else: last value of the bar
+            out[col] = values[ends]
+    return keys[starts], out, rows[starts]
+
+
+def resample_ohlc(df, timeframe):
+    """Resample a DataFrame with a tz-aware 'time' column (utils.load_csv layout)."""
+    time = pd.DatetimeIndex(df["time"])
+    time_ns = time.as_unit("ns").asi8
+    columns = {col: df[col].to_numpy() for col in df.columns
+               if col != "time" and pd.api.types.is_numeric_dtype(df[col])}
+    bar_time, bars, _ = resample_arrays(time_ns, columns, timeframe)
+    return OHLCView(bar_time, bars, time.tz).to_frame()
+
+
+def _time_at(store, row):
+    return int(store.time[row]) if 0 <= row < len(store) else None
+
+
+def _sync_derived(base, path, timeframe):
+    """
+    Bring the store of completed `timeframe` bars at `path` up to date with
+    the 1-minute store `base`. Returns (derived store, consumed): base rows
+    [consumed:] are the minutes of the still-open last bar.
+    """
+    meta_file = os.path.join(path, "meta.json")
+    base_first = _time_at(base, 0)
+
+    with _locked(path):
+        derived = OHLCStore(path) if os.path.exists(meta_file) else None
+        state = derived.meta.get("source", {}) if derived is not None else {}
+        # Incremental only if the minutes already consumed are still in place:
+        # the same build of the base store (a rebuild means rows were edited
+        # or removed, an append keeps the build) with the same first and last bar
+        consumed = state.get("consumed", -1)
+        incremental = (state.get("base_build") == base.meta.get("build")
+                       and state.get("base_first") == base_first and 0 <= consumed <= len(base)
+                       and state.get("base_last") == _time_at(base, consumed - 1))
+        if not incremental:
+            consumed = 0
+
+        bar_time, bars, first_row = resample_arrays(
+            base.time[consumed:], {col: arr[consumed:] for col, arr in base.columns.items()}, timeframe)
+        if incremental and len(bar_time) < 2:
+            return derived, consumed  # no bar completed since the last sync
+
+        # Everything but the last bar is complete; it is kept from the minute where it starts
+        new_consumed = consumed + int(first_row[-1]) if len(bar_time) else len(base)
+        complete = OHLCView(bar_time[:-1], {col: values[:-1] for col, values in bars.items()},
+                            base.tz).to_frame()
+        stamp = {"base_build": base.meta.get("build"), "base_first": base_first,
+                 "base_last": _time_at(base, new_consumed - 1),
+                 "consumed": new_consumed, "timeframe": timeframe}
+        if incremental:
+            derived = derived.append(complete, source_stamp=stamp)
+        else:
+            derived = rebuild_store(path, complete, source_stamp=stamp)
+        return derived, new_consumed
+
+
+def load_resampled(base_csv, timeframe, from_date=None, to_date=None):
+    """
+    `timeframe` bars built from the 1-minute CSV `base_csv`, from from_date to
+    the end of to_date (None = open end), in the utils.load_csv layout.
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"unknown timeframe {timeframe!r}, expected one of {TIMEFRAMES}")
+    base = open_store(base_csv)
+    if timeframe == "1":
+        return base.slice(from_date, to_date).to_frame()
+
+    derived, consumed = _sync_derived(base, f"{store_path(base_csv)}@{timeframe}", timeframe)
+    done = derived.slice(from_date, to_date).to_frame()
+
+    # The open bar, rebuilt from the minute tail
+    bar_time, bars, _ = resample_arrays(
+        base.time[consumed:], {col: arr[consumed:] for col, arr in base.columns.items()}, timeframe)
+    start, end = date_bounds(from_date, to_date, base.tz)
+    keep = np.ones(len(bar_time), dtype=bool)
+    if start is not None:
+        keep &= bar_time >= start.value
+    if end is not None:
+        keep &= bar_time <= end.value
+    if keep.any():
+        last = OHLCView(bar_time[keep], {col: values[keep] for col, values in bars.items()}, base.tz)
+        done = pd.concat([done, last.to_frame()], ignore_index=True)
+    return done
@@ -0,0 +1,514 @@
+"""
+Rule language for strategies, compiled to vectorized masks.
+
+Buy and sell rules are written as expressions over the bars instead of
+the toggle dict of App.py's sidebar:
+
+    strategy = compile_rules({
+        "buy": "close > ema(20) and rsi(14) < 30 and supertrend_dir(10, 3) == 1",
+        "sell": "rsi(14) > 60 or close < ema(20) or supertrend_dir(10, 3) == -1"
+    })
+    buy, sell = strategy.masks(df)
+    ledger = strategy.ledger(df)           # or strategy_ledger(df, {"buy": ..., "sell": ...})
+
+"direction" ("long", "short" or "both") and "pyramiding" keys next to
+"buy" / "sell" pick the position book, as for the toggle rules (see
+signals.resolve_positions).
+
+Syntax (a subset of Python expressions):
+    and, or, not, ( )                    boolean logic
+    < <= > >= == !=                      comparisons, chains like 30 < rsi(14) < 70
+    + - * /                              arithmetic
+    open high low close volume           bar columns, True / False, numbers
+    ema(length, source=close)            ta.ema (SMA seeded), like indicators.ema
+    sma(length, source=close)            simple moving average
+    rsi(length, source=close)            ta.rsi
+    atr(length)                          ta.atr
+    supertrend(length, multiplier)       the Supertrend line (SUPERT_*)
+    supertrend_dir(length, multiplier)   its direction, 1 or -1 (SUPERTd_*)
+    prev(expr, bars=1)                   the value `bars` bars earlier
+    cross_above(a, b), cross_below(a, b) a crosses b on this bar
+
+A rule is parsed once into a DAG. Nodes are keyed by structure, so the
+same indicator or comparison is one node no matter how often, or on
+which side, it is written: ema(20) above is computed once and shared by
+both sides. The keys are canonical: `b and a` is `a and b`, and
+`ema(20) < close` is `close > ema(20)`. Evaluation walks the DAG once
+with whole-array NumPy operations, never per bar. NaN (indicator
+warm-up) compares as False, as in signals.build_signal_masks, and so does
+the opposite comparison: `rsi(14) != 50` and `not rsi(14) < 30` are both
+False on warm-up bars (`not` is taken into the comparisons it covers).
+
+Node results are kept on the Bars object they were computed from, so
+every rule evaluated on the same Bars reuses them, up to MEMO_MB of them
+(least recently used out first). sweep_rules() runs many rule variants
+that way:
+
+    sweep_rules(df, rule_grid("close > ema({n}) and rsi(14) < {lo}", "rsi(14) > 60", n=[10, 20], lo=[25, 30]))
+"""
+import ast
+import functools
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from execution import execute, execution_model
+from ledger import TradeLedger
+from ohlc_store import OHLCView
+from signals import position_rules, resolve_positions
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+MEMO_MB = 512  # node results one Bars keeps, see Bars
+
+_COMPARE = {ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!="}
+_FLIPPED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}
+_NEGATED = {"<": ">=", "<=": ">", ">": "<=", ">=": "<", "==": "!=", "!=": "=="}
+_ARITH = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+_COMMUTATIVE = {"and", "or", "+", "*"}
+
+
+class RuleError(ValueError):
+    """A rule that does not parse or uses something the language does not have."""
+
+
+# --- evaluation of one node ---
+
+def _shift(x, bars):
+    x = np.asarray(x)
+    if x.ndim == 0 or bars == 0:
+        return x
+    if x.dtype == bool:
+        out = np.zeros(len(x), dtype=bool)
+    else:
+        out = np.full(len(x), np.nan)
+    if bars < len(x):
+        out[bars:] = x[:len(x) - bars]
+    return out
+
+
+def _not_equal(a, b):
+    """a != b, False where either side is NaN like the other comparisons."""
+    return np.not_equal(a, b) & ~(np.isnan(a) | np.isnan(b))
+
+
+def _sma(x, length):
+    return pd.Series(x).rolling(length).mean().to_numpy()
+
+
+_OPS = {
+    "col": lambda bars, name: bars.column(name),
+    "const": lambda bars, value: value,
+    "bool": lambda bars, value: value,
+    "ema": lambda bars, source, length: kernels.ema(source, length),
+    "sma": lambda bars, source, length: _sma(source, length),
+    "rsi": lambda bars, source, length: kernels.rsi(source, length),
+    "atr": lambda bars, length: kernels.atr(bars.column("high"), bars.column("low"),
+                                            bars.column("close"), length),
+    "supertrend": lambda bars, length, multiplier: kernels.supertrend(
+        bars.column("high"), bars.column("low"), bars.column("close"), length, multiplier)[:2],
+    "item": lambda bars, value, k: value[k],
+    "prev": lambda bars, value, k: _shift(value, k),
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": _not_equal,
+    "+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide,
+    "neg": np.negative,
+    "not": np.logical_not,
+    "and": lambda *args: functools.reduce(np.logical_and, args),
+    "or": lambda *args: functools.reduce(np.logical_or, args)
+}
+_NEEDS_BARS = {"col", "const", "bool", "ema", "sma", "rsi", "atr", "supertrend", "item", "prev"}
+
+
+class Bars:
+    """
+    The data rules run on (a DataFrame or an OHLCView) plus the results of
+    the nodes evaluated on it so far, at most `max_bytes` of them, least
+    recently used out first. Reuse one Bars to share indicators between
+    strategies.
+    """
+
+    def __init__(self, df, max_bytes=MEMO_MB * 1024 * 1024):
+        if isinstance(df, OHLCView):
+            self.index = df.index
+            self._columns = {col.lower(): arr for col, arr in df.columns.items()}
+        else:
+            self.index = df.index
+            self._columns = {col.lower(): df[col] for col in df.columns if isinstance(col, str)}
+        self.df = df
+        self.max_bytes = max_bytes
+        self.memo = OrderedDict()  # node -> (value, bytes), LRU
+        self.memo_bytes = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def column(self, name):
+        if name not in self._columns:
+            raise RuleError(f"the data has no '{name}' column")
+        values = self._columns[name]
+        if not isinstance(values, np.ndarray) or values.dtype != np.float64:
+            values = self._columns[name] = np.asarray(values, dtype=np.float64)
+        return values
+
+    def evaluate(self, graph, key):
+        """Value of node `key` of `graph`, computing (and keeping) what is not known yet."""
+        memo = self.memo
+        if key in memo:
+            memo.move_to_end(key)
+            return memo[key][0]
+
+        # Only the nodes under `key` that are not kept; the values of this
+        # walk are held here, so evicting from the memo cannot lose them
+        order = graph.upstream(key)
+        needed = {key}
+        for node in reversed(order):
+            if node in needed and node not in memo:
+                needed.update(node[1])
+        values = {}
+        for node in needed & memo.keys():
+            memo.move_to_end(node)
+            values[node] = memo[node][0]
+        for node in order:
+            if node not in needed or node in values:
+                continue
+            op, children, params = node
+            args = [values[child] for child in children] + list(params)
+            values[node] = _OPS[op](self, *args) if op in _NEEDS_BARS else _OPS[op](*args)
+            self._keep(node, values[node])
+        return values[key]
+
+    def _keep(self, node, value):
+        size = sum(int(getattr(v, "nbytes", 0)) for v in (value if isinstance(value, tuple) else (value,)))
+        if node[0] == "col":
+            size = 0  # a view of the data, not a copy
+        if size > self.max_bytes:
+            return
+        self.memo[node] = (value, size)
+        self.memo_bytes += size
+        while self.memo_bytes > self.max_bytes:
+            _, (_, size) = self.memo.popitem(last=False)
+            self.memo_bytes -= size
+
+    def mask(self, graph, key):
+        """Node `key` as a boolean array of one value per bar."""
+        value = np.asarray(self.evaluate(graph, key))
+        if value.dtype != bool:
+            raise RuleError(f"rule is not a condition: {graph.describe(key)}")
+        return np.broadcast_to(value, (len(self),)).copy() if value.ndim == 0 else value
+
+
+# --- parsing ---
+
+class RuleGraph:
+    """
+    DAG of hash-consed nodes. A node is (op, child nodes, params) and is
+    added once; insertion order is a topological order. Numbers are
+    "const" nodes and True / False "bool" nodes, so that True and 1.0,
+    equal as tuple keys, never become one node.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, op, children=(), params=()):
+        if op in _COMMUTATIVE:
+            if op in ("and", "or"):
+                # a and (b and c) -> and(a, b, c); a and a -> a
+                flat = []
+                for child in children:
+                    flat.extend(child[1] if child[0] == op else [child])
+                children = tuple(dict.fromkeys(flat))
+                if len(children) == 1:
+                    return children[0]
+            children = tuple(sorted(children, key=repr))
+        elif op in _FLIPPED and repr(children[0]) > repr(children[1]):
+            op, children = _FLIPPED[op], children[::-1]
+        node = (op, tuple(children), tuple(params))
+        self.nodes.setdefault(node, len(self.nodes))
+        return node
+
+    def negate(self, node):
+        """
+        `not node`, taken into the comparisons (not a < b -> a >= b, De Morgan
+        for and / or) so that a comparison with NaN stays False when negated.
+        """
+        op, children, params = node
+        if op in _NEGATED:
+            return self.add(_NEGATED[op], children)
+        if op in ("and", "or"):
+            return self.add("or" if op == "and" else "and", [self.negate(child) for child in children])
+        if op == "not":
+            return children[0]
+        if op == "bool":
+            return self.add("bool", params=[not params[0]])
+        return self.add("not", [node])
+
+    def upstream(self, key):
+        """Every node `key` depends on (itself included), in evaluation order."""
+        seen = set()
+        stack = [key]
+        while stack:
+            node = stack.pop()
+            if node not in seen:
+                seen.add(node)
+                stack.extend(node[1])
+        return sorted(seen, key=self.nodes.__getitem__)
+
+    def describe(self, key):
+        """A node written back as rule text."""
+        op, children, params = key
+        args = [self.describe(child) for child in children]
+        if op == "col":
+            return params[0]
+        if op in ("const", "bool"):
+            return repr(params[0])
+        if op == "item":
+            name = "supertrend" if params[0] == 0 else "supertrend_dir"
+            return f"{name}({', '.join(map(str, children[0][2]))})"
+        if op in ("and", "or"):
+            return "(" + f" {op} ".join(args) + ")"
+        if op in _FLIPPED or op in ("+", "-", "*", "/"):
+            return f"({args[0]} {op} {args[1]})"
+        if op in ("neg", "not"):
+            return f"({'-' if op == 'neg' else 'not '}{args[0]})"
+        if op in ("ema", "sma", "rsi"):
+            source = "" if args[0] == "close" else f", {args[0]}"
+            return f"{op}({params[0]}{source})"
+        return f"{op}({', '.join(args + [str(p) for p in params])})"
+
+    # --- building nodes from the syntax tree ---
+
+    def parse(self, text):
+        """Add rule `text` to the graph; returns its node."""
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as e:
+            raise RuleError(f"cannot parse rule {text!r}: {e.msg} (column {e.offset})") from None
+        return self._node(tree.body, text)
+
+    def _node(self, node, text):
+        if isinstance(node, ast.BoolOp):
+            op = "and" if isinstance(node.op, ast.And) else "or"
+            return self.add(op, [self._node(value, text) for value in node.values])
+        if isinstance(node, ast.UnaryOp):
+            operand = self._node(node.operand, text)
+            if isinstance(node.op, ast.Not):
+                return self.negate(operand)
+            if isinstance(node.op, ast.USub):
+                if operand[0] == "const":
+                    return self.add("const", params=[-operand[2][0]])
+                return self.add("neg", [operand])
+            if isinstance(node.op, ast.UAdd):
+                return operand
+        if isinstance(node, ast.Compare):
+            # 30 < rsi(14) < 70 -> (30 < rsi(14)) and (rsi(14) < 70)
+            operands = [self._node(node.left, text)] + [self._node(c, text) for c in node.comparators]
+            parts = [self.add(_COMPARE[type(op)], [a, b])
+                     for op, a, b in zip(node.ops, operands, operands[1:]) if type(op) in _COMPARE]
+            if len(parts) == len(node.ops):
+                return self.add("and", parts)
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITH:
+            return self.add(_ARITH[type(node.op)], [self._node(node.left, text), self._node(node.right, text)])
+        if isinstance(node, ast.Constant) and isinstance(node.value, (bool, int, float)):
+            if isinstance(node.value, bool):
+                return self.add("bool", params=[node.value])
+            return self.add("const", params=[float(node.value)])
+        if isinstance(node, ast.Name):
+            name = node.id.lower()
+            if name in COLUMNS:
+                return self.add("col", params=[name])
+            if name in ("true", "false"):
+                return self.add("bool", params=[name == "true"])
+            raise RuleError(f"unknown name '{node.id}' in {text!r}")
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            return self._call(node, text)
+        raise RuleError(f"unsupported syntax '{ast.get_source_segment(text, node) or type(node).__name__}' "
+                        f"in {text!r}")
+
+    def _call(self, node, text):
+        name = node.func.id.lower()
+        args = list(node.args)
+        kwargs = {kw.arg: kw.value for kw in node.keywords}
+
+        def take(param, default=None):
+            if args:
+                return args.pop(0)
+            if param in kwargs:
+                return kwargs.pop(param)
+            if default is None:
+                raise RuleError(f"{name}() needs '{param}' in {text!r}")
+            return default
+
+        def number(param, integer=True, default=None):
+            value = take(param, default)
+            if isinstance(value, ast.Constant) and isinstance(value.value, (int, float)) \
+                    and not isinstance(value.value, bool) and value.value > 0 \
+                    and (not integer or float(value.value).is_integer()):
+                return int(value.value) if integer else float(value.value)
+            kind = "a positive whole number" if integer else "a positive number"
+            raise RuleError(f"{name}() '{param}' must be {kind} in {text!r}")
+
+        close = ast.Name(id="close")
+        if name in ("ema", "sma", "rsi"):
+            length = number("length")
+            result = self.add(name, [self._node(take("source", close), text)], [length])
+        elif name == "atr":
+            result = self.add("atr", params=[number("length")])
+        elif name in ("supertrend", "supertrend_dir"):
+            st = self.add("supertrend", params=[number("length"), number("multiplier", integer=False)])
+            result = self.add("item", [st], [0 if name == "supertrend" else 1])
+        elif name == "prev":
+            value = self._node(take("value"), text)
+            result = self.add("prev", [value], [number("bars", default=ast.Constant(1))])
+        elif name in ("cross_above", "cross_below"):
+            a, b = self._node(take("a"), text), self._node(take("b"), text)
+            above = ">" if name == "cross_above" else "<"
+            was = "<=" if name == "cross_above" else ">="
+            result = self.add("and", [self.add(above, [a, b]),
+                                      self.add(was, [self.add("prev", [a], [1]), self.add("prev", [b], [1])])])
+        else:
+            raise RuleError(f"unknown function '{node.func.id}' in {text!r}")
+        if args or kwargs:
+            raise RuleError(f"too many arguments for {name}() in {text!r}")
+        return result
+
+
+class Strategy:
+    """Buy and sell rules compiled into one RuleGraph (see the module docstring)."""
+
+    def __init__(self, buy, sell, direction="long", pyramiding=1):
+        self.buy_text, self.sell_text = buy, sell
+        self.direction, self.pyramiding = position_rules({"direction": direction, "pyramiding": pyramiding})
+        self.graph = RuleGraph()
+        self.buy = self.graph.parse(buy)
+        self.sell = self.graph.parse(sell)
+
+    def __repr__(self):
+        book = "" if (self.direction, self.pyramiding) == ("long", 1) else \
+            f", direction={self.direction!r}, pyramiding={self.pyramiding}"
+        return f"Strategy(buy={self.buy_text!r}, sell={self.sell_text!r}{book})"
+
+    def indicators(self):
+        """Every distinct indicator the rules compute, as text."""
+        return [self.graph.describe(node) for node in self.graph.nodes
+                if node[0] in ("ema", "sma", "rsi", "atr", "supertrend")]
+
+    def masks(self, df):
+        """(buy, sell) boolean arrays over the bars of `df` (a DataFrame, OHLCView or Bars)."""
+        bars = df if isinstance(df, Bars) else Bars(df)
+        return bars.mask(self.graph, self.buy), bars.mask(self.graph, self.sell)
+
+    def trades(self, df, start=1):
+        """Entry and exit bar indices and sides (signals.resolve_positions over the masks)."""
+        buy, sell = self.masks(df)
+        return resolve_positions(buy, sell, self.direction, self.pyramiding, start)
+
+    def ledger(self, df, start=1, execution=None):
+        """The trades as a TradeLedger, like strategy.strategy_ledger (also its `execution`)."""
+        bars = df if isinstance(df, Bars) else Bars(df)
+        entry_idx, exit_idx, side = self.trades(bars, start)
+        execution = execution_model(execution)
+        if execution is not None:
+            return execute(entry_idx, exit_idx, bars, execution, side)
+        return TradeLedger.from_indices(entry_idx, exit_idx, bars.index, bars.column("close"), side)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(buy, sell, direction, pyramiding):
+    return Strategy(buy, sell, direction, pyramiding)
+
+
+def compile_rules(rules):
+    """
+    A Strategy from {"buy": text, "sell": text}, plus optional "direction"
+    and "pyramiding" (compiled once per distinct combination).
+    """
+    if isinstance(rules, Strategy):
+        return rules
+    return _compile(rules.get("buy") or "False", rules.get("sell") or "False",
+                    *position_rules(rules))
+
+
+def is_rule_text(strategy_rules):
+    """True for a Strategy or a {"buy": text, "sell": text} dict, False for the toggle dicts."""
+    return isinstance(strategy_rules, Strategy) or (
+        isinstance(strategy_rules, dict)
+        and any(isinstance(strategy_rules.get(side), str) for side in ("buy", "sell")))
+
+
+def rules_text(strategy_rules, ema_period=20, rsi_period=14, supertrend_period=10,
+               supertrend_multiplier=3.0):
+    """
+    The App.py / batch.py toggle dict written as rule text: the enabled
+    buy conditions ANDed, the enabled sell conditions ORed, as in
+    signals.build_signal_masks. "direction" / "pyramiding" are kept.
+    """
+    ema = f"ema({int(ema_period)})"
+    rsi = f"rsi({int(rsi_period)})"
+    direction = f"supertrend_dir({int(supertrend_period)}, {float(supertrend_multiplier)})"
+    sides = {}
+    for side, joiner, signs in (("buy", " and ", (">", "<", 1)), ("sell", " or ", ("<", ">", -1))):
+        side_rules = strategy_rules.get(side, {})
+        default_threshold = 30 if side == "buy" else 60
+        parts = []
+        if side_rules.get("ema", False):
+            parts.append(f"close {signs[0]} {ema}")
+        if side_rules.get("rsi", False):
+            parts.append(f"{rsi} {signs[1]} {side_rules.get('rsi_threshold', default_threshold)}")
+        if side_rules.get("supertrend", False):
+            parts.append(f"{direction} == {signs[2]}")
+        sides[side] = joiner.join(parts) or "False"
+    sides.update({key: strategy_rules[key] for key in ("direction", "pyramiding") if key in strategy_rules})
+    return sides
+
+
+def rule_grid(buy, sell, **params):
+    """
+    Every combination of `params` formatted into the buy / sell templates:
+    rule_grid("close > ema({n})", "close < ema({n})", n=[10, 20]) -> 2 variants.
+    """
+    names = list(params)
+    return [
+        {"buy": buy.format(**combo), "sell": sell.format(**combo), **combo}
+        for combo in (dict(zip(names, values)) for values in itertools.product(*params.values()))
+    ]
+
+
+def sweep_rules(df, variants, with_metrics=False, execution=None):
+    """
+    Backtest every rule variant (dicts with "buy" / "sell" text, e.g. from
+    rule_grid; other keys are copied to the table) on the same bars. Every
+    indicator and condition is computed once for the whole sweep.
+
+    Returns one row per variant with total_profit, win_rate and trades,
+    best total_profit first; with_metrics=True adds every
+    metrics.METRIC_COLUMNS column. `execution` fills and costs every
+    variant (see execution.py).
+    """
+    bars = Bars(df)
+    execution = execution_model(execution)
+    rows, ledgers = [], []
+    for variant in variants:
+        ledger = compile_rules(variant).ledger(bars, execution=execution)
+        ledgers.append(ledger)
+        rows.append({**variant, "total_profit": float(ledger.total_profit()),
+                     "win_rate": float(ledger.win_rate()), "trades": len(ledger)})
+    results_df = pd.DataFrame(rows)
+    if with_metrics and rows:
+        from metrics import METRIC_COLUMNS, batch_metrics, count_days
+
+        extra = [col for col in METRIC_COLUMNS if col not in results_df.columns]
+        n_days = count_days(bars.index) if isinstance(bars.index, pd.DatetimeIndex) else None
+        table = batch_metrics(ledgers, n_bars=len(bars), n_days=n_days)
+        results_df[extra] = table[extra].to_numpy()
+    if not rows:
+        return results_df
+    return results_df.sort_values(["total_profit", "win_rate"], ascending=False,
+                                  kind="stable").reset_index(drop=True)
@@ -0,0 +1,305 @@
+"""
+Cross-sectional screener: which stocks meet the buy / sell rules at
+their latest bar.
+
+Instead of backtesting each file's whole history, every symbol only loads
+the trailing window its indicators need to warm up (warmup_bars), and
+evaluates the strategy_rules masks on the last bar. The window comes
+from the end of the memory-mapped store when it is up to date (a slice
+of the mapped columns), or from a seek to the end of the CSV (only the
+last few KB get parsed). Higher timeframes are resampled from the tail
+of the 1-minute file. A window that is most of the file builds the
+store instead. Symbols are screened in parallel, one pool task each, and
+come back as one ranked table.
+
+EMA, RSI and the Supertrend ATR are recursive filters, so a finite
+window is an approximation. Their start-up values fade out geometrically:
+after WARMUP_MULTIPLE x length bars they are below e^-20 of a value. The
+Supertrend bands lose their start-up state at the first direction flip
+inside the window, and MIN_WARMUP_BARS leaves room for one.
+
+Usage:
+    python screener.py --data stock_data --timeframe 5 --out screen.csv
+
+    table = screen("stock_data", strategy_rules, timeframe="5")
+    table[table["buy"]]
+"""
+import argparse
+import io
+import json
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from utils import get_stock_list, stock_source
+
+DATA_FOLDER = "stock_data"
+
+WARMUP_MULTIPLE = 20
+MIN_WARMUP_BARS = 500
+TAIL_BLOCK_BYTES = 64 * 1024
+
+# 1-minute bars per bar of each timeframe (375 in a 09:15-15:30 session)
+MINUTES_PER_BAR = {"1": 1, "5": 5, "15": 15, "30": 30, "60": 60, "D": 375}
+
+SCREEN_COLUMNS = [
+    "rank", "stock", "timeframe", "time", "close", "ema", "rsi", "supertrend",
+    "buy", "sell", "buy_score", "bars", "seconds", "error"
+]
+
+
+def warmup_bars(ema_period=20, rsi_period=14, supertrend_period=10):
+    """Bars of history the indicators need before the last bar is trustworthy."""
+    return max(WARMUP_MULTIPLE * max(ema_period, rsi_period, supertrend_period), MIN_WARMUP_BARS)
+
+
+def read_tail(filepath, n_rows, block_bytes=TAIL_BLOCK_BYTES):
+    """
+    The last `n_rows` rows of a CSV (the whole file if it is shorter) in
+    the read_source_csv layout. Reads backwards from the end of the file,
+    so the cost depends on n_rows, not on the file size.
+    """
+    from data_cache import normalize_frame
+
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        want = block_bytes
+        while True:
+            start = max(size - want, data_start)
+            f.seek(start)
+            chunk = f.read()
+            if start > data_start:
+                chunk = chunk[chunk.find(b"\n") + 1:]  # first line is cut off
+            lines = chunk.count(b"\n")
+            if lines >= n_rows or start == data_start:
+                break
+            # Grow to the size the rows seen so far suggest, at least doubling
+            want = max(2 * want, int(len(chunk) / max(lines, 1) * n_rows * 1.2))
+
+    # Parse only the rows asked for: the timestamps are most of the cost
+    if not chunk.endswith(b"\n"):
+        chunk += b"\n"
+    newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n"))
+    if len(newlines) > n_rows:
+        chunk = chunk[newlines[-n_rows - 1] + 1:]
+    return normalize_frame(pd.read_csv(io.BytesIO(header + chunk)))
+
+
+def _fresh_store(filepath):
+    """The ohlc_store of `filepath` if it exists and matches the CSV, else None (never builds it)."""
+    from ohlc_store import OHLCStore, _csv_stamp, store_path
+
+    path = store_path(filepath)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("source") != _csv_stamp(filepath):
+            return None
+        return OHLCStore(path)
+    except (OSError, ValueError):
+        return None
+
+
+def _csv_rows(filepath, sample_bytes=TAIL_BLOCK_BYTES):
+    """Row count of a CSV estimated from the line length of its first block."""
+    with open(filepath, "rb") as f:
+        sample = f.read(sample_bytes)
+    return os.path.getsize(filepath) * max(sample.count(b"\n"), 1) // max(len(sample), 1)
+
+
+def tail_view(filepath, n_rows):
+    """
+    The last `n_rows` bars of a CSV as an ohlc_store.OHLCView. A tail that
+    is most of the file goes through open_store instead: the parse costs
+    the same, and the next screen (or app load) then finds the store.
+    """
+    from ohlc_store import OHLCView, open_store
+
+    store = _fresh_store(filepath)
+    if store is None and 2 * n_rows >= _csv_rows(filepath):
+        store = open_store(filepath)
+    if store is not None:
+        lo = max(len(store) - n_rows, 0)
+        return OHLCView(store.time[lo:], {col: arr[lo:] for col, arr in store.columns.items()}, store.tz)
+
+    df = read_tail(filepath, n_rows)
+    time_index = pd.DatetimeIndex(df["time"])
+    columns = {col: df[col].to_numpy(dtype=np.float64) for col in df.columns
+               if col != "time" and pd.api.types.is_numeric_dtype(df[col])}
+    return OHLCView(time_index.as_unit("ns").asi8, columns, time_index.tz)
+
+
+def latest_bars(data_folder, stock, timeframe, n_bars):
+    """
+    The last `n_bars` bars of a stock at `timeframe` as an OHLCView,
+    resampled from the tail of the 1-minute file when there is one (like
+    utils.load_stock). None if the stock has no data.
+    """
+    from ohlc_store import OHLCView
+    from resample import resample_arrays
+
+    source = stock_source(data_folder, stock, timeframe)
+    if source is None:
+        return None
+    if timeframe == "1" or not source.endswith("_1.csv"):
+        return tail_view(source, n_bars)
+
+    # One extra bar: the first resampled bar of the tail may be missing minutes
+    n_rows = (n_bars + 1) * MINUTES_PER_BAR[timeframe]
+    while True:
+        minutes = tail_view(source, n_rows)
+        bar_time, bars, _ = resample_arrays(minutes.time, minutes.columns, timeframe)
+        whole_file = len(minutes) < n_rows
+        if whole_file or len(bar_time) > n_bars:
+            break
+        n_rows *= 2  # minutes outside the session were dropped
+    lo = 0 if whole_file else 1
+    lo = max(lo, len(bar_time) - n_bars)
+    return OHLCView(bar_time[lo:], {col: values[lo:] for col, values in bars.items()}, minutes.tz)
+
+
+def screen_symbol(task):
+    """
+    Evaluate the rules on one stock's latest bar. Runs inside a worker
+    process, so it never raises: failures come back as a row with "error" set.
+    """
+    import kernels
+    from signals import ema_conditions, rsi_conditions, supertrend_conditions
+
+    stock, timeframe, strategy_rules, params = task
+    row = {"stock": stock, "timeframe": timeframe, "time": None, "close": None, "ema": None,
+           "rsi": None, "supertrend": None, "buy": False, "sell": False, "buy_score": 0.0,
+           "bars": 0, "error": None}
+    t0 = time.perf_counter()
+    try:
+        n_bars = warmup_bars(params["ema_period"], params["rsi_period"], params["supertrend_period"])
+        bars = latest_bars(params["data_folder"], stock, timeframe, n_bars)
+        if bars is None:
+            raise ValueError(f"no data for {stock} ({timeframe})")
+        row["bars"] = len(bars)
+        if not len(bars):
+            raise ValueError("no bars")
+
+        # Same indicators as strategy_ledger, then only the last bar is looked at
+        close = np.asarray(bars.close, dtype=np.float64)
+        ema = kernels.ema(close, params["ema_period"])[-1:]
+        rsi = kernels.rsi(close, params["rsi_period"])[-1:]
+        direction = kernels.supertrend(bars.high, bars.low, close, params["supertrend_period"],
+                                       params["supertrend_multiplier"])[1][-1:].astype(np.float64)
+        last = close[-1:]
+
+        ema_buy, ema_sell = ema_conditions(last, ema, strategy_rules)
+        rsi_buy, rsi_sell = rsi_conditions(rsi, strategy_rules)
+        st_buy, st_sell = supertrend_conditions(direction, strategy_rules)
+        buys = [bool(c[0]) for c in (ema_buy, rsi_buy, st_buy) if c is not None]
+        sells = [bool(c[0]) for c in (ema_sell, rsi_sell, st_sell) if c is not None]
+
+        row.update({
+            "time": bars.index[-1],
+            "close": float(last[0]),
+            "ema": float(ema[0]),
+            "rsi": float(rsi[0]),
+            "supertrend": int(direction[0]),
+            # Same combination as signals.combine_conditions: AND of buys, OR of sells
+            "buy": bool(buys) and all(buys),
+            "sell": any(sells),
+            "buy_score": sum(buys) / len(buys) if buys else 0.0
+        })
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - t0, 4)
+    return row
+
+
+def iter_screen(data_folder=DATA_FOLDER, strategy_rules=None, timeframe="1", stocks=None,
+                ema_period=20, rsi_period=14, supertrend_period=10, supertrend_multiplier=3.0,
+                workers=None, chunksize=4):
+    """
+    Yields one screen_symbol row per stock as soon as a worker finishes it
+    (completion order). workers=None uses every core, workers=1 runs
+    in-process.
+    """
+    from signals import DEFAULT_STRATEGY_RULES
+
+    strategy_rules = strategy_rules or DEFAULT_STRATEGY_RULES
+    params = {"data_folder": data_folder, "ema_period": int(ema_period), "rsi_period": int(rsi_period),
+              "supertrend_period": int(supertrend_period),
+              "supertrend_multiplier": float(supertrend_multiplier)}
+    tasks = [(stock, timeframe, strategy_rules, params)
+             for stock in get_stock_list(data_folder) if not stocks or stock in stocks]
+    if not tasks:
+        return
+
+    if workers == 1 or len(tasks) == 1:
+        for task in tasks:
+            yield screen_symbol(task)
+        return
+
+    with Pool(processes=min(workers or os.cpu_count() or 1, len(tasks))) as pool:
+        for row in pool.imap_unordered(screen_symbol, tasks, chunksize=chunksize):
+            yield row
+
+
+def rank_screen(rows):
+    """
+    The screen as a table, best candidates first: buy signals, then the
+    share of buy conditions met, then no sell signal, then lowest RSI.
+    Failed symbols go last.
+    """
+    table = pd.DataFrame(list(rows), columns=SCREEN_COLUMNS[1:])
+    table = table.sort_values(["buy", "buy_score", "sell", "rsi"],
+                              ascending=[False, False, True, True], na_position="last")
+    table = table.sort_values("error", na_position="first", kind="stable").reset_index(drop=True)
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
+
+
+def screen(*args, **kwargs):
+    """Same arguments as iter_screen. Returns the ranked table (see rank_screen)."""
+    return rank_screen(iter_screen(*args, **kwargs))
+
+
+def main():
+    from signals import DEFAULT_STRATEGY_RULES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DATA_FOLDER, help="folder with NSE_<STOCK>_<TF>.csv files")
+    parser.add_argument("--timeframe", default="1", help="bar size: 1, 5, 15, 30, 60 or D")
+    parser.add_argument("--stocks", default="", help="comma separated, default all")
+    parser.add_argument("--ema", type=int, default=20, help="EMA period")
+    parser.add_argument("--rsi", type=int, default=14, help="RSI period")
+    parser.add_argument("--st-period", type=int, default=10, help="Supertrend period")
+    parser.add_argument("--st-mult", type=float, default=3.0, help="Supertrend multiplier")
+    parser.add_argument("--rsi-buy", type=float, default=30, help="buy when RSI < this")
+    parser.add_argument("--rsi-sell", type=float, default=60, help="sell when RSI > this")
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--chunksize", type=int, default=4)
+    parser.add_argument("--out", default=None, help="also write the table to this CSV")
+    args = parser.parse_args()
+
+    strategy_rules = {
+        "buy": {**DEFAULT_STRATEGY_RULES["buy"], "rsi_threshold": args.rsi_buy},
+        "sell": {**DEFAULT_STRATEGY_RULES["sell"], "rsi_threshold": args.rsi_sell}
+    }
+    t0 = time.perf_counter()
+    table = screen(args.data, strategy_rules, args.timeframe,
+                   stocks=[s for s in args.stocks.split(",") if s],
+                   ema_period=args.ema, rsi_period=args.rsi, supertrend_period=args.st_period,
+                   supertrend_multiplier=args.st_mult, workers=args.workers, chunksize=args.chunksize)
+
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(table.drop(columns=["seconds"]).to_string(index=False))
+    if args.out:
+        table.to_csv(args.out, index=False)
+    print(f"\n✅ Screened {len(table)} stocks in {time.perf_counter() - t0:.2f}s: "
+          f"{int(table['buy'].sum())} buy, {int(table['sell'].sum())} sell, "
+          f"{int(table['error'].notna().sum())} failed")
+
+
+if __name__ == "__main__":
+    main()
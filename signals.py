@@ -0,0 +1,205 @@
+import numpy as np
+
+# Position sides of the trades (ledger "side")
+LONG, SHORT = 1, -1
+DIRECTIONS = ("long", "short", "both")
+
+# Same defaults as the "Strategy Rules" sidebar in App.py
+DEFAULT_STRATEGY_RULES = {
+    "buy": {"ema": True, "rsi": True, "rsi_threshold": 30, "supertrend": True},
+    "sell": {"ema": True, "rsi": True, "rsi_threshold": 60, "supertrend": True}
+}
+
+
+def ema_conditions(close, ema, strategy_rules):
+    """Buy: Close > EMA, Sell: Close < EMA. None for a side that does not use EMA."""
+    buy = sell = None
+    if strategy_rules.get("buy", {}).get("ema", False):
+        buy = close > ema
+    if strategy_rules.get("sell", {}).get("ema", False):
+        sell = close < ema
+    return buy, sell
+
+
+def rsi_conditions(rsi, strategy_rules):
+    """Buy: RSI < buy threshold, Sell: RSI > sell threshold."""
+    buy_rules = strategy_rules.get("buy", {})
+    sell_rules = strategy_rules.get("sell", {})
+    buy = sell = None
+    if buy_rules.get("rsi", False):
+        buy = rsi < buy_rules.get("rsi_threshold", 30)
+    if sell_rules.get("rsi", False):
+        sell = rsi > sell_rules.get("rsi_threshold", 60)
+    return buy, sell
+
+
+def supertrend_conditions(supertrend_signal, strategy_rules):
+    """Buy: Supertrend direction == 1, Sell: direction == -1."""
+    buy = sell = None
+    if strategy_rules.get("buy", {}).get("supertrend", False):
+        buy = supertrend_signal == 1
+    if strategy_rules.get("sell", {}).get("supertrend", False):
+        sell = supertrend_signal == -1
+    return buy, sell
+
+
+def combine_conditions(buy_conditions, sell_conditions, n):
+    """
+    AND the buy conditions, OR the sell conditions (None entries are skipped).
+    A side with no enabled condition never fires.
+    """
+    buy_conditions = [c for c in buy_conditions if c is not None]
+    sell_conditions = [c for c in sell_conditions if c is not None]
+    buy = np.logical_and.reduce(buy_conditions) if buy_conditions else np.zeros(n, dtype=bool)
+    sell = np.logical_or.reduce(sell_conditions) if sell_conditions else np.zeros(n, dtype=bool)
+    return buy, sell
+
+
+def build_signal_masks(close, ema, rsi, supertrend_signal, strategy_rules):
+    """
+    Evaluate the buy/sell rules of `strategy_rules` over whole columns.
+
+    Buy  = AND of every enabled buy condition  (Close > EMA, RSI < X, Supertrend == 1)
+    Sell = OR  of every enabled sell condition (Close < EMA, RSI > Y, Supertrend == -1)
+
+    A side with no enabled condition never fires. NaN inputs (indicator
+    warm-up) compare as False, exactly like the old per-row checks.
+
+    Returns:
+        buy (np.ndarray[bool]), sell (np.ndarray[bool])
+    """
+    close = np.asarray(close, dtype=np.float64)
+    ema = np.asarray(ema, dtype=np.float64)
+    rsi = np.asarray(rsi, dtype=np.float64)
+    supertrend_signal = np.asarray(supertrend_signal, dtype=np.float64)
+
+    ema_buy, ema_sell = ema_conditions(close, ema, strategy_rules)
+    rsi_buy, rsi_sell = rsi_conditions(rsi, strategy_rules)
+    st_buy, st_sell = supertrend_conditions(supertrend_signal, strategy_rules)
+    return combine_conditions(
+        [ema_buy, rsi_buy, st_buy], [ema_sell, rsi_sell, st_sell], len(close)
+    )
+
+
+def next_true_index(mask):
+    """
+    For every bar i, the index of the first True in mask[i:], or len(mask) if none.
+    """
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(idx[::-1])[::-1]
+
+
+def resolve_trades(buy, sell, start=1):
+    """
+    Run the flat -> long -> flat state machine over precomputed masks.
+
+    Entry on the first buy bar while flat, exit on the first sell bar strictly
+    after the entry bar. A trade still open on the last bar is not reported.
+    `start` is the first bar that may trade (the old loop skipped bar 0).
+
+    The long-only book of resolve_positions.
+
+    Returns:
+        entry_idx (np.ndarray[int64]), exit_idx (np.ndarray[int64])
+    """
+    entry_idx, exit_idx, _ = resolve_positions(buy, sell, "long", 1, start)
+    return entry_idx, exit_idx
+
+
+def position_rules(strategy_rules):
+    """
+    The position settings of a rules dict: "direction" ("long", the
+    default, "short" or "both") and "pyramiding" (most units held at once,
+    default 1).
+    """
+    direction = strategy_rules.get("direction", "long")
+    pyramiding = int(strategy_rules.get("pyramiding", 1))
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}, got {direction!r}")
+    if pyramiding < 1:
+        raise ValueError(f"pyramiding must be at least 1, got {pyramiding}")
+    return direction, pyramiding
+
+
+def resolve_positions(buy, sell, direction="long", pyramiding=1, start=1):
+    """
+    Run the long / short / flat state machine over precomputed masks.
+
+    direction="long": buy opens a long, sell closes it; a sell on the
+    entry bar does not count and the next entry is after the exit bar.
+    direction="short": sell opens a short, buy covers it.
+    direction="both": stop and reverse. A sell closes a long and opens a
+    short on the same bar, a buy covers a short and opens a long; from
+    flat the first buy or sell opens the position (buy on a tie).
+    A trade still open on the last bar is not reported; `start` is the
+    first bar that may trade.
+
+    With pyramiding=N each further entry signal while the position is
+    open adds a unit, up to N units; the exit signal closes them all.
+    Every unit is its own trade (entry bar, shared exit bar, side), in
+    order of exit bar.
+
+    No loop over bars or trades: only the bars with a signal can change
+    the book, and there the new state is the signal's side (long for a
+    buy, short, or flat in a long-only book, for a sell), or the opposite
+    of the current one when buy and sell fire together. That is a forward
+    fill of the last one-sided signal and the parity of the two-sided
+    ones since, so the whole book is a few whole-array operations.
+
+    Returns:
+        entry_idx (np.ndarray[int64]), exit_idx (np.ndarray[int64]),
+        side (np.ndarray[int8], LONG or SHORT)
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}, got {direction!r}")
+    if direction == "short":
+        # A short book is the long one with the signals swapped
+        entry_idx, exit_idx, side = resolve_positions(sell, buy, "long", pyramiding, start)
+        return entry_idx, exit_idx, -side
+    buy = np.asarray(buy, dtype=bool)[start:]
+    sell = np.asarray(sell, dtype=bool)[start:]
+
+    # State after each signal bar, +1 long and -1 short / flat
+    events = np.flatnonzero(buy | sell)
+    tie = buy[events] & sell[events]
+    last_one_sided = np.where(tie, -1, np.arange(len(events)))
+    np.maximum.accumulate(last_one_sided, out=last_one_sided)
+    seen = last_one_sided >= 0
+    last_one_sided = np.maximum(last_one_sided, 0)
+    ties = np.cumsum(tie)
+    # Before any one-sided signal a tie flips the initial short / flat into long
+    base = np.where(seen, np.where(buy[events[last_one_sided]], LONG, SHORT), SHORT)
+    flips = ties - np.where(seen, ties[last_one_sided], 0)
+    state = np.where(flips % 2 == 1, -base, base)
+
+    # The position changes where the state does; from flat, a two-way book
+    # opens on its first signal whichever side it is
+    initial = 0 if direction == "both" else SHORT
+    change = np.flatnonzero(state != np.r_[initial, state[:-1]])
+    bars = events[change]
+    entry_idx, exit_idx, side = bars[:-1], bars[1:], state[change][:-1].astype(np.int8)
+    if direction == "long":
+        longs = side == LONG
+        entry_idx, exit_idx, side = entry_idx[longs], exit_idx[longs], side[longs]
+
+    if pyramiding > 1 and len(entry_idx):
+        # Extra units: the first pyramiding - 1 entry signals after the
+        # entry bar, all of them before the exit (an opposite signal in
+        # between would have closed the trade). `signal_bars` holds the buy
+        # bars, then the sell bars; lo / hi bound each trade's run of them.
+        buys, sells = np.flatnonzero(buy), np.flatnonzero(sell)
+        signal_bars = np.concatenate((buys, sells))
+        is_long = side == LONG
+        lo = np.where(is_long, np.searchsorted(buys, entry_idx, "right"),
+                      len(buys) + np.searchsorted(sells, entry_idx, "right"))
+        hi = np.where(is_long, np.searchsorted(buys, exit_idx),
+                      len(buys) + np.searchsorted(sells, exit_idx))
+        units = 1 + np.minimum(hi - lo, pyramiding - 1)
+        trade = np.repeat(np.arange(len(entry_idx)), units)
+        unit = np.arange(len(trade)) - (np.cumsum(units) - units)[trade]
+        added = unit > 0
+        entry_idx, exit_idx, side = entry_idx[trade], exit_idx[trade], side[trade]
+        entry_idx[added] = signal_bars[lo[trade][added] + unit[added] - 1]
+
+    return entry_idx + start, exit_idx + start, side
@@ -1,43 +1,42 @@
+import itertools
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 import sys
 import io
 import os 
-# Ensure UTF-8 output for emojis in some terminals
-if sys.stdout.encoding != 'utf-8':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-import pandas as pd
-import streamlit as st
-import pandas as pd
-df = pd.read_csv("stock_data/NSE_RELIANCE_1.csv")
-print(df.columns)
+import indicators
+import perf
+from indicator_cache import cached
+from execution import execute, execution_model
+from ledger import TradeLedger
+from metrics import METRIC_COLUMNS, batch_metrics, count_days
+from ohlc_store import OHLCView, load_view
+from rules import compile_rules, is_rule_text
+from signals import (build_signal_masks, combine_conditions, ema_conditions, position_rules,
+                     resolve_positions, rsi_conditions, supertrend_conditions)
 
-def load_data(filepath, from_date, to_date):
-    # Read CSV and parse 'time' column
-    df = pd.read_csv(filepath, parse_dates=['time'])
-    df.columns = df.columns.str.strip().str.lower()
 
+def _utf8_stdout():
+    """Ensure UTF-8 output for emojis in some terminals (script runs only, never on import)."""
+    if sys.stdout.encoding != 'utf-8':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-    # Convert 'time' column to timezone-aware datetime
-    df['time'] = pd.to_datetime(df['time'])
+
+def load_data(filepath, from_date, to_date):
+    # Date window sliced out of the memory-mapped store
+    df = load_view(filepath, from_date, to_date).to_frame()
     df.set_index('time', inplace=True)
-    
+
     if df.index.tz is None:
         df.index = df.index.tz_localize('UTC')
-    tz = df.index.tz
-
-    # Convert from_date and to_date to timezone-aware datetimes
-    from_dt = pd.to_datetime(from_date).tz_localize(tz)
-    to_dt = pd.to_datetime(to_date).tz_localize(tz) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-    
-    # Filter data
-    filtered_df = df.loc[from_dt:to_dt]
-    return filtered_df
+    return df
 
 
 # Streamlit app snippet
 def main():
+    import streamlit as st
+
     st.title("Stock Data Viewer")
     filepath = "stock_data/NSE_RELIANCE_1.csv"
     
@@ -57,7 +56,9 @@ if __name__ == "__main__":
     main()
 
 
-def apply_strategy(df,strategy_rules, ema_period=20, rsi_period=14, supertrend_period=10, supertrend_multiplier=3.0):
+@perf.timed("apply_strategy")
+def strategy_ledger(df,strategy_rules, ema_period=20, rsi_period=14, supertrend_period=10, supertrend_multiplier=3.0,
+                    execution=None):
     """
     Applies the trading strategy to the DataFrame with columns:
     'Time', 'Open', 'High', 'Low', 'Close'
@@ -78,110 +79,253 @@ def apply_strategy(df,strategy_rules, ema_period=20, rsi_period=14, supertrend_p
     - Supertrend == -1
 
     Returns:
-        trades_df (pd.DataFrame): DataFrame of trades with Entry/Exit info and P/L
-        total_profit (float): sum of all trade profits
-        win_rate (float): percentage of profitable trades
+        ledger (TradeLedger): the trades as arrays (see ledger.py); apply_strategy
+        turns it into trades_df, total_profit, win_rate
+
+    `df` may also be an ohlc_store.OHLCView, e.g. from load_view().
+    `strategy_rules` may also be rule text, {"buy": "...", "sell": "..."}
+    (see rules.py); the indicator settings are then part of the text.
+    `execution` (an execution.ExecutionModel, preset name or settings
+    dict) sets fills, slippage, costs and stop / target; None fills at
+    the signal bar's close at no cost.
+    strategy_rules["direction"] ("long", "short" or "both", i.e. stop and
+    reverse) and ["pyramiding"] (units held at most) pick the position
+    book, see signals.resolve_positions; the default is long only, one unit.
     """
+    execution = execution_model(execution)
+    if is_rule_text(strategy_rules):
+        return compile_rules(strategy_rules).ledger(df, execution=execution)
+    if isinstance(df, OHLCView):
+        df = df.to_frame().set_index('time')
     df = df.copy()
-    df.columns = [col.lower() for col in df.columns]
-  # Standardize columns
-
-    df['ema'] = ta.ema(df['close'], length=20)
-    df['rsi'] = ta.rsi(df['close'], length=14)
-    supertrend = ta.supertrend(df['high'], df['low'], df['close'], length=10, multiplier=3.0)
-
-    
-    
-    # Compute indicators
-    df['ema'] = ta.ema(df['close'], length=ema_period)
-    df['rsi'] = ta.rsi(df['close'], length=rsi_period)
-    
-    # Supertrend
-    st_df = ta.supertrend(
-    high=df['high'],
-    low=df['low'],
-    close=df['close'],
-    length=supertrend_period,
-    multiplier=supertrend_multiplier
-)
-    df = df.join(st_df)
-
-# ✅ Correct:
-    signal_cols = [col for col in df.columns if "SUPERTd" in col or "supertrend" in col.lower()]
-
-    if not signal_cols:
-        raise KeyError("Supertrend signal column not found.")
-    elif supertrend is not None and 'SUPERTd_10_3.0' in supertrend.columns:
-        df['Supertrend'] = supertrend['SUPERTd_10_3.0']
-    else:
-        df['Supertrend'] = 0  # fallback if supertrend fails
+    df.columns = [col.lower() for col in df.columns]  # Standardize columns
 
-    
-    df['supertrend_signal'] = df[signal_cols[0]]
+    # Compute indicators (memoized across calls, see indicator_cache.py)
+    df['ema'] = cached("ema", indicators.ema, df['close'], length=ema_period)
+    df['rsi'] = cached("rsi", indicators.rsi, df['close'], length=rsi_period)
 
-    # Trade logic
-    trades = []
-    in_trade = False
-    entry_price = None
-    entry_time = None
+    # Supertrend: only its direction column is traded on
+    st_df = cached("supertrend", indicators.supertrend, df['high'], df['low'], df['close'],
+                   length=supertrend_period, multiplier=supertrend_multiplier)
+    df['supertrend_signal'] = st_df[f"SUPERTd_{int(supertrend_period)}_{float(supertrend_multiplier)}"]
 
-    for i in range(1, len(df)):
-        row = df.iloc[i]
+    return signal_ledger(df, strategy_rules, df['ema'], df['rsi'], df['supertrend_signal'], execution)
 
-        if not in_trade:
-            buy_conditions = []
 
-            if strategy_rules["buy"].get("ema", False):
-                buy_conditions.append(row['close'] > row['ema'])
+def signal_ledger(df, strategy_rules, ema, rsi, supertrend_signal, execution=None):
+    """
+    strategy_ledger's trades from indicator series that are already
+    computed, e.g. the shared columns of a data_plane segment. `df` (a
+    DataFrame or an OHLCView) supplies the prices and the index; an
+    indicator that no enabled rule uses may be None.
+    """
+    # Trade logic: whole-column masks, then the position book over the signal bars
+    with perf.span("trade_loop", rows=len(df)):
+        buy, sell = build_signal_masks(df['close'], ema, rsi, supertrend_signal, strategy_rules)
+        entry_idx, exit_idx, side = resolve_positions(buy, sell, *position_rules(strategy_rules), start=1)
 
-            if strategy_rules["buy"].get("rsi", False):
-                buy_conditions.append(row['rsi'] < strategy_rules["buy"].get("rsi_threshold", 30))
+    execution = execution_model(execution)
+    if execution is not None:
+        return execute(entry_idx, exit_idx, df, execution, side)
+    return TradeLedger.from_indices(entry_idx, exit_idx, df.index, df['close'], side)
 
-            if strategy_rules["buy"].get("supertrend", False):
-                buy_conditions.append(row['supertrend_signal'] == 1)
 
-            if buy_conditions and all(buy_conditions):
-                entry_price = row['close']
-                entry_time = row.name
-                in_trade = True
+def apply_strategy(df, strategy_rules, ema_period=20, rsi_period=14, supertrend_period=10, supertrend_multiplier=3.0,
+                   execution=None):
+    """
+    Runs strategy_ledger() and returns its trades as a table.
 
-        else:
-            sell_conditions = []
+    Returns:
+        trades_df (pd.DataFrame): DataFrame of trades with Entry/Exit info and P/L
+        total_profit (float): sum of all trade profits
+        win_rate (float): percentage of profitable trades
+    """
+    ledger = strategy_ledger(df, strategy_rules, ema_period, rsi_period, supertrend_period,
+                             supertrend_multiplier, execution)
+    return ledger.to_frame(), ledger.total_profit(), ledger.win_rate()
 
-            if strategy_rules["sell"].get("ema", False):
-                sell_conditions.append(row['close'] < row['ema'])
 
-            if strategy_rules["sell"].get("rsi", False):
-                sell_conditions.append(row['rsi'] > strategy_rules["sell"].get("rsi_threshold", 60))
+class ParameterSweep:
+    """
+    The apply_strategy rules over a grid of indicator settings on one series.
 
-            if strategy_rules["sell"].get("supertrend", False):
-                sell_conditions.append(row['supertrend_signal'] == -1)
+    Each EMA/RSI series is computed once per length and each Supertrend once
+    per (length, multiplier), always over the whole history; their buy/sell
+    conditions are cached and shared by every combination and every window
+    [lo, hi) that is evaluated. Settings of an indicator that no rule uses do
+    not change the result, so those combinations are evaluated only once
+    per window.
 
-            if sell_conditions and any(sell_conditions):
-                exit_price = row['close']
-                exit_time = row.name
-                profit = exit_price - entry_price
-                trades.append({
-                    "Entry Time": entry_time,
-                    "Exit Time": exit_time,
-                    "Entry Price": entry_price,
-                    "Exit Price": exit_price,
-                    "P/L": round(profit, 2)
-                })
-                in_trade = False
+    With an `execution` model (see execution.py) every result is filled
+    and costed by it; the fills are array operations, like the rest.
+    """
 
+    def __init__(self, df, strategy_rules, execution=None):
+        if is_rule_text(strategy_rules):
+            raise TypeError("ParameterSweep takes the toggle rules; sweep rule text with rules.sweep_rules")
+        if isinstance(df, OHLCView):
+            df = df.to_frame().set_index('time')
+        df = df.copy()
+        df.columns = [col.lower() for col in df.columns]
+        if 'time' in df.columns:
+            df = df.set_index(pd.DatetimeIndex(pd.to_datetime(df.pop('time'), format='ISO8601')))
+        self.df = df
+        self.index = df.index
+        self.close = df['close'].to_numpy(dtype=float)
+        self.strategy_rules = strategy_rules
+        self.direction, self.pyramiding = position_rules(strategy_rules)
+        self.execution = execution_model(execution)
+
+        buy_rules = strategy_rules.get("buy", {})
+        sell_rules = strategy_rules.get("sell", {})
+        self.use_ema = buy_rules.get("ema", False) or sell_rules.get("ema", False)
+        self.use_rsi = buy_rules.get("rsi", False) or sell_rules.get("rsi", False)
+        self.use_st = buy_rules.get("supertrend", False) or sell_rules.get("supertrend", False)
+        self.ema_cache, self.rsi_cache, self.st_cache = {}, {}, {}
+
+    def __len__(self):
+        return len(self.close)
+
+    def ema_cond(self, length):
+        if length not in self.ema_cache:
+            ema = cached("ema", indicators.ema, self.df['close'], length=length).to_numpy(dtype=float)
+            self.ema_cache[length] = ema_conditions(self.close, ema, self.strategy_rules)
+        return self.ema_cache[length]
+
+    def rsi_cond(self, length):
+        if length not in self.rsi_cache:
+            rsi = cached("rsi", indicators.rsi, self.df['close'], length=length).to_numpy(dtype=float)
+            self.rsi_cache[length] = rsi_conditions(rsi, self.strategy_rules)
+        return self.rsi_cache[length]
+
+    def st_cond(self, length, multiplier):
+        if (length, multiplier) not in self.st_cache:
+            df = self.df
+            st_df = cached("supertrend", indicators.supertrend, df['high'], df['low'], df['close'],
+                           length=length, multiplier=multiplier)
+            direction_col = [col for col in st_df.columns if col.startswith("SUPERTd")][0]
+            direction = st_df[direction_col].to_numpy(dtype=float)
+            self.st_cache[(length, multiplier)] = supertrend_conditions(direction, self.strategy_rules)
+        return self.st_cache[(length, multiplier)]
+
+    def ledger(self, entry_idx, exit_idx, side=1, hi=None):
+        """TradeLedger of signal bars entry_idx -> exit_idx, filled by the execution model (inside [.., hi))."""
+        if self.execution is None:
+            return TradeLedger.from_indices(entry_idx, exit_idx, self.index, self.close, side)
+        return execute(entry_idx, exit_idx, self.df, self.execution, side, end=hi)
+
+    def key(self, ema_period, rsi_period, st_period, st_multiplier):
+        """The settings that matter for the enabled rules (None for unused indicators)."""
+        return (ema_period if self.use_ema else None,
+                rsi_period if self.use_rsi else None,
+                (st_period, st_multiplier) if self.use_st else None)
+
+    def trades(self, ema_period, rsi_period, st_period, st_multiplier, lo=0, hi=None):
+        """
+        Entry and exit bar indices and sides of the trades taken inside
+        bars [lo, hi), indicators warmed up on everything before lo.
+        """
+        hi = len(self) if hi is None else hi
+        conditions = []
+        if self.use_ema:
+            conditions.append(self.ema_cond(ema_period))
+        if self.use_rsi:
+            conditions.append(self.rsi_cond(rsi_period))
+        if self.use_st:
+            conditions.append(self.st_cond(st_period, st_multiplier))
+        buy, sell = combine_conditions(
+            [c[0][lo:hi] for c in conditions if c[0] is not None],
+            [c[1][lo:hi] for c in conditions if c[1] is not None], hi - lo
+        )
+        # apply_strategy never trades the first bar of the data
+        entry_idx, exit_idx, side = resolve_positions(buy, sell, self.direction, self.pyramiding,
+                                                      start=1 if lo == 0 else 0)
+        return entry_idx + lo, exit_idx + lo, side
+
+    def run(self, ema_periods=(20,), rsi_periods=(14,), supertrend_periods=(10,),
+            supertrend_multipliers=(3.0,), lo=0, hi=None, with_metrics=False):
+        """optimize() over bars [lo, hi). Returns the same table."""
+        result_cache = {}
+        ledgers = {}
+        rows = []
+        for ema_period, rsi_period, st_period, st_multiplier in itertools.product(
+                ema_periods, rsi_periods, supertrend_periods, supertrend_multipliers):
+            key = self.key(ema_period, rsi_period, st_period, st_multiplier)
+
+            if key not in result_cache:
+                entry_idx, exit_idx, side = self.trades(ema_period, rsi_period, st_period, st_multiplier,
+                                                        lo, hi)
+                ledger = None
+                if self.execution is None:
+                    pl = np.round(side * (self.close[exit_idx] - self.close[entry_idx]), 2)
+                else:
+                    ledger = self.ledger(entry_idx, exit_idx, side, hi)
+                    pl = ledger["pl"]
+                result_cache[key] = (
+                    pl.sum() if len(pl) else 0.0,
+                    (pl > 0).mean() * 100 if len(pl) else 0.0,
+                    len(pl)
+                )
+                if with_metrics:
+                    ledgers[key] = ledger if ledger is not None else self.ledger(entry_idx, exit_idx, side, hi)
+
+            total_profit, win_rate, n_trades = result_cache[key]
+            rows.append({
+                "ema_period": ema_period,
+                "rsi_period": rsi_period,
+                "supertrend_period": st_period,
+                "supertrend_multiplier": st_multiplier,
+                "total_profit": total_profit,
+                "win_rate": win_rate,
+                "trades": n_trades
+            })
+
+        results_df = pd.DataFrame(rows, columns=[
+            "ema_period", "rsi_period", "supertrend_period", "supertrend_multiplier",
+            "total_profit", "win_rate", "trades"
+        ])
+        if with_metrics:
+            # Every distinct result in one vectorized pass (metrics.py)
+            extra = [col for col in METRIC_COLUMNS if col not in results_df.columns]
+            window = self.index[lo:len(self) if hi is None else hi]
+            n_days = count_days(window) if isinstance(window, pd.DatetimeIndex) else None
+            table = batch_metrics(ledgers.values(), n_bars=len(window), n_days=n_days)[extra]
+            position = {key: k for k, key in enumerate(ledgers)}
+            keys = [self.key(row["ema_period"], row["rsi_period"], row["supertrend_period"],
+                             row["supertrend_multiplier"]) for row in rows]
+            results_df[extra] = table.to_numpy()[[position[key] for key in keys]]
+        return results_df.sort_values(
+            ["total_profit", "win_rate"], ascending=False, kind="stable"
+        ).reset_index(drop=True)
+
+
+def optimize(df, strategy_rules, ema_periods=(20,), rsi_periods=(14,),
+             supertrend_periods=(10,), supertrend_multipliers=(3.0,), with_metrics=False,
+             execution=None):
+    """
+    Runs the apply_strategy rules over every combination of indicator settings
+    (see ParameterSweep).
 
-    
-    trades_df = pd.DataFrame(trades)
-    total_profit = trades_df["P/L"].sum() if not trades_df.empty else 0.0
-    win_rate = (trades_df["P/L"] > 0).mean() * 100 if not trades_df.empty else 0.0
+    Example:
+        optimize(df, strategy_rules, ema_periods=range(5, 55, 5),
+                 rsi_periods=range(7, 22), supertrend_multipliers=[2.0, 2.5, 3.0])
 
-    return trades_df, total_profit, win_rate
+    Returns:
+        results_df (pd.DataFrame): one row per combination with
+        total_profit, win_rate and trades, best total_profit first;
+        with_metrics=True adds every metrics.METRIC_COLUMNS column;
+        `execution` fills and costs the trades (see execution.py)
+    """
+    return ParameterSweep(df, strategy_rules, execution).run(
+        ema_periods, rsi_periods, supertrend_periods, supertrend_multipliers,
+        with_metrics=with_metrics)
 
 
 
 
 def main():
+    import streamlit as st
+
     st.title("📈 Stock Strategy Analyzer")
     filepath = st.text_input("CSV filepath:", "stock_data/NSE_RELIANCE_1.csv")
     from_date = st.date_input("From date")
@@ -210,12 +354,10 @@ def main():
 
 if __name__ == "__main__":
     main()
-print("Columns after indicators:\n", df.columns.tolist())
-print("Sample rows:\n", df.head(3))
 
 # Optional: quick test if run standalone
 if __name__ == "__main__":
-    import os
+    _utf8_stdout()
 
     test_file = os.path.join("stock_data", "NSE_RELIANCE_5.csv")
 
@@ -0,0 +1,275 @@
+"""
+Bar-by-bar (streaming) versions of the indicators and of the apply_strategy
+entry/exit rules, for feeding live 1-minute bars during market hours.
+
+Every indicator keeps O(1) state and updates in O(1) per bar. They replay
+the exact recurrences of the batch code: pandas' `ewm().mean()` and
+pandas_ta's ema / rsi / atr / supertrend. Fed the same bars, they give the
+same numbers as the batch versions (pandas_ta nudges high - low by machine
+epsilon when any bar in the whole series has high == low, which a stream
+cannot know in advance; that only moves the last bit).
+
+    strategy = StreamingStrategy(strategy_rules, ema_period=20)
+    for bar in feed:
+        event = strategy.update(bar.time, bar.high, bar.low, bar.close)
+        if event:
+            print(event)
+"""
+import numpy as np
+import pandas as pd
+
+from signals import ema_conditions, position_rules, rsi_conditions, supertrend_conditions
+
+NaN = float("nan")
+
+
+class EWMState:
+    """
+    One step of pandas' exponentially weighted mean (`Series.ewm(...).mean()`
+    with ignore_na=False), same operations in the same order.
+    """
+    __slots__ = ("old_wt_factor", "new_wt", "adjust", "min_periods",
+                 "weighted", "old_wt", "nobs", "started")
+
+    def __init__(self, com, adjust=True, min_periods=0):
+        alpha = 1. / (1. + com)
+        self.old_wt_factor = 1. - alpha
+        self.new_wt = 1. if adjust else alpha
+        self.adjust = adjust
+        self.min_periods = max(int(min_periods), 1)
+        self.weighted = NaN
+        self.old_wt = 1.
+        self.nobs = 0
+        self.started = False
+
+    @classmethod
+    def from_span(cls, span, **kwargs):
+        return cls((span - 1) / 2, **kwargs)
+
+    @classmethod
+    def from_alpha(cls, alpha, **kwargs):
+        return cls((1 - alpha) / alpha, **kwargs)
+
+    def update(self, cur):
+        is_observation = cur == cur
+        self.nobs += is_observation
+
+        if not self.started:
+            self.started = True
+            self.weighted = cur
+        elif self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                # avoid numerical errors on constant series
+                if self.weighted != cur:
+                    self.weighted = self.old_wt * self.weighted + self.new_wt * cur
+                    self.weighted /= (self.old_wt + self.new_wt)
+                if self.adjust:
+                    self.old_wt += self.new_wt
+                else:
+                    self.old_wt = 1.
+        elif is_observation:
+            self.weighted = cur
+
+        return self.weighted if self.nobs >= self.min_periods else NaN
+
+
+class StreamingEMA:
+    """
+    EMA of close. sma_seed=True matches `ta.ema` (used by apply_strategy):
+    NaN for length-1 bars, seeded with the SMA of the first `length` closes.
+    sma_seed=False matches `ewm(span=length, adjust=False)` (compute_indicators).
+    """
+
+    def __init__(self, length=20, sma_seed=True):
+        self.length = int(length)
+        self.sma_seed = sma_seed
+        self.ewm = EWMState.from_span(self.length, adjust=False)
+        self.warmup = [] if sma_seed else None
+
+    def update(self, close):
+        if self.warmup is not None:
+            self.warmup.append(close)
+            if len(self.warmup) < self.length:
+                return self.ewm.update(NaN)
+            # Same arithmetic as Series.mean() over the first `length` closes
+            values = np.asarray(self.warmup, dtype=np.float64)
+            mask = np.isnan(values)
+            values[mask] = 0
+            count = len(values) - mask.sum()
+            close = values.sum() / count if count else NaN
+            self.warmup = None
+        return self.ewm.update(close)
+
+
+class StreamingRSI:
+    """Wilder RSI, same as `ta.rsi(close, length)`."""
+
+    def __init__(self, length=14):
+        self.length = int(length)
+        alpha = 1.0 / self.length
+        self.positive = EWMState.from_alpha(alpha, adjust=True, min_periods=self.length)
+        self.negative = EWMState.from_alpha(alpha, adjust=True, min_periods=self.length)
+        self.prev_close = NaN
+
+    def update(self, close):
+        change = close - self.prev_close
+        self.prev_close = close
+        positive = 0.0 if change < 0 else change
+        negative = 0.0 if change > 0 else change
+        positive_avg = self.positive.update(positive)
+        negative_avg = self.negative.update(negative)
+        return 100.0 * positive_avg / (positive_avg + abs(negative_avg))
+
+
+class StreamingATR:
+    """Average true range with Wilder (RMA) smoothing, same as `ta.atr`."""
+
+    def __init__(self, length=14):
+        self.length = int(length)
+        self.rma = EWMState.from_alpha(1.0 / self.length, adjust=True, min_periods=self.length)
+        self.prev_close = None
+
+    def update(self, high, low, close):
+        if self.prev_close is None:
+            true_range = NaN  # no previous close on the first bar
+        else:
+            ranges = [abs(high - low), abs(high - self.prev_close), abs(self.prev_close - low)]
+            ranges = [r for r in ranges if r == r]
+            true_range = max(ranges) if ranges else NaN
+        self.prev_close = close
+        return self.rma.update(true_range)
+
+
+class StreamingSupertrend:
+    """
+    Supertrend, same as `ta.supertrend(high, low, close, length, multiplier)`.
+    update() returns (trend, direction, long, short), i.e. one row of
+    SUPERT_*, SUPERTd_*, SUPERTl_*, SUPERTs_*.
+    """
+
+    def __init__(self, length=7, multiplier=3.0):
+        self.length = int(length)
+        self.multiplier = float(multiplier)
+        self.atr = StreamingATR(self.length)
+        self.prev_upper = None
+        self.prev_lower = None
+        self.direction = 1
+
+    def update(self, high, low, close):
+        hl2 = 0.5 * (high + low)
+        matr = self.multiplier * self.atr.update(high, low, close)
+        upper = hl2 + matr
+        lower = hl2 - matr
+
+        if self.prev_upper is None:
+            # First bar: pandas_ta leaves direction 1 and trend 0
+            self.prev_upper, self.prev_lower = upper, lower
+            return 0.0, 1, NaN, NaN
+
+        if close > self.prev_upper:
+            self.direction = 1
+        elif close < self.prev_lower:
+            self.direction = -1
+        else:
+            if self.direction > 0 and lower < self.prev_lower:
+                lower = self.prev_lower
+            if self.direction < 0 and upper > self.prev_upper:
+                upper = self.prev_upper
+        self.prev_upper, self.prev_lower = upper, lower
+
+        if self.direction > 0:
+            return lower, 1, lower, NaN
+        return upper, -1, NaN, upper
+
+
+class StreamingStrategy:
+    """
+    The apply_strategy entry/exit rules, one bar at a time.
+
+    update() returns None, or an event dict:
+        {"event": "entry", "Entry Time", "Entry Price"}
+        {"event": "exit", "Entry Time", "Exit Time", "Entry Price", "Exit Price", "P/L"}
+    Exit events carry the same fields as a row of apply_strategy's trades_df.
+    Long only, one unit: other strategy_rules["direction"] / ["pyramiding"]
+    settings raise ValueError.
+    """
+
+    def __init__(self, strategy_rules, ema_period=20, rsi_period=14,
+                 supertrend_period=10, supertrend_multiplier=3.0):
+        if position_rules(strategy_rules) != ("long", 1):
+            raise ValueError("the streaming strategy trades long-only, one-unit books; "
+                             "use apply_strategy for short, stop-and-reverse or pyramided positions")
+        self.strategy_rules = strategy_rules
+        self.ema = StreamingEMA(ema_period)
+        self.rsi = StreamingRSI(rsi_period)
+        self.supertrend = StreamingSupertrend(supertrend_period, supertrend_multiplier)
+        self.bars = 0
+        self.in_trade = False
+        self.entry_time = None
+        self.entry_price = None
+
+    def update(self, time, high, low, close):
+        ema = self.ema.update(close)
+        rsi = self.rsi.update(close)
+        direction = self.supertrend.update(high, low, close)[1]
+        self.bars += 1
+        if self.bars == 1:
+            return None  # apply_strategy never trades on the first bar
+
+        rules = self.strategy_rules
+        conditions = [ema_conditions(close, ema, rules), rsi_conditions(rsi, rules),
+                      supertrend_conditions(direction, rules)]
+
+        if not self.in_trade:
+            buy = [c[0] for c in conditions if c[0] is not None]
+            if buy and all(buy):
+                self.in_trade = True
+                self.entry_time, self.entry_price = time, close
+                return {"event": "entry", "Entry Time": time, "Entry Price": close}
+        else:
+            sell = [c[1] for c in conditions if c[1] is not None]
+            if sell and any(sell):
+                self.in_trade = False
+                return {
+                    "event": "exit",
+                    "Entry Time": self.entry_time,
+                    "Exit Time": time,
+                    "Entry Price": self.entry_price,
+                    "Exit Price": close,
+                    "P/L": float(np.round(close - self.entry_price, 2))
+                }
+        return None
+
+
+class SymbolStreams:
+    """One StreamingStrategy per symbol, created on the symbol's first bar."""
+
+    def __init__(self, strategy_rules, **params):
+        self.strategy_rules = strategy_rules
+        self.params = params
+        self.streams = {}
+
+    def update(self, symbol, time, high, low, close):
+        stream = self.streams.get(symbol)
+        if stream is None:
+            stream = self.streams[symbol] = StreamingStrategy(self.strategy_rules, **self.params)
+        return stream.update(time, high, low, close)
+
+
+def replay(df, strategy_rules, **params):
+    """
+    Feed a DataFrame through StreamingStrategy bar by bar and collect the
+    closed trades, in the same layout as apply_strategy's trades_df.
+    """
+    df = df.copy()
+    df.columns = [col.lower() for col in df.columns]
+    strategy = StreamingStrategy(strategy_rules, **params)
+    trades = []
+    for time, high, low, close in zip(df.index, df['high'].to_numpy(dtype=float),
+                                      df['low'].to_numpy(dtype=float),
+                                      df['close'].to_numpy(dtype=float)):
+        event = strategy.update(time, high, low, close)
+        if event and event["event"] == "exit":
+            trades.append({k: v for k, v in event.items() if k != "event"})
+    return pd.DataFrame(trades)
@@ -1,6 +1,10 @@
 import os
 import pandas as pd
-from datetime import timedelta
+
+import perf
+from data_cache import date_bounds
+from ohlc_store import load_view
+from resample import load_resampled
 
 def get_stock_list(data_folder):
     """
@@ -22,42 +26,78 @@ def get_stock_list(data_folder):
     return sorted(stock_names)
 
 
-def load_csv(filepath, from_date, to_date):
-    import pytz
-    try:
-        df = pd.read_csv(filepath, parse_dates=["time"])
-
-        datetime_col = None
-        for col in ['Time', 'Datetime', 'Date', 'Timestamp', 'time']:
-            if col in df.columns:
-                datetime_col = col
-                break
+def get_stock_files(data_folder):
+    """
+    Scan the folder for CSV files named like 'NSE_<STOCK>_<TIMEFRAME>.csv'
+    Return a sorted list of (stock, timeframe, filepath) tuples.
+    """
+    if not os.path.exists(data_folder):
+        print(f"[ERROR] Folder not found: {data_folder}")
+        return []
 
-        if datetime_col is None:
-            raise ValueError("No valid datetime column found in CSV.")
+    stock_files = []
+    for file in os.listdir(data_folder):
+        if not (file.endswith(".csv") and file.startswith("NSE_")):
+            continue
+        parts = file.replace(".csv", "").split("_")
+        if len(parts) >= 3:
+            # Stock names may contain '_', the timeframe is always last
+            stock_files.append(("_".join(parts[1:-1]), parts[-1], os.path.join(data_folder, file)))
 
-        df['time'] = pd.to_datetime(df[datetime_col])
+    return sorted(stock_files)
 
-        # Get timezone info from the 'time' column
-        tz = df['time'].dt.tz
 
-        # Convert from_date and to_date to datetime and add timezone info
-        start = pd.to_datetime(from_date)
-        end = pd.to_datetime(to_date) + timedelta(days=1) - timedelta(seconds=1)
+def stock_source(data_folder, stock, timeframe):
+    """
+    The CSV a stock/timeframe is loaded from: the 1-minute file when there
+    is one (every timeframe is resampled from it), otherwise
+    'NSE_<STOCK>_<TIMEFRAME>.csv'. None if neither exists.
+    """
+    base = os.path.join(data_folder, f"NSE_{stock}_1.csv")
+    if os.path.exists(base):
+        return base
+    filepath = os.path.join(data_folder, f"NSE_{stock}_{timeframe}.csv")
+    return filepath if os.path.exists(filepath) else None
 
-        # Make start and end timezone-aware if tz exists
-        if tz is not None:
-            start = start.tz_localize(tz)
-            end = end.tz_localize(tz)
 
-        # Filter rows based on date range
-        df = df[(df["time"] >= start) & (df["time"] <= end)]
+@perf.timed("load_stock", rows="result")
+def load_stock(data_folder, stock, timeframe, from_date, to_date):
+    """
+    Load a stock at any timeframe from from_date to the end of to_date,
+    resampling from the 1-minute file when there is one (see resample.py).
+    Same layout as load_csv. Returns None if it cannot be loaded.
+    """
+    source = stock_source(data_folder, stock, timeframe)
+    if source is None:
+        print(f"[ERROR] load_stock: no data for {stock} ({timeframe}) in {data_folder}")
+        return None
+    if timeframe != "1" and source.endswith("_1.csv"):
+        try:
+            df = load_resampled(source, timeframe, from_date, to_date)
+            perf.debug(f"Resampled {os.path.basename(source)} to {timeframe}: {len(df)} bars")
+            return df
+        except Exception as e:
+            print(f"[ERROR] load_stock: {e}")
+            return None
+    return load_csv(source, from_date, to_date)
+
+
+@perf.timed("load_csv", rows="result")
+def load_csv(filepath, from_date, to_date):
+    """
+    Load the rows of an NSE_*.csv from from_date to the end of to_date
+    (None leaves that side of the range open) via the memory-mapped store
+    in ohlc_store.py. Returns None if the file cannot be loaded.
+    """
+    try:
+        df = load_view(filepath, from_date, to_date).to_frame()
+        start, end = date_bounds(from_date, to_date, df['time'].dt.tz)
 
-        print("Earliest time in file:", df['time'].min())
-        print("Latest time in file:", df['time'].max())
-        print("Filtering from", start, "to", end)
+        perf.debug("Earliest time in file:", df['time'].min())
+        perf.debug("Latest time in file:", df['time'].max())
+        perf.debug("Filtering from", start, "to", end)
 
-        return df.reset_index(drop=True)
+        return df
 
     except Exception as e:
         print(f"[ERROR] load_csv: {e}")
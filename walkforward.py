@@ -0,0 +1,186 @@
+"""
+Walk-forward evaluation.
+
+The history is cut into consecutive windows: optimize on `train` bars,
+trade the best settings on the following `test` bars, move on by `step`.
+
+    |---- train ----|-- test --|
+              |---- train ----|-- test --|
+                        |---- train ----|-- test --|
+
+Every indicator series of the grid is computed once over the full history
+(ParameterSweep) before the windows start; a window only slices the
+buy/sell conditions, so nothing is recomputed per window and the first bar
+of each window already has warmed-up indicators. Windows are independent
+and run on a process pool. With the fork start method (the Linux default)
+the workers inherit the precomputed conditions; with spawn (the Windows and
+macOS default) the sweep is pickled to each worker once, when it starts,
+not once per window.
+
+    report_df, equity_df = walk_forward(df, strategy_rules, train="20D", test="5D",
+                                        ema_periods=range(10, 60, 10), workers=4)
+"""
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from batch import param_grid
+from strategy import ParameterSweep
+
+METRICS = ("total_profit", "win_rate", "profit_factor", "expectancy", "sharpe", "sortino")
+
+_SWEEP = None  # set in each worker by _init_worker
+
+
+def _init_worker(sweep):
+    global _SWEEP
+    _SWEEP = sweep
+
+
+def _bars(size, index, start):
+    """Window size in bars: an int is a bar count, a string ("20D", "6h") a duration from `start`."""
+    if isinstance(size, (int, np.integer)):
+        return int(size)
+    end = index[start] + pd.Timedelta(size)
+    return int(np.searchsorted(index, end, side="left")) - start
+
+
+def _bars_before(size, index, end):
+    """Like _bars, counted back from bar `end` (exclusive)."""
+    if isinstance(size, (int, np.integer)):
+        return min(int(size), end)
+    start = index[end] - pd.Timedelta(size)
+    return end - int(np.searchsorted(index, start, side="left"))
+
+
+def _shorter(step, test):
+    """True if `step` is shorter than `test`, when both are bar counts or both durations."""
+    if isinstance(step, (int, np.integer)) != isinstance(test, (int, np.integer)):
+        return False
+    if isinstance(step, (int, np.integer)):
+        return step < test
+    return pd.Timedelta(step) < pd.Timedelta(test)
+
+
+def make_windows(index, train, test, step=None):
+    """
+    (train_lo, train_hi, test_hi) bar positions of every walk-forward window;
+    the test window is [train_hi, test_hi) and the train window the `train`
+    bars (or duration) right before it. Each test window starts `step` after
+    the previous one; by default (step=None) exactly where the previous one
+    ended, so the test windows tile the history without overlapping, gaps
+    such as weekends included. The last test window may be shorter than
+    `test`. A `step` shorter than `test` would make test windows overlap,
+    and their trades be counted twice: ValueError.
+    """
+    if step is not None and _shorter(step, test):
+        raise ValueError("walk-forward step must not be shorter than test: "
+                         "the out-of-sample windows would overlap")
+    n = len(index)
+    windows = []
+    train_hi = _bars(train, index, 0) if n else 0
+    while train_hi < n:
+        lo = train_hi - _bars_before(train, index, train_hi)
+        test_hi = min(n, train_hi + _bars(test, index, train_hi))
+        if test_hi <= train_hi:
+            raise ValueError("walk-forward test window must cover at least one bar")
+        if lo < train_hi:  # a train duration that falls in a gap has nothing to optimize on
+            windows.append((lo, train_hi, test_hi))
+        if step is None:
+            next_hi = test_hi
+        else:
+            next_hi = train_hi + _bars(step, index, train_hi)
+            if next_hi < test_hi:
+                raise ValueError("walk-forward step must not be shorter than test: "
+                                 "the out-of-sample windows would overlap")
+        train_hi = next_hi
+    return windows
+
+
+def run_window(task):
+    """Optimize on one train window and trade the winner on its test window."""
+    window_id, (lo, train_hi, test_hi), grid, metric = task
+    sweep = _SWEEP
+    results = sweep.run(lo=lo, hi=train_hi, with_metrics=metric not in ("total_profit", "win_rate"), **grid)
+    results = results.sort_values([metric, "total_profit"], ascending=False, kind="stable")
+    best = results.iloc[0]
+    params = (int(best.ema_period), int(best.rsi_period),
+              int(best.supertrend_period), float(best.supertrend_multiplier))
+
+    entry_idx, exit_idx, side = sweep.trades(*params, lo=train_hi, hi=test_hi)
+    ledger = sweep.ledger(entry_idx, exit_idx, side, hi=test_hi)
+    exit_idx, pl = ledger["exit_idx"], ledger["pl"]
+    index = sweep.index
+    row = {
+        "window": window_id,
+        "train_start": index[lo], "train_end": index[train_hi - 1],
+        "test_start": index[train_hi], "test_end": index[test_hi - 1],
+        "ema_period": params[0], "rsi_period": params[1],
+        "supertrend_period": params[2], "supertrend_multiplier": params[3],
+        "is_profit": float(best.total_profit), "is_win_rate": float(best.win_rate),
+        "is_trades": int(best.trades),
+        "oos_profit": float(pl.sum()) if len(pl) else 0.0,
+        "oos_win_rate": float((pl > 0).mean() * 100) if len(pl) else 0.0,
+        "oos_trades": len(pl)
+    }
+    if metric not in ("total_profit", "win_rate"):
+        row[f"is_{metric}"] = float(best[metric])
+    return row, exit_idx, pl
+
+
+def walk_forward(df, strategy_rules, train, test, step=None, ema_periods=(20,), rsi_periods=(14,),
+                 supertrend_periods=(10,), supertrend_multipliers=(3.0,),
+                 metric="total_profit", workers=None, execution=None):
+    """
+    Walk-forward optimization of the apply_strategy settings.
+
+    train / test / step are bar counts (int) or durations ("30D", "6h").
+    The best settings of each train window are picked by `metric`
+    (one of METRICS, see metrics.py). workers=None uses every core,
+    workers=1 runs in-process. `execution` fills and costs every trade,
+    in and out of sample (see execution.py).
+
+    Returns:
+        report_df (pd.DataFrame): one row per window with its dates, the chosen
+            settings, in-sample (is_*) and out-of-sample (oos_*) results
+        equity_df (pd.DataFrame): stitched out-of-sample curve, one row per
+            test trade at its exit time: time, window, P/L, equity (cumulative P/L)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}")
+
+    sweep = ParameterSweep(df, strategy_rules, execution)
+    grid = {"ema_periods": list(ema_periods), "rsi_periods": list(rsi_periods),
+            "supertrend_periods": list(supertrend_periods),
+            "supertrend_multipliers": list(supertrend_multipliers)}
+
+    # Every indicator of the grid, once, over the full history
+    for params in param_grid(**grid):
+        if sweep.use_ema:
+            sweep.ema_cond(params["ema_period"])
+        if sweep.use_rsi:
+            sweep.rsi_cond(params["rsi_period"])
+        if sweep.use_st:
+            sweep.st_cond(params["supertrend_period"], params["supertrend_multiplier"])
+
+    windows = make_windows(sweep.index, train, test, step)
+    tasks = [(k, window, grid, metric) for k, window in enumerate(windows)]
+
+    if workers == 1 or len(tasks) <= 1:
+        _init_worker(sweep)
+        results = [run_window(task) for task in tasks]
+    else:
+        with Pool(processes=workers, initializer=_init_worker, initargs=(sweep,)) as pool:
+            results = pool.map(run_window, tasks)
+
+    report_df = pd.DataFrame([row for row, _, _ in results])
+    exit_idx = np.concatenate([idx for _, idx, _ in results]) if results else np.empty(0, dtype=np.int64)
+    pl = np.concatenate([p for _, _, p in results]) if results else np.empty(0)
+    equity_df = pd.DataFrame({
+        "time": sweep.index[exit_idx],
+        "window": np.repeat([row["window"] for row, _, _ in results], [len(p) for _, _, p in results]),
+        "P/L": pl,
+        "equity": np.cumsum(pl)
+    })
+    return report_df, equity_df